@@ -0,0 +1,70 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Benchmark CAN response time analysis with fcp.can.analysis.
+
+Builds a schema with 3000 messages of 1 to 8 bytes sent every 50 to 150000 ms
+on a 1 Mbit/s bus and analyzes it, reporting the time spent including the
+packed encoder layouts.
+
+Usage: python benchmarks/can_analyze.py [number of messages]
+"""
+
+import sys
+import time
+
+from fcp.can import analysis
+from fcp.specs.impl import Impl
+from fcp.specs.struct import Struct
+from fcp.specs.struct_field import StructField
+from fcp.specs.type import UnsignedType
+from fcp.specs.v2 import FcpV2
+
+PERIODS = [10, 20, 50, 100, 200, 500, 1000, 10000]
+
+
+def make_schema(messages: int) -> FcpV2:
+    """Build a synthetic schema."""
+    fcp = FcpV2()
+    for i in range(messages):
+        fields = [StructField(f"s{j}", j, UnsignedType("u8")) for j in range(i % 8 + 1)]
+        fcp.structs.append(Struct(f"M{i}", fields))
+        period = PERIODS[i % len(PERIODS)] * 5 * (1 + i // 1000)
+        fcp.impls.append(Impl(f"M{i}", "can", f"M{i}", {"id": i, "period": period}, []))
+
+    return fcp
+
+
+def main() -> None:
+    """Run the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    fcp = make_schema(count)
+
+    start = time.perf_counter()
+    timing = analysis.analyze(fcp, bitrate=1000000)["default"]
+    elapsed = time.perf_counter() - start
+
+    print(f"frames: {len(timing.frames)}, load {timing.utilization:.1%}")
+    print(f"missed deadlines: {len(timing.missed)}")
+    print(f"analyze: {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
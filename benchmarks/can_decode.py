@@ -0,0 +1,80 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Benchmark decoding CAN frames with fcp.can.CanCodec.
+
+Builds a schema with 100 messages of 8 signals each, some of them signed or
+scaled, and decodes random frames of random messages.
+
+Usage: python benchmarks/can_decode.py [number of frames]
+"""
+
+import random
+import sys
+import time
+
+from fcp.can import CanCodec
+from fcp.specs.impl import Impl
+from fcp.specs.metadata import MetaData
+from fcp.specs.signal_block import SignalBlock
+from fcp.specs.struct import Struct
+from fcp.specs.struct_field import StructField
+from fcp.specs.type import SignedType, UnsignedType
+from fcp.specs.v2 import FcpV2
+
+META = MetaData(1, 1, 1, 1, 0, 0, "benchmark.fcp")
+
+
+def make_schema(messages: int = 100) -> FcpV2:
+    """Build a synthetic schema."""
+    fcp = FcpV2()
+    for i in range(messages):
+        fields = [
+            StructField(f"s{j}", j, SignedType("i8") if j % 2 else UnsignedType("u8"))
+            for j in range(8)
+        ]
+        signals = [SignalBlock("s0", {"scale": 0.5, "offset": -10}, META)]
+
+        fcp.structs.append(Struct(f"M{i}", fields))
+        fcp.impls.append(Impl(f"M{i}", "can", f"M{i}", {"id": i}, signals))
+
+    return fcp
+
+
+def main() -> None:
+    """Run the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    codec = CanCodec(make_schema())
+
+    rng = random.Random(0)
+    frames = [(rng.randrange(100), rng.randbytes(8)) for _ in range(count)]
+
+    decode = codec.decode
+    start = time.perf_counter()
+    for frame_id, data in frames:
+        decode(frame_id, data)
+    elapsed = time.perf_counter() - start
+
+    print(f"frames: {count}")
+    print(f"decode: {elapsed:.3f}s, {count / elapsed:,.0f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
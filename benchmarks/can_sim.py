@@ -0,0 +1,106 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Benchmark simulating a CAN network with fcp.can.sim.
+
+Builds a schema with 500 messages sent by 10 devices every 10 to 1000 ms and
+simulates it in real time with a tap reading every frame, then reports the
+number of frames sent against the schedule and how late they were read.
+
+Usage: python benchmarks/can_sim.py [duration in seconds]
+"""
+
+import asyncio
+import math
+import sys
+import time
+
+from fcp.can.sim import Simulator, VirtualBus
+from fcp.specs.impl import Impl
+from fcp.specs.struct import Struct
+from fcp.specs.struct_field import StructField
+from fcp.specs.type import UnsignedType
+from fcp.specs.v2 import FcpV2
+
+PERIODS = [10, 20, 50, 100, 1000]
+
+
+def make_schema(messages: int = 500, devices: int = 10) -> FcpV2:
+    """Build a synthetic schema."""
+    fcp = FcpV2()
+    for i in range(messages):
+        fields = [StructField(f"s{j}", j, UnsignedType("u8")) for j in range(8)]
+        fcp.structs.append(Struct(f"M{i}", fields))
+        fcp.impls.append(
+            Impl(
+                f"M{i}",
+                "can",
+                f"M{i}",
+                {
+                    "id": i,
+                    "period": PERIODS[i % len(PERIODS)],
+                    "device": f"d{i % devices}",
+                },
+                [],
+            )
+        )
+
+    return fcp
+
+
+async def simulate(duration: float) -> None:
+    """Run the simulation and read every frame."""
+    bus = VirtualBus()
+    simulator = Simulator(make_schema(), bus)
+    expected = sum(
+        math.ceil(round(duration / period, 6))
+        for messages in simulator.devices.values()
+        for _, period in messages
+    )
+
+    lag = 0.0
+    received = 0
+
+    async def read() -> None:
+        nonlocal lag, received
+        async for frame in tap:
+            lag = max(lag, bus.time() - frame.timestamp)
+            received += 1
+
+    with bus.tap() as tap:
+        reader = asyncio.create_task(read())
+        start = time.perf_counter()
+        await simulator.run(duration)
+        elapsed = time.perf_counter() - start
+    await reader
+
+    print(f"frames: {bus.sent} sent, {expected} scheduled, {received} received")
+    print(f"simulate: {elapsed:.3f}s, {bus.sent / elapsed:,.0f} frames/s")
+    print(f"max tap lag: {lag * 1000:.2f}ms")
+
+
+def main() -> None:
+    """Run the benchmark."""
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    asyncio.run(simulate(duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Benchmark the packed encoder on a deeply nested synthetic schema.
+
+Builds a chain of structs where every struct holds an array of the previous
+one and has a can impl, then generates the layout of every impl the way the
+can_c generator does: once for the messages and once more for the RPC
+methods, with a second encoder standing in for another generator.
+
+Usage: python benchmarks/deep_nesting.py [depth]
+"""
+
+import sys
+import time
+
+from fcp.encoding import PackedEncoderContext, make_encoder
+from fcp.specs.enum import Enum, Enumeration
+from fcp.specs.impl import Impl
+from fcp.specs.struct import Struct
+from fcp.specs.struct_field import StructField
+from fcp.specs.type import ArrayType, EnumType, StructType, UnsignedType
+from fcp.specs.v2 import FcpV2
+
+
+def make_schema(depth: int) -> FcpV2:
+    """Build a synthetic schema."""
+    fcp = FcpV2()
+    fcp.enums.append(Enum("E", [Enumeration(f"V{j}", j) for j in range(4)]))
+
+    for i in range(depth):
+        fields = [
+            StructField("value", 0, UnsignedType("u8")),
+            StructField("state", 1, EnumType("E")),
+        ]
+        if i > 0:
+            fields.append(
+                StructField("previous", 2, ArrayType(StructType(f"S{i - 1}"), 2))
+            )
+
+        fcp.structs.append(Struct(f"S{i}", fields))
+        fcp.impls.append(Impl(f"S{i}", "can", f"S{i}", {"id": i}, []))
+
+    return fcp
+
+
+def generate_all(fcp: FcpV2) -> float:
+    """Generate every can impl with a fresh encoder, return the elapsed time."""
+    start = time.perf_counter()
+    encoder = make_encoder("packed", fcp, PackedEncoderContext())
+    for impl in fcp.get_matching_impls("can"):
+        encoder.generate(impl)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """Run the benchmark."""
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    fcp = make_schema(depth)
+
+    first = generate_all(fcp)
+    second = generate_all(fcp)
+    third = generate_all(fcp)
+
+    print(f"depth: {depth}")
+    print(f"first generation: {first:.3f}s")
+    print(f"second generation: {second:.3f}s")
+    print(f"second generator: {third:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
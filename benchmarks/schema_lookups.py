@@ -0,0 +1,86 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Benchmark code generation on a large synthetic schema.
+
+Builds a schema with 5000 structs, where structs nest each other and refer to
+enums, and times the two steps every generator goes through: the verifier and
+the packed encoder over every impl.
+
+Usage: python benchmarks/schema_lookups.py [number of structs]
+"""
+
+import sys
+import time
+
+from fcp.encoding import PackedEncoderContext, make_encoder
+from fcp.specs.enum import Enum, Enumeration
+from fcp.specs.impl import Impl
+from fcp.specs.struct import Struct
+from fcp.specs.struct_field import StructField
+from fcp.specs.type import EnumType, StructType, UnsignedType
+from fcp.specs.v2 import FcpV2
+from fcp.verifier import make_general_verifier
+
+
+def make_schema(structs: int, enums: int = 50) -> FcpV2:
+    """Build a synthetic schema."""
+    fcp = FcpV2()
+    for i in range(enums):
+        fcp.enums.append(Enum(f"E{i}", [Enumeration(f"V{j}", j) for j in range(4)]))
+
+    for i in range(structs):
+        fields = [
+            StructField("value", 0, UnsignedType("u8")),
+            StructField("state", 1, EnumType(f"E{i % enums}")),
+        ]
+        if i % 10 != 0:
+            fields.append(StructField("previous", 2, StructType(f"S{i - 1}")))
+
+        fcp.structs.append(Struct(f"S{i}", fields))
+        fcp.impls.append(Impl(f"S{i}", "default", f"S{i}", {}, []))
+        if i % 2 == 0:
+            fcp.impls.append(Impl(f"S{i}", "can", f"S{i}", {"id": i}, []))
+
+    return fcp
+
+
+def main() -> None:
+    """Run the benchmark."""
+    structs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    fcp = make_schema(structs)
+
+    start = time.perf_counter()
+    make_general_verifier().verify(fcp).unwrap()
+    verified = time.perf_counter()
+
+    encoder = make_encoder("packed", fcp, PackedEncoderContext())
+    for impl in fcp.get_matching_impls_or_default("can"):
+        encoder.generate(impl)
+    encoded = time.perf_counter()
+
+    print(f"structs: {structs}")
+    print(f"verifier: {verified - start:.3f}s")
+    print(f"packed encoder: {encoded - verified:.3f}s")
+    print(f"total: {encoded - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
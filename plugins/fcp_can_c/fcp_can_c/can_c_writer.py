@@ -39,6 +39,7 @@ from fcp.specs.v2 import FcpV2
 from fcp.specs.service import Service
 from dataclasses import dataclass
 from fcp.encoding import make_encoder, EncodeablePiece, Value, PackedEncoderContext
+from fcp.can.codec import MAX_LENGTH, FD_MAX_LENGTH, dlc_code
 from fcp.utils import to_pascal_case, to_snake_case
 
 
@@ -503,6 +504,7 @@ class CanCWriter:
 
         self.fcp: FcpV2 = fcp
         self.env = Environment(loader=FileSystemLoader(self.templates_dir))
+        self.env.filters["dlc_code"] = dlc_code
 
         self.templates = {
             "device_can_h": self.env.get_template("can_device_h.j2"),
@@ -512,6 +514,24 @@ class CanCWriter:
         }
         self.device_messages = map_messages_to_devices(self.messages)
 
+    def max_data_length(self) -> int:
+        """Get the data length of frames, CAN FD if any message needs it.
+
+        Returns:
+            int: 8 for classic CAN frames and 64 for CAN FD frames.
+
+        """
+        lengths: List[int] = [
+            message.dlc
+            for messages in self.device_messages.values()
+            for message in messages
+        ]
+        lengths += [message.dlc + 2 for message in self.rpcs]
+        length: int = (
+            FD_MAX_LENGTH if max(lengths, default=0) > MAX_LENGTH else MAX_LENGTH
+        )
+        return length
+
     def generate_static_files(self) -> Generator[Tuple[str, str], None, None]:
         """Generate all static C files.
 
@@ -519,7 +539,11 @@ class CanCWriter:
             Generator: Tuple containing the file name and the file content.
 
         """
-        static_files = ["can_frame.h", "can_signal_parser.h", "can_signal_parser.c"]
+        yield "can_frame.h", self.env.get_template("can_frame.h").render(
+            max_data_length=self.max_data_length()
+        )
+
+        static_files = ["can_signal_parser.h", "can_signal_parser.c"]
         for file in static_files:
             with open(f"{self.templates_dir}/{file}", "r") as f:
                 yield file, f.read()
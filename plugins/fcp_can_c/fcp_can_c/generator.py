@@ -115,6 +115,7 @@ class Generator(CodeGenerator):
         ) -> Result[Nil, FcpError]:
             """Check if extension has a valid type."""
             from fcp.encoding import make_encoder, PackedEncoderContext
+            from fcp.can.codec import FD_MAX_LENGTH
 
             encoder = make_encoder("packed", fcp, PackedEncoderContext())
             encoding = encoder.generate(extension)
@@ -125,7 +126,7 @@ class Generator(CodeGenerator):
             last_piece = encoding[-1]
             total_size = last_piece.bitstart + last_piece.bitlength
 
-            if total_size > 64:
+            if total_size > 8 * FD_MAX_LENGTH:
                 return error(
                     f"Impl {extension.name} is way too big at {total_size} bits",
                     node=extension,
@@ -3,10 +3,25 @@
 
 #include <stdint.h>
 
+/* Data bytes of a frame, 64 when any message is sent in a CAN FD frame. */
+#ifndef CAN_MAX_DATA_LENGTH
+#define CAN_MAX_DATA_LENGTH {{ max_data_length }}
+#endif
+
 typedef struct {
     uint16_t id : 11;
     uint8_t dlc : 4;
-    uint8_t data[8];
+    uint8_t data[CAN_MAX_DATA_LENGTH];
 } CanFrame;
 
+/** @fn uint8_t can_dlc_to_length(uint8_t dlc)
+ *  @brief Number of data bytes of a frame, data length
+ * codes above 8 are CAN FD lengths.
+ *  @param dlc Data length code of the frame
+ */
+static inline uint8_t can_dlc_to_length(uint8_t dlc) {
+    static const uint8_t lengths[16] = {0, 1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 32, 48, 64};
+    return lengths[dlc & 0xF];
+}
+
 #endif
@@ -13,14 +13,8 @@ extern "C" {
  */
 #define get_bit(word, pos) (word >> pos) & 0x1
 
-/** @def can_word(msg) (*((uint64_t *) (msg->data)))
- *  Convert CanFrame to uint64_t word with data contents.
- */
-#define can_word(msg) (*((uint64_t *)(msg->data)))
-
 #define cast_double(ptr) *((double *)(ptr))
 #define cast_float(ptr) *((float *)(ptr))
-#define get_bitfield(data, start, length) (((data) >> (start)) & bitmask(length))
 #define set_bitfield(data, start, length) ((((uint64_t)data & bitmask(length)) << start))
 
 typedef union {
@@ -133,6 +127,57 @@ uint64_t bitmask(uint8_t length) {
         return 0xffffffffffffffffULL;
 }
 
+/** @fn uint64_t can_extract_bits(const CanFrame *msg, uint32_t start, uint32_t length)
+ *  @brief Read a little endian bit field of up to 64 bits
+ * from the frame data. The bit field may span 9 bytes of
+ * frames with more than 8 bytes of data.
+ *  @param msg The frame
+ *  @param start First bit of the bit field
+ *  @param length Size of the bit field
+ */
+uint64_t can_extract_bits(const CanFrame *msg, uint32_t start, uint32_t length) {
+    uint32_t first = start / 8;
+    uint32_t last = (start + length + 7) / 8;
+    uint32_t shift = start % 8;
+    uint64_t word = 0;
+
+    for (uint32_t i = first; i < last && i < first + 8; i++) {
+        word |= (uint64_t)msg->data[i] << (8 * (i - first));
+    }
+    word >>= shift;
+
+    if (last - first > 8) {
+        word |= (uint64_t)msg->data[first + 8] << (64 - shift);
+    }
+
+    return word & bitmask(length);
+}
+
+/** @fn void can_insert_bits(CanFrame *msg, uint64_t bits, uint32_t start, uint32_t length)
+ *  @brief Write a little endian bit field of up to 64 bits
+ * into the frame data, leaving the other bits unchanged.
+ *  @param msg The frame
+ *  @param bits Value of the bit field
+ *  @param start First bit of the bit field
+ *  @param length Size of the bit field
+ */
+void can_insert_bits(CanFrame *msg, uint64_t bits, uint32_t start, uint32_t length) {
+    uint64_t mask = bitmask(length);
+    bits &= mask;
+
+    for (uint32_t i = start / 8; i < (start + length + 7) / 8; i++) {
+        uint8_t byte_bits, byte_mask;
+        if (8 * i < start) {
+            byte_bits = (uint8_t)(bits << (start - 8 * i));
+            byte_mask = (uint8_t)(mask << (start - 8 * i));
+        } else {
+            byte_bits = (uint8_t)(bits >> (8 * i - start));
+            byte_mask = (uint8_t)(mask >> (8 * i - start));
+        }
+        msg->data[i] = (msg->data[i] & ~byte_mask) | byte_bits;
+    }
+}
+
 /** @fn uint64_t apply_linear_uint64_t(uint64_t
  * bitfield, float scale, double offset)
  *  @brief apply a linear conversion to a 64 bit
@@ -209,7 +254,7 @@ int64_t bitfield_sign_conv(uint64_t bitfield, uint8_t length) {
 
 uint64_t can_decode_signal_as_uint64_t(const CanFrame *msg, uint32_t start, uint32_t length,
                                        float scale, float offset, bool is_big_endian) {
-    uint64_t bitfield = get_bitfield(can_word(msg), start, length);
+    uint64_t bitfield = can_extract_bits(msg, start, length);
     if (is_big_endian) bitfield = swap_bytes_int(bitfield, U64);
 
     return apply_linear_uint64_t(bitfield, scale, offset);
@@ -225,7 +270,7 @@ uint64_t can_encode_signal_from_uint64_t(uint64_t signal, uint32_t start, uint32
 
 uint32_t can_decode_signal_as_uint32_t(const CanFrame *msg, uint32_t start, uint32_t length,
                                        float scale, float offset, bool is_big_endian) {
-    uint32_t bitfield = (uint32_t)get_bitfield(can_word(msg), start, length);
+    uint32_t bitfield = (uint32_t)can_extract_bits(msg, start, length);
     if (is_big_endian) bitfield = swap_bytes_int(bitfield, U32);
 
     return apply_linear_uint64_t(bitfield, scale, offset);
@@ -241,7 +286,7 @@ uint64_t can_encode_signal_from_uint32_t(uint32_t signal, uint32_t start, uint32
 
 uint16_t can_decode_signal_as_uint16_t(const CanFrame *msg, uint32_t start, uint32_t length,
                                        float scale, float offset, bool is_big_endian) {
-    uint16_t bitfield = (uint16_t)get_bitfield(can_word(msg), start, length);
+    uint16_t bitfield = (uint16_t)can_extract_bits(msg, start, length);
     if (is_big_endian) bitfield = swap_bytes_int(bitfield, U16);
 
     return apply_linear_uint64_t(bitfield, scale, offset);
@@ -257,7 +302,7 @@ uint64_t can_encode_signal_from_uint16_t(uint16_t signal, uint32_t start, uint32
 
 uint8_t can_decode_signal_as_uint8_t(const CanFrame *msg, uint32_t start, uint32_t length,
                                      float scale, float offset, bool is_big_endian) {
-    uint8_t bitfield = (uint8_t)get_bitfield(can_word(msg), start, length);
+    uint8_t bitfield = (uint8_t)can_extract_bits(msg, start, length);
     if (is_big_endian) bitfield = swap_bytes_int(bitfield, U8);
 
     return apply_linear_uint64_t(bitfield, scale, offset);
@@ -271,11 +316,9 @@ uint64_t can_encode_signal_from_uint8_t(uint8_t signal, uint32_t start, uint32_t
     return is_big_endian ? swap_bytes_int(bitfield, U8) : bitfield;
 }
 
-/* Only works up to 32 bit */
 double can_decode_signal_as_double(const CanFrame *msg, uint32_t start, uint32_t length,
                                    float scale, float offset, bool is_big_endian) {
-    u_f64 bitfield;
-    memcpy(&bitfield.i, msg->data, 8);
+    u_f64 bitfield = {.i = can_extract_bits(msg, start, length)};
     if (is_big_endian) bitfield.i = swap_bytes_int(bitfield.i, U64);
 
     return apply_linear_double(bitfield.d, scale, offset);
@@ -289,10 +332,9 @@ uint64_t can_encode_signal_from_double(double signal, uint32_t start, uint32_t l
     return is_big_endian ? swap_bytes_int(bitfield.i, U64) : bitfield.i;
 }
 
-/* Only works up to 32 bit */
 float can_decode_signal_as_float(const CanFrame *msg, uint32_t start, uint32_t length, float scale,
                                  float offset, bool is_big_endian) {
-    u_f32 bitfield = {.i = get_bitfield(can_word(msg), start, length)};
+    u_f32 bitfield = {.i = can_extract_bits(msg, start, length)};
     if (is_big_endian) bitfield.i = swap_bytes_int(bitfield.i, U32);
 
     return apply_linear_float(bitfield.f, scale, offset);
@@ -308,7 +350,7 @@ uint64_t can_encode_signal_from_float(float signal, uint32_t start, uint32_t len
 
 int64_t can_decode_signal_as_int64_t(const CanFrame *msg, uint32_t start, uint32_t length,
                                      float scale, float offset, bool is_big_endian) {
-    int64_t bitfield = get_bitfield(can_word(msg), start, length);
+    int64_t bitfield = can_extract_bits(msg, start, length);
     if (is_big_endian) bitfield = swap_bytes_int(bitfield, I64);
 
     return apply_linear_int64_t(bitfield, scale, offset);
@@ -324,7 +366,7 @@ uint64_t can_encode_signal_from_int64_t(int64_t signal, uint32_t start, uint32_t
 
 int32_t can_decode_signal_as_int32_t(const CanFrame *msg, uint32_t start, uint32_t length,
                                      float scale, float offset, bool is_big_endian) {
-    int64_t bitfield = bitfield_sign_conv(get_bitfield(can_word(msg), start, length), length);
+    int64_t bitfield = bitfield_sign_conv(can_extract_bits(msg, start, length), length);
     if (is_big_endian) bitfield = swap_bytes_int(bitfield, I32);
 
     return apply_linear_int64_t(bitfield, scale, offset);
@@ -340,7 +382,7 @@ uint64_t can_encode_signal_from_int32_t(int32_t signal, uint32_t start, uint32_t
 
 int16_t can_decode_signal_as_int16_t(const CanFrame *msg, uint32_t start, uint32_t length,
                                      float scale, float offset, bool is_big_endian) {
-    int64_t bitfield = bitfield_sign_conv(get_bitfield(can_word(msg), start, length), length);
+    int64_t bitfield = bitfield_sign_conv(can_extract_bits(msg, start, length), length);
     if (is_big_endian) bitfield = swap_bytes_int(bitfield, I16);
 
     return apply_linear_int64_t(bitfield, scale, offset);
@@ -356,7 +398,7 @@ uint64_t can_encode_signal_from_int16_t(int16_t signal, uint32_t start, uint32_t
 
 int8_t can_decode_signal_as_int8_t(const CanFrame *msg, uint32_t start, uint32_t length,
                                    float scale, float offset, bool is_big_endian) {
-    int64_t bitfield = bitfield_sign_conv(get_bitfield(can_word(msg), start, length), length);
+    int64_t bitfield = bitfield_sign_conv(can_extract_bits(msg, start, length), length);
     if (is_big_endian) bitfield = swap_bytes_int(bitfield, I8);
 
     return apply_linear_int64_t(bitfield, scale, offset);
@@ -376,7 +418,7 @@ float can_decode_signal_float_as_float(const CanFrame *msg, uint32_t start, uint
         return 0.0f;
     }
 
-    uint32_t word = (uint32_t)get_bitfield(can_word(msg), start, length);
+    uint32_t word = (uint32_t)can_extract_bits(msg, start, length);
     if (is_big_endian) word = swap_uint32(word);
 
     float f = *((float *)&word);
@@ -397,7 +439,7 @@ double can_decode_signal_double_as_double(const CanFrame *msg, uint32_t start, u
         return 0.0;
     }
 
-    uint64_t word = get_bitfield(can_word(msg), start, length);
+    uint64_t word = can_extract_bits(msg, start, length);
     if (is_big_endian) word = swap_uint64(word);
 
     double d = *((double *)&word);
@@ -95,6 +95,10 @@ uint64_t can_encode_signal_double_from_double(double signal, uint32_t start, uin
                                               float scale, float offset, bool is_big_endian);
 
 uint64_t bitmask(uint8_t length);
+
+uint64_t can_extract_bits(const CanFrame *msg, uint32_t start, uint32_t length);
+
+void can_insert_bits(CanFrame *msg, uint64_t bits, uint32_t start, uint32_t length);
 #ifdef __cplusplus
 }
 #endif
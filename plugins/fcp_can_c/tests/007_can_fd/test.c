@@ -0,0 +1,107 @@
+#include <stdbool.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+#include "generated_code/can_frame.h"
+#include "generated_code/ecu_can.h"
+
+bool all_tests_passed = true;
+
+#define VERIFY_TEST(condition)                             \
+    if (condition) {                                       \
+        printf("\033[32m [PASSED] %s\n", __func__);        \
+    } else {                                               \
+        printf("\033[31m [FAILED] %s\033[0m\n", __func__); \
+        all_tests_passed = false;                          \
+    }
+
+#define ASSERT_TESTS()      \
+    printf("\033[0m");      \
+    if (all_tests_passed) { \
+        exit(EXIT_SUCCESS); \
+    } else {                \
+        exit(EXIT_FAILURE); \
+    }
+
+bool compare_frames(CanFrame *a, CanFrame *b) {
+    if (a->id != b->id) {
+        return false;
+    }
+
+    if (a->dlc != b->dlc) {
+        return false;
+    }
+
+    for (int i = 0; i < can_dlc_to_length(a->dlc); i++) {
+        if (a->data[i] != b->data[i]) {
+            return false;
+        }
+    }
+
+    return true;
+}
+
+void test_frame_length(void) {
+    VERIFY_TEST(CAN_MAX_DATA_LENGTH == 64 && can_dlc_to_length(11) == 20 &&
+                can_dlc_to_length(15) == 64);
+}
+
+void test_encode_msg_wide(CanFrame *f) {
+    CanFrame expected = {
+        .id = CAN_MSG_ID_WIDE,
+        .data = {0xC2, 0x7B, 0xF3, 0x6A, 0xE2, 0x59, 0xD1, 0x48, 0x78, 0xF3,
+                 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x10, 0x00, 0x0F, 0x01},
+        .dlc = 11,
+    };
+    VERIFY_TEST(compare_frames(f, &expected));
+}
+
+void test_decode_msg_wide(CanMsgWide *original, CanFrame *f) {
+    CanMsgWide decoded = can_decode_msg_wide(f);
+
+    VERIFY_TEST(original->mode == decoded.mode && original->b == decoded.b &&
+                original->c == decoded.c && original->d == decoded.d &&
+                original->e == decoded.e);
+}
+
+void test_encode_msg_narrow(CanFrame *f) {
+    CanFrame expected = {
+        .id = CAN_MSG_ID_NARROW,
+        .data = {0x12},
+        .dlc = 1,
+    };
+    VERIFY_TEST(compare_frames(f, &expected));
+}
+
+void test_decode_msg_narrow(CanMsgNarrow *original, CanFrame *f) {
+    CanMsgNarrow decoded = can_decode_msg_narrow(f);
+
+    VERIFY_TEST(original->val == decoded.val);
+}
+
+int main() {
+    printf("Running Tests...\n\n");
+
+    CanMsgWide msg_wide = {
+        .mode = RUN, .b = 0x123456789abcdef0, .c = 0xBCDE, .d = -2.5, .e = 0x43};
+    CanMsgNarrow msg_narrow = {.val = 0x12};
+
+    CanFrame frame_wide = can_encode_msg_wide(&msg_wide);
+    CanFrame frame_narrow = can_encode_msg_narrow(&msg_narrow);
+
+    printf("\033[34m\nRunning Encoding Tests on CAN FD...\033[0m\n\n");
+
+    test_frame_length();
+    test_encode_msg_wide(&frame_wide);
+    test_encode_msg_narrow(&frame_narrow);
+
+    printf("\033[34m\nRunning Decoding Tests on CAN FD...\033[0m\n\n");
+
+    test_decode_msg_wide(&msg_wide, &frame_wide);
+    test_decode_msg_narrow(&msg_narrow, &frame_narrow);
+
+    ASSERT_TESTS();
+
+    return 0;
+}
@@ -45,6 +45,7 @@ def get_path(test_name: str) -> str:
         "004_little_endian",
         "005_big_endian",
         "006_rpc_support",
+        "007_can_fd",
     ],
 )  # type: ignore
 def test_can_c_gen(test_name: str) -> None:
@@ -73,10 +73,14 @@ class CanDynamicSchema final: public ICanSchema {
             return std::nullopt;
         }
 
-        std::uint8_t dlc = encoded.value().size();
-        std::array<std::uint8_t, 8> data = {0};
+        auto dlc = FrameLength(encoded.value().size());
+        if (!dlc.has_value()) {
+            return std::nullopt;
+        }
+
+        std::array<std::uint8_t, kMaxDataLength> data = {0};
         std::copy(encoded.value().begin(), encoded.value().end(), data.begin());
-        return frame_t{bus.value(), id.value(), dlc, data};
+        return frame_t{bus.value(), id.value(), dlc.value(), data};
     }
 
     private:
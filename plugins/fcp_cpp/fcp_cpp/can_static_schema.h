@@ -67,7 +67,12 @@ class CanStaticSchema: public ICanSchema {
             return std::nullopt;
         }
 
-        std::array<std::uint8_t, 8> data{};
+        auto dlc = FrameLength(encoded.value().size());
+        if (!dlc.has_value()) {
+            return std::nullopt;
+        }
+
+        std::array<std::uint8_t, kMaxDataLength> data{};
         std::copy_n(encoded.value().begin(), encoded.value().size(), data.begin());
 
         std::array<char, 4> bus_name_arr{};
@@ -75,7 +80,7 @@ class CanStaticSchema: public ICanSchema {
         return frame_t{
             bus_name_arr,
             sid.value(),
-            static_cast<std::uint8_t>(encoded.value().size()),
+            dlc.value(),
             data
         };
     }
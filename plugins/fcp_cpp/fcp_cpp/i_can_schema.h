@@ -24,18 +24,37 @@
 
 #pragma once
 
+#include <array>
+#include <cstdint>
+#include <optional>
+
 #include "json.h"
 
 namespace fcp {
 namespace can {
 
+// Data bytes of a CAN FD frame, classic frames use the first 8.
+constexpr std::size_t kMaxDataLength = 64;
+
 struct frame_t {
     std::array<char,4> bus;
     std::uint16_t sid;
     std::uint8_t dlc;
-    std::array<std::uint8_t, 8> data;
+    std::array<std::uint8_t, kMaxDataLength> data;
 };
 
+// Round the size of an encoded message up to the data length of a CAN FD frame.
+inline std::optional<std::uint8_t> FrameLength(std::size_t size) {
+    constexpr std::array<std::uint8_t, 16> lengths{0, 1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 32, 48, 64};
+    for (auto length: lengths) {
+        if (size <= length) {
+            return length;
+        }
+    }
+
+    return std::nullopt;
+}
+
 class ICanSchema {
   public:
     virtual ~ICanSchema() = default;
@@ -68,3 +68,25 @@ TEST_P(CanTest, BasicEncode)
 
     EXPECT_THAT(frame, Optional(Eq(fcp::can::frame_t{{'b','u','s','1'}, 10, 2, {1,2}})));
 }
+
+TEST_P(CanTest, FdDecode)
+{
+    auto can = GetParam();
+
+    const auto decoded = can.Decode(fcp::can::frame_t{{'b','u','s','1'}, 12, 48, { 1, 2, 3, 0, 4, 0, 5, 0, 0, 6, 0, 0, 7, 0, 0, 0, 8, 0, 0, 0, 9, 0, 0, 0, 0, 0, 0, 0, 10, 0, 0, 0, 0, 0, 0, 0 }});
+
+    EXPECT_THAT(decoded,
+        Optional(
+            Pair(
+                Eq("S5"),
+                Eq(json { std::map<std::string, json>{{ "s1", 1ULL }, { "s2", 2LL }, { "s3", 3ULL }, { "s4", 4LL }, { "s5", 5ULL }, { "s6", 6LL }, { "s7", 7ULL }, { "s8", 8LL }, { "s9", 9ULL }, { "s10", 10LL } }}))));
+}
+
+TEST_P(CanTest, FdEncode)
+{
+    auto can = GetParam();
+
+    const auto frame = can.Encode("S5", json{ std::map<std::string, json>{{ "s1", 1ULL }, { "s2", 2LL }, { "s3", 3ULL }, { "s4", 4LL }, { "s5", 5ULL }, { "s6", 6LL }, { "s7", 7ULL }, { "s8", 8LL }, { "s9", 9ULL }, { "s10", 10LL } }});
+
+    EXPECT_THAT(frame, Optional(Eq(fcp::can::frame_t{{'b','u','s','1'}, 12, 48, { 1, 2, 3, 0, 4, 0, 5, 0, 0, 6, 0, 0, 7, 0, 0, 0, 8, 0, 0, 0, 9, 0, 0, 0, 0, 0, 0, 0, 10, 0, 0, 0, 0, 0, 0, 0 }})));
+}
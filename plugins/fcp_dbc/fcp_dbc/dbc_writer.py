@@ -23,17 +23,23 @@
 
 from beartype.typing import Tuple, List, Dict, Any
 from math import ceil
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 
 from cantools.database.can.database import Database as CanDatabase
 from cantools.database.can.message import Message as CanMessage
 from cantools.database.can.signal import Signal as CanSignal
 from cantools.database.can.node import Node as CanNode
+from cantools.database.can.formats.dbc import DbcSpecifics
+from cantools.database.can.formats.dbc.dbc_attribute import DbcAttribute
+from cantools.database.can.formats.dbc.dbc_attribute_definition import (
+    DbcAttributeDefinition,
+)
 
 from fcp.specs.v2 import FcpV2
 from fcp.result import Result, Ok, Err
 from fcp.maybe import catch
 from fcp.encoding import make_encoder, EncodeablePiece, PackedEncoderContext
+from fcp.can.codec import MAX_LENGTH, FD_MAX_LENGTH, fd_length
 
 
 def extract_signals(
@@ -74,7 +80,7 @@ def _make_signals(
     signals: List[CanSignal] = []
     dlc = 0
     msg_bitlength = encoding[-1].bitstart + encoding[-1].bitlength
-    if msg_bitlength > 64:
+    if msg_bitlength > 8 * FD_MAX_LENGTH:
         raise ValueError(f"Message {type} too big. Current length: {msg_bitlength}")
 
     flat_signals: List[Tuple[str, EncodeablePiece]] = []
@@ -120,9 +126,23 @@ def _make_signals(
 
         dlc = max(dlc, ceil((leaf.bitstart + leaf.bitlength) / 8))
 
+    if dlc > MAX_LENGTH:
+        dlc = fd_length(dlc)
+
     return signals, dlc
 
 
+def _fd_specifics() -> DbcSpecifics:
+    """Mark a bus as CAN FD, so that the frame format of its messages is written."""
+    bus_type = DbcAttributeDefinition(
+        "BusType", default_value="CAN", type_name="STRING"
+    )
+    return DbcSpecifics(
+        attributes=OrderedDict([("BusType", DbcAttribute("CAN FD", bus_type))]),
+        attribute_definitions=OrderedDict([("BusType", bus_type)]),
+    )
+
+
 @catch  # type: ignore
 def write_dbc(fcp: FcpV2) -> Result[str, str]:
     """Write dbc."""
@@ -150,6 +170,7 @@ def write_dbc(fcp: FcpV2) -> Result[str, str]:
                 length=dlc,
                 signals=signals,
                 senders=[],
+                is_fd=dlc > MAX_LENGTH,
             )
         )
         device = impl.fields.get("device")
@@ -162,6 +183,11 @@ def write_dbc(fcp: FcpV2) -> Result[str, str]:
             CanDatabase(
                 messages=buses[bus]["messages"],
                 nodes=[CanNode(name=node) for node in buses[bus]["nodes"]],
+                dbc_specifics=(
+                    _fd_specifics()
+                    if any(message.is_fd for message in buses[bus]["messages"])
+                    else None
+                ),
             ),
         )
         for bus in buses
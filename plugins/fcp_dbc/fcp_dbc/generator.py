@@ -20,7 +20,7 @@
 
 """Generator."""
 
-from beartype.typing import Any, Union, Dict, NoReturn
+from beartype.typing import Any, Union, Dict, List, NoReturn
 from pathlib import Path
 
 from fcp.codegen import CodeGenerator
@@ -40,7 +40,7 @@ class Generator(CodeGenerator):
     def __init__(self) -> None:
         pass
 
-    def generate(self, fcp: FcpV2, ctx: Any) -> Dict[str, Union[str, Path]]:
+    def generate(self, fcp: FcpV2, ctx: Any) -> List[Dict[str, Union[str, Path]]]:
         """Generate dbc files."""
         return [
             {
@@ -22,6 +22,7 @@
 
 import os
 import pytest
+import cantools
 from pathlib import Path
 from tempfile import NamedTemporaryFile
 
@@ -72,6 +73,7 @@ def get_bo(dbc: str) -> str:
         "008_simple_array",
         "009_compounded_type_array",
         "010_multiple_bus",
+        "011_can_fd",
     ],
 )  # type: ignore
 def test_dbc_generator(test_name: str) -> None:
@@ -90,6 +92,21 @@ def test_dbc_generator(test_name: str) -> None:
         assert contents == dbc
 
 
+def test_can_fd_frame_format() -> None:
+    fcp_v2 = get_fcp(Path(get_fcp_config("generator", "011_can_fd"))).unwrap()
+    generator = Generator()
+
+    (result,) = generator.generate(fcp_v2, {"output": "output"})
+    contents = result.get("contents")
+    assert isinstance(contents, str)
+    db = cantools.database.load_string(contents, "dbc")
+    assert isinstance(db, cantools.database.can.Database)
+
+    assert db.get_message_by_name("Foo").is_fd
+    assert db.get_message_by_name("Foo").length == 16
+    assert not db.get_message_by_name("Bar").is_fd
+
+
 def test_verifier_no_error() -> None:
     fcp_v2 = get_fcp(Path(get_fcp_config("verifier", "000_no_error"))).unwrap()
 
@@ -124,9 +141,8 @@ def test_encoding_message_to_big() -> None:
 version: "3"
 
 struct Foo {
-    s1 @0: u32,
-    s2 @1: u32,
-    s3 @2: u8,
+    s1 @0: [u64, 8],
+    s2 @1: u8,
 }
 
 device dbc_device {
@@ -20,22 +20,33 @@
 
 """Main."""
 
+import math
+import os
 import sys
 import logging
 import coloredlogs
 from pprint import pprint
+from beartype.typing import Optional
 
 import click
 
 from .version import VERSION
+from .cache import AstCache
 from .parser import get_fcp
 from .codegen import GeneratorManager
 from .verifier import make_general_verifier
 from .error import Logger
-from .serde import encode as serde_encode
 from .describe import describe
 from .specs.type import StructType
 
+from .constants import (
+    CAPTURE_FORMATS,
+    DEFAULT_BITRATE,
+    DEFAULT_DATA_BITRATE,
+    LOG_FORMATS,
+    MAX_LENGTH,
+)
+
 
 def setup_logging() -> None:
     """Setup logger."""
@@ -51,16 +62,22 @@ def setup_logging() -> None:
 @click.argument("output")  # type: ignore
 @click.option("--templates")  # type: ignore
 @click.option("--skel")  # type: ignore
+@click.option(
+    "--jobs", "-j", default=1, help="Number of processes used to parse modules."
+)  # type: ignore
+@click.pass_obj  # type: ignore
 def generate_cmd(
+    cache: Optional[AstCache],
     generator: str,
     fcp: str,
     output: str,
     templates: str,
     skel: str,
+    jobs: int,
 ) -> None:
     """Run generator."""
     logger = Logger({})
-    r = get_fcp(fcp, logger)
+    r = get_fcp(fcp, logger, cache=cache, jobs=jobs)
     if r.is_err():
         print(logger.error(r.err().results_in("Failed to generate fcp")))
         return
@@ -75,10 +92,11 @@ def generate_cmd(
 
 @click.command()  # type: ignore
 @click.argument("fcp")  # type: ignore
-def show(fcp: str) -> None:
+@click.pass_obj  # type: ignore
+def show(cache: Optional[AstCache], fcp: str) -> None:
     """Show fcp schema as dictionary."""
     logger = Logger({})
-    fcp_v2 = get_fcp(fcp, logger)
+    fcp_v2 = get_fcp(fcp, logger, cache=cache)
 
     if fcp_v2.is_err():
         print(logger.error(fcp_v2.err()))
@@ -90,15 +108,20 @@ def show(fcp: str) -> None:
 @click.argument("fcp_schema")  # type: ignore
 @click.argument("fcp_data")  # type: ignore
 @click.argument("output")  # type: ignore
-def encode(fcp_schema: str, fcp_data: str, output: str) -> None:
+@click.pass_obj  # type: ignore
+def encode(
+    cache: Optional[AstCache], fcp_schema: str, fcp_data: str, output: str
+) -> None:
     """Encode an .fcp according to the data in the reflection schema."""
+    from .serde import encode as serde_encode
+
     logger = Logger({})
-    fcp_schema_ = get_fcp(fcp_schema, logger)
+    fcp_schema_ = get_fcp(fcp_schema, logger, cache=cache)
     if fcp_schema_.is_err():
         print(logger.error(fcp_schema_.err()))
         return
 
-    fcp_data_ = get_fcp(fcp_data, logger)
+    fcp_data_ = get_fcp(fcp_data, logger, cache=cache)
     if fcp_data_.is_err():
         print(logger.error(fcp_data_.err()))
         return
@@ -111,9 +134,10 @@ def encode(fcp_schema: str, fcp_data: str, output: str) -> None:
 @click.command("describe")  # type: ignore
 @click.argument("fcp")  # type: ignore
 @click.argument("type")  # type: ignore
-def _describe(fcp: str, type: str) -> None:
+@click.pass_obj  # type: ignore
+def _describe(cache: Optional[AstCache], fcp: str, type: str) -> None:
     logger = Logger({})
-    fcp_schema = get_fcp(fcp, logger)
+    fcp_schema = get_fcp(fcp, logger, cache=cache)
 
     if fcp_schema.is_err():
         print(logger.error(fcp_schema.err()))
@@ -121,20 +145,286 @@ def _describe(fcp: str, type: str) -> None:
     print(describe(fcp_schema.unwrap(), StructType(type)))  # type: ignore
 
 
+@click.command("decode-log")  # type: ignore
+@click.argument("fcp")  # type: ignore
+@click.argument("struct")  # type: ignore
+@click.argument("capture")  # type: ignore
+@click.argument("output")  # type: ignore
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(CAPTURE_FORMATS),
+    help="Output format, guessed from the output suffix by default.",
+)  # type: ignore
+@click.option(
+    "--jobs",
+    "-j",
+    type=int,
+    help="Number of processes used to decode the capture, all cores by default.",
+)  # type: ignore
+@click.pass_obj  # type: ignore
+def decode_log(
+    cache: Optional[AstCache],
+    fcp: str,
+    struct: str,
+    capture: str,
+    output: str,
+    format_: Optional[str],
+    jobs: Optional[int],
+) -> None:
+    """Decode a capture of back-to-back serde encoded structs."""
+    from .serde.parallel import decode_capture
+
+    logger = Logger({})
+    fcp_schema = get_fcp(fcp, logger, cache=cache)
+
+    if fcp_schema.is_err():
+        print(logger.error(fcp_schema.err()))
+        return
+    if fcp_schema.unwrap().get_struct(struct).is_nothing():
+        raise click.ClickException(f"Unknown struct {struct}")
+
+    try:
+        decode_capture(fcp_schema.unwrap(), struct, capture, output, format_, jobs)
+    except (OSError, ValueError) as e:
+        raise click.ClickException(str(e))
+
+
+@click.command("can-decode")  # type: ignore
+@click.argument("fcp")  # type: ignore
+@click.argument("log")  # type: ignore
+@click.argument("output")  # type: ignore
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(LOG_FORMATS),
+    help="Log format, guessed from the log suffix by default.",
+)  # type: ignore
+@click.option("--bus", help="Only decode the messages of this bus.")  # type: ignore
+@click.pass_obj  # type: ignore
+def can_decode(
+    cache: Optional[AstCache],
+    fcp: str,
+    log: str,
+    output: str,
+    format_: Optional[str],
+    bus: Optional[str],
+) -> None:
+    """Decode a CAN log into an .npz file with a table per message."""
+    from .can import CanCodec
+    from .can.log import decode_log as decode_can_log, save_tables
+
+    logger = Logger({})
+    fcp_schema = get_fcp(fcp, logger, cache=cache)
+
+    if fcp_schema.is_err():
+        print(logger.error(fcp_schema.err()))
+        return
+
+    try:
+        tables = decode_can_log(CanCodec(fcp_schema.unwrap(), bus), log, format_)
+        save_tables(output, tables)
+    except (ImportError, OSError, ValueError) as e:
+        raise click.ClickException(str(e))
+
+    for name, table in tables.items():
+        print(f"{name}: {len(table)} frames")
+
+
+@click.command("can-analyze")  # type: ignore
+@click.argument("fcp")  # type: ignore
+@click.option(
+    "--bitrate", default=DEFAULT_BITRATE, help="Bitrate of every bus in bit/s."
+)  # type: ignore
+@click.option(
+    "--data-bitrate",
+    default=DEFAULT_DATA_BITRATE,
+    help="Data phase bitrate of CAN FD frames in bit/s.",
+)  # type: ignore
+@click.option("--bus", help="Only analyze this bus.")  # type: ignore
+@click.pass_obj  # type: ignore
+def can_analyze(
+    cache: Optional[AstCache],
+    fcp: str,
+    bitrate: int,
+    data_bitrate: int,
+    bus: Optional[str],
+) -> None:
+    """Report the worst-case load and response times of the CAN buses."""
+    from .can.analysis import analyze as analyze_can
+
+    logger = Logger({})
+    fcp_schema = get_fcp(fcp, logger, cache=cache)
+
+    if fcp_schema.is_err():
+        print(logger.error(fcp_schema.err()))
+        return
+
+    try:
+        buses = analyze_can(fcp_schema.unwrap(), bitrate, bus, data_bitrate)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    missed = 0
+    for timing in buses.values():
+        print(
+            f"Bus {timing.bus}: {len(timing.frames)} frames, "
+            f"{timing.utilization:.1%} load at {timing.bitrate} bit/s"
+        )
+        for frame in timing.frames:
+            period = "-" if frame.period is None else f"{frame.period * 1000:g}ms"
+            response = (
+                "unbounded"
+                if math.isinf(frame.response)
+                else f"{frame.response * 1000:.3f}ms"
+            )
+            length = (
+                f"CAN FD {frame.length} bytes" if frame.fd else f"dlc {frame.length}"
+            )
+            print(
+                f"  {frame.frame_id:#x} {frame.name}: {length}, "
+                f"period {period}, response {response}"
+                + (", DEADLINE MISS" if frame.missed else "")
+            )
+        missed += len(timing.missed)
+
+    if missed:
+        raise click.ClickException(f"{missed} frames can miss their deadline")
+
+
+@click.command("packing-savings")  # type: ignore
+@click.argument("fcp")  # type: ignore
+@click.option(
+    "--protocol", default="can", help="Protocol of the impls to optimize."
+)  # type: ignore
+@click.pass_obj  # type: ignore
+def packing_savings(cache: Optional[AstCache], fcp: str, protocol: str) -> None:
+    """Compare optimized and packed layouts of the impls of a protocol."""
+    from .encoding import OptimizedEncoder, PackedEncoderContext
+
+    logger = Logger({})
+    fcp_schema = get_fcp(fcp, logger, cache=cache)
+
+    if fcp_schema.is_err():
+        print(logger.error(fcp_schema.err()))
+        return
+
+    schema = fcp_schema.unwrap()
+    encoder = OptimizedEncoder(schema, PackedEncoderContext().with_unroll_arrays(True))
+    saved_bytes = 0
+    saved_crossings = 0
+    try:
+        for impl in schema.get_matching_impls(protocol):
+            savings = encoder.savings(impl)
+            saved_bytes += savings.saved_bytes
+            saved_crossings += savings.saved_crossings
+            print(
+                f"{impl.name}: {savings.packed_length} -> {savings.length} bytes, "
+                f"{savings.packed_crossings} -> {savings.crossings} byte crossings"
+            )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    print(f"Saved {saved_bytes} bytes and {saved_crossings} byte crossings")
+
+
+def _read(filename: str) -> str:
+    with open(filename) as f:
+        return f.read()
+
+
+@click.command("can-consolidate")  # type: ignore
+@click.argument("fcp")  # type: ignore
+@click.option(
+    "--max-length", default=MAX_LENGTH, help="Maximum frame length in bytes."
+)  # type: ignore
+@click.option(
+    "--bitrate", default=DEFAULT_BITRATE, help="Bus bitrate in bit/s."
+)  # type: ignore
+@click.option(
+    "--data-bitrate",
+    default=DEFAULT_DATA_BITRATE,
+    help="Data phase bitrate of CAN FD frames in bit/s.",
+)  # type: ignore
+@click.option(
+    "--output", help="Directory to write the rewritten schema modules to."
+)  # type: ignore
+@click.pass_obj  # type: ignore
+def can_consolidate(
+    cache: Optional[AstCache],
+    fcp: str,
+    max_length: int,
+    bitrate: int,
+    data_bitrate: int,
+    output: Optional[str],
+) -> None:
+    """Plan merging periodic CAN frames of the same device and period."""
+    from .can.consolidation import plan_consolidation, rewrite_schema
+
+    logger = Logger({})
+    fcp_schema = get_fcp(fcp, logger, cache=cache)
+
+    if fcp_schema.is_err():
+        print(logger.error(fcp_schema.err()))
+        return
+
+    schema = fcp_schema.unwrap()
+    try:
+        plan = plan_consolidation(schema, max_length, bitrate, data_bitrate)
+        sources = rewrite_schema(schema, plan, _read) if output else {}
+    except (OSError, ValueError) as e:
+        raise click.ClickException(str(e))
+
+    for frame in plan.frames:
+        members = ", ".join(impl.name for impl in frame.members)
+        print(
+            f"{frame.name} ({frame.frame_id:#x}, {frame.length} bytes, "
+            f"{frame.period}ms): {members}"
+        )
+    for bus, load in plan.load_before.items():
+        print(f"Bus {bus}: {load:.1%} -> {plan.load_after[bus]:.1%} load")
+
+    for filename, source in sources.items():
+        path = os.path.join(
+            output or ".", os.path.relpath(filename, os.path.dirname(fcp))
+        )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(source)
+
+
 @click.group(invoke_without_command=True)  # type: ignore
 @click.option("--version", is_flag=True, default=False)  # type: ignore
-def main(version: str) -> None:
+@click.option(
+    "--no-cache", is_flag=True, default=False, help="Always parse fcp schemas."
+)  # type: ignore
+@click.option(
+    "--clear-cache", is_flag=True, default=False, help="Clear parsed schema cache."
+)  # type: ignore
+@click.pass_context  # type: ignore
+def main(ctx: click.Context, version: str, no_cache: bool, clear_cache: bool) -> None:
     """CLI utility for management of FCP JSON files."""
     if len(sys.argv) == 1:
         print("fcp cli util.\nVersion:", VERSION, "\nFor usage see fcp --help")
     if version:
         click.echo(VERSION)
 
+    cache = AstCache()
+    if clear_cache:
+        cache.clear()
+
+    ctx.obj = None if no_cache else cache
+
 
 main.add_command(generate_cmd)
 main.add_command(show)
 main.add_command(encode)
 main.add_command(_describe)
+main.add_command(decode_log)
+main.add_command(can_decode)
+main.add_command(can_analyze)
+main.add_command(packing_savings)
+main.add_command(can_consolidate)
 
 if __name__ == "__main__":
     setup_logging()
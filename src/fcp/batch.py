@@ -0,0 +1,291 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Columnar batch decoding of fcp structs into NumPy arrays.
+
+``decode_batch`` decodes many frames of the same struct at once and returns a
+column per leaf field. Columns are named after the path of the field inside
+the struct, with nested fields separated by ``/``. Fields inside fixed size
+arrays get one extra dimension per array.
+
+Structs with a fixed layout (integers, floats and fixed size arrays and
+structs of them) are decoded with shift and mask operations over the whole
+batch. Structs with strings, dynamic arrays or optionals are decoded row by
+row with :func:`fcp.codec.compile_codec`, their variable sized fields become
+columns of python objects.
+
+NumPy is an optional dependency, install it with ``pip install fcp[numpy]``.
+"""
+
+from beartype.typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .codec import BufferOverrun, compile_codec
+from .specs.v2 import FcpV2
+from .specs.type import (
+    Type,
+    ArrayType,
+    StructType,
+    UnsignedType,
+    SignedType,
+    FloatType,
+    DoubleType,
+)
+
+
+def _import_numpy(feature: str = "decode_batch") -> Any:
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError(
+            f"{feature} requires numpy, install it with `pip install fcp[numpy]`"
+        ) from e
+
+    return numpy
+
+
+def _join(path: str, name: str) -> str:
+    return f"{path}/{name}" if path else name
+
+
+def _is_integer(type: Type) -> bool:
+    return isinstance(type, UnsignedType) or isinstance(type, SignedType)
+
+
+def _is_number(type: Type) -> bool:
+    return (
+        _is_integer(type) or isinstance(type, FloatType) or isinstance(type, DoubleType)
+    )
+
+
+def _dtype(np: Any, type: Type) -> Any:
+    if isinstance(type, FloatType):
+        return np.float32
+    elif isinstance(type, DoubleType):
+        return np.float64
+
+    width = next(width for width in (8, 16, 32, 64) if type.get_length() <= width)
+    return np.dtype(f"{'i' if isinstance(type, SignedType) else 'u'}{width // 8}")
+
+
+class _Column:
+    """Leaf field of a struct and the bit offsets of its elements."""
+
+    def __init__(self, type: Type, shape: Tuple[int, ...]) -> None:
+        self.type = type
+        self.shape = shape
+        self.offsets: List[int] = []
+
+
+class _Layout:
+    """Static layout of a struct, if it has one."""
+
+    def __init__(self, fcp: FcpV2) -> None:
+        self.fcp = fcp
+        self.columns: Dict[str, _Column] = {}
+        self.bitaddr = 0
+
+    def visit(self, type: Type, path: str, shape: Tuple[int, ...], live: bool) -> bool:
+        if _is_number(type):
+            column = self.columns.setdefault(path, _Column(type, shape))
+            if not live:
+                return True
+            if not _is_integer(type):
+                self.bitaddr = (self.bitaddr + 7) & ~7
+            column.offsets.append(self.bitaddr)
+            self.bitaddr += type.get_length()
+            return True
+        elif isinstance(type, ArrayType):
+            shape = shape + (type.size,)
+            if type.size == 0:
+                return self.visit(type.underlying_type, path, shape, False)
+            return all(
+                self.visit(type.underlying_type, path, shape, live)
+                for _ in range(type.size)
+            )
+        elif isinstance(type, StructType):
+            struct = self.fcp.get_struct(type.name).unwrap()
+            return all(
+                self.visit(field.type, _join(path, field.name), shape, live)
+                for field in struct.fields
+            )
+
+        return False
+
+    def size(self) -> int:
+        return (self.bitaddr + 7) >> 3
+
+
+def _get_layout(fcp: FcpV2, name: str) -> Optional[_Layout]:
+    layout = _Layout(fcp)
+    if not layout.visit(StructType(name), "", (), True):
+        return None
+    return layout
+
+
+def _columns(fcp: FcpV2, type: Type, path: str) -> List[Tuple[str, Type]]:
+    if isinstance(type, ArrayType):
+        return _columns(fcp, type.underlying_type, path)
+    elif isinstance(type, StructType):
+        struct = fcp.get_struct(type.name).unwrap()
+        return [
+            column
+            for field in struct.fields
+            for column in _columns(fcp, field.type, _join(path, field.name))
+        ]
+
+    return [(path, type)]
+
+
+def _leaves(fcp: FcpV2, type: Type, path: str, value: Any) -> Dict[str, Any]:
+    if isinstance(type, ArrayType):
+        elements = [_leaves(fcp, type.underlying_type, path, x) for x in value]
+        return {
+            column: [element[column] for element in elements]
+            for column, _ in _columns(fcp, type.underlying_type, path)
+        }
+    elif isinstance(type, StructType):
+        struct = fcp.get_struct(type.name).unwrap()
+        leaves: Dict[str, Any] = {}
+        for field in struct.fields:
+            leaves.update(
+                _leaves(fcp, field.type, _join(path, field.name), value[field.name])
+            )
+        return leaves
+
+    return {path: value}
+
+
+def _to_signed(np: Any, words: Any, bits: int, dtype: Any) -> Any:
+    """Sign extend the two's complement words of a signed field."""
+    shift = np.uint64(64 - bits)
+    return ((words << shift).astype(np.int64) >> shift.astype(np.int64)).astype(dtype)
+
+
+def _as_matrix(np: Any, frames: Any, size: int) -> Any:
+    """Copy the first ``size`` bytes of every frame into a zero padded matrix."""
+    if isinstance(frames, np.ndarray):
+        if frames.ndim != 2 or frames.dtype != np.uint8:
+            raise ValueError("frames must be a 2-D uint8 array")
+        if frames.shape[1] < size:
+            raise BufferOverrun("buffer overrun")
+        rows = frames[:, :size]
+    elif not isinstance(frames, list):
+        return _as_matrix(np, list(frames), size)
+    elif len(set(map(len, frames))) == 1 and len(frames[0]) >= size:
+        data = np.frombuffer(b"".join(frames), dtype=np.uint8)
+        rows = data.reshape(len(frames), -1)[:, :size]
+    else:
+        data = []
+        for frame in frames:
+            view = memoryview(frame).cast("B")
+            if len(view) < size:
+                raise BufferOverrun("buffer overrun")
+            data.append(view[:size])
+        rows = np.frombuffer(b"".join(data), dtype=np.uint8).reshape(len(data), size)
+
+    # Padding lets every field read 9 bytes without bounds checks.
+    matrix = np.zeros((rows.shape[0], size + 8), dtype=np.uint8)
+    matrix[:, :size] = rows
+    return matrix
+
+
+def _extract(np: Any, matrix: Any, column: _Column) -> Any:
+    offsets = np.array(column.offsets, dtype=np.int64)
+    start = offsets >> 3
+    bits = column.type.get_length()
+
+    if not _is_integer(column.type):
+        data = matrix[:, start[:, None] + np.arange(bits // 8)]
+        return np.ascontiguousarray(data).view(_dtype(np, column.type))[..., 0]
+
+    shift = (offsets & 7).astype(np.uint64)
+    span = (bits + 14) >> 3
+    data = matrix[:, start[:, None] + np.arange(span)]
+
+    words = np.zeros(data.shape[:2], dtype=np.uint64)
+    for i in range(min(span, 8)):
+        words |= data[..., i].astype(np.uint64) << np.uint64(8 * i)
+    words >>= shift
+    if span > 8:
+        # Shift in two steps, shifting an uint64 by 64 is undefined.
+        high = data[..., 8].astype(np.uint64) << (np.uint64(63) - shift)
+        words |= high << np.uint64(1)
+    if bits < 64:
+        words &= np.uint64((1 << bits) - 1)
+
+    if isinstance(column.type, SignedType):
+        return _to_signed(np, words, bits, _dtype(np, column.type))
+    return words.astype(_dtype(np, column.type))
+
+
+def _decode_fixed(np: Any, layout: _Layout, frames: Any) -> Dict[str, Any]:
+    matrix = _as_matrix(np, frames, layout.size())
+
+    columns = {}
+    for path, column in layout.columns.items():
+        values = _extract(np, matrix, column)
+        columns[path] = values.reshape((matrix.shape[0],) + column.shape)
+    return columns
+
+
+def _to_columns(
+    np: Any, fcp: FcpV2, name: str, records: Sequence[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Build the columns of decoded records of the struct ``name``."""
+    rows = [_leaves(fcp, StructType(name), "", record) for record in records]
+
+    columns = {}
+    for path, type in _columns(fcp, StructType(name), ""):
+        values = [row[path] for row in rows]
+        if not _is_number(type):
+            column = np.empty(len(values), dtype=object)
+            for i, value in enumerate(values):
+                column[i] = value
+        elif isinstance(type, SignedType):
+            words = np.array(values, dtype=object) % (1 << type.get_length())
+            column = _to_signed(
+                np, words.astype(np.uint64), type.get_length(), _dtype(np, type)
+            )
+        else:
+            column = np.array(values, dtype=_dtype(np, type))
+        columns[path] = column
+    return columns
+
+
+def _decode_rows(np: Any, fcp: FcpV2, name: str, frames: Any) -> Dict[str, Any]:
+    decode = compile_codec(fcp, name).decode
+    return _to_columns(np, fcp, name, [decode(bytes(frame)) for frame in frames])
+
+
+def decode_batch(fcp: FcpV2, name: str, frames: Sequence[Any]) -> Dict[str, Any]:
+    """Decode many frames of the struct ``name`` into columns.
+
+    ``frames`` is a sequence of bytes-like objects or a 2-D ``uint8`` array
+    with one frame per row. Returns a dictionary of NumPy arrays, one per leaf
+    field, with one row per frame. Values are the same as decoded by
+    :func:`fcp.serde.decode`.
+    """
+    np = _import_numpy()
+    fcp.get_struct(name).unwrap()
+
+    layout = _get_layout(fcp, name)
+    if layout is not None:
+        return _decode_fixed(np, layout, frames)
+    return _decode_rows(np, fcp, name, frames)
@@ -0,0 +1,145 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Persistent cache of parsed fcp ASTs.
+
+Entries are stored under ``$FCP_CACHE_DIR`` (default: ``~/.cache/fcp``) and
+are keyed by the path and source code of a schema file, the fcp version and the
+working directory, which the file names stored in the AST are relative to.
+Each entry records the hash of every module it imports, an entry is only used
+while all of them are unchanged. The compiled tables of the LALR parser are
+kept in the same directory.
+"""
+
+from beartype.typing import Callable, Dict, Optional, Tuple
+import hashlib
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+from .maybe import Maybe, Some, Nothing
+from .specs.v2 import FcpV2
+from .version import VERSION
+
+CACHE_FORMAT = 1
+
+
+def _digest(source: str) -> str:
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def default_cache_dir() -> Path:
+    """Get the default cache directory."""
+    if "FCP_CACHE_DIR" in os.environ:
+        return Path(os.environ["FCP_CACHE_DIR"])
+
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "fcp"
+
+
+class AstCache:
+    """On-disk cache of parsed fcp ASTs."""
+
+    def __init__(self, directory: Optional[Path] = None) -> None:
+        self.directory = (
+            Path(directory) if directory is not None else default_cache_dir()
+        )
+
+    def _key(self, filename: Path, source: str) -> str:
+        key = hashlib.sha256()
+        parts = (
+            str(CACHE_FORMAT),
+            VERSION,
+            os.getcwd(),
+            str(filename.resolve()),
+            source,
+        )
+        for part in parts:
+            key.update(part.encode("utf-8"))
+            key.update(b"\0")
+        return key.hexdigest()
+
+    def _entry_path(self, filename: Path, source: str) -> Path:
+        return self.directory / (self._key(filename, source) + ".pickle")
+
+    def get(
+        self, filename: Path, source: str, read: Callable[[Path], str]
+    ) -> Maybe[Tuple[FcpV2, Dict[Path, str]]]:
+        """Get the cached AST of a schema file and the sources it was built from.
+
+        Imported modules are read with ``read`` and compared against the hashes
+        stored in the entry.
+        """
+        try:
+            with open(self._entry_path(filename, source), "rb") as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+            return Nothing()
+
+        sources: Dict[Path, str] = {}
+        for path, digest in entry["dependencies"].items():
+            try:
+                dependency_source = read(Path(path))
+            except OSError:
+                return Nothing()
+
+            if _digest(dependency_source) != digest:
+                return Nothing()
+            sources[Path(path)] = dependency_source
+
+        return Some((entry["fcp"], sources))
+
+    def put(
+        self, filename: Path, source: str, fcp: FcpV2, dependencies: Dict[Path, str]
+    ) -> None:
+        """Store the AST of a schema file and the sources it was built from."""
+        entry = {
+            "fcp": fcp,
+            "dependencies": {
+                str(path.resolve()): _digest(dependency_source)
+                for path, dependency_source in dependencies.items()
+            },
+        }
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except OSError:
+            return
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entry, f)
+            os.replace(tmp_name, self._entry_path(filename, source))
+        except OSError:
+            os.unlink(tmp_name)
+
+    def clear(self) -> None:
+        """Remove every cache entry and the parser tables.
+
+        Other files in the directory are kept.
+        """
+        entries = list(self.directory.glob("*.pickle"))
+        for entry in entries + list(self.directory.glob("*.tables")):
+            try:
+                entry.unlink()
+            except OSError:
+                pass
@@ -0,0 +1,278 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Bus load and worst-case response time analysis of CAN schedules.
+
+Frame lengths come from the packed encoder layouts of the ``can`` impls and
+periods from their ``period`` field, in milliseconds. Transmission times
+include worst-case bit stuffing, and response times are computed with the
+revised response time analysis of Davis et al., "Controller Area Network
+(CAN) schedulability analysis: Refuted, revisited and revised" (2007), for
+frames without jitter whose deadline is their period.
+
+Frames longer than 8 bytes are CAN FD frames with bit rate switching, their
+length is rounded up to a CAN FD data length and the bits from the ESI bit to
+the CRC are sent at the data bitrate. Times are then in bit times of the
+nominal bitrate, which the arbitration runs at.
+
+Frames without a period still block lower priority frames and get a
+response time for a single instance, but are not counted as interference of
+higher priority frames since their rate is unknown.
+"""
+
+from dataclasses import dataclass, field
+from beartype.typing import Dict, List, Optional, Tuple
+import math
+
+from .codec import MAX_LENGTH, fd_length
+from ..constants import (
+    DEFAULT_BITRATE as DEFAULT_BITRATE,
+    DEFAULT_DATA_BITRATE as DEFAULT_DATA_BITRATE,
+)
+from ..encoding import PackedEncoderContext, make_encoder
+from ..specs.v2 import FcpV2
+
+MAX_STANDARD_ID = 0x7FF
+
+
+def frame_bits(length: int, extended: bool = False) -> int:
+    """Worst-case number of bits of a frame of ``length`` data bytes.
+
+    Includes stuff bits, the inter-frame space and the end of frame.
+    """
+    header = 54 if extended else 34
+    return header + 8 * length + 13 + (header + 8 * length - 1) // 4
+
+
+def fd_frame_bits(length: int, extended: bool = False) -> Tuple[int, int]:
+    """Worst-case number of bits of a CAN FD frame of ``length`` data bytes.
+
+    Returns the bits sent at the nominal bitrate, the arbitration field and
+    the end of frame, and the bits sent at the data bitrate, from the ESI bit
+    to the CRC. Includes dynamic stuff bits, the fixed stuff bits of the CRC
+    field, the inter-frame space and the end of frame.
+    """
+    header = 36 if extended else 17
+    data = 5 + 8 * length
+    crc = 17 if length <= 16 else 21
+    header_stuff = (header - 1) // 4
+    data_stuff = (header + data - 1) // 4 - header_stuff
+    return (
+        header + header_stuff + 13,
+        data + data_stuff + 4 + crc + (4 + crc + 3) // 4,
+    )
+
+
+def transmission_bits(
+    length: int,
+    extended: bool = False,
+    bitrate: int = DEFAULT_BITRATE,
+    data_bitrate: int = DEFAULT_DATA_BITRATE,
+) -> float:
+    """Worst-case transmission time of a frame in nominal bit times.
+
+    Frames of more than 8 data bytes are CAN FD frames, ``length`` is then
+    rounded up to a CAN FD data length.
+    """
+    if length <= MAX_LENGTH:
+        return frame_bits(length, extended)
+
+    nominal, data = fd_frame_bits(fd_length(length), extended)
+    return nominal + data * bitrate / data_bitrate
+
+
+@dataclass
+class FrameTiming:
+    """Timing of a frame, times are in seconds."""
+
+    name: str
+    frame_id: int
+    length: int
+    period: Optional[float]
+    transmission: float
+    response: float = 0.0
+
+    @property
+    def extended(self) -> bool:
+        """Whether the frame has a 29 bit id."""
+        return self.frame_id > MAX_STANDARD_ID
+
+    @property
+    def fd(self) -> bool:
+        """Whether the frame is a CAN FD frame."""
+        return self.length > MAX_LENGTH
+
+    @property
+    def missed(self) -> bool:
+        """Whether the frame can miss its deadline.
+
+        The response time of those frames is a lower bound, the analysis stops
+        once it is past the deadline.
+        """
+        return self.period is not None and self.response > self.period
+
+    def priority(self) -> Tuple[int, bool, int]:
+        """Arbitration order, lower is higher priority."""
+        if self.extended:
+            return (self.frame_id >> 18, True, self.frame_id)
+        return (self.frame_id, False, self.frame_id)
+
+
+@dataclass
+class BusTiming:
+    """Timing of the frames of a bus, in priority order."""
+
+    bus: str
+    bitrate: int
+    frames: List[FrameTiming] = field(default_factory=list)
+
+    @property
+    def utilization(self) -> float:
+        """Worst-case fraction of the bus time used by periodic frames."""
+        return sum(
+            frame.transmission / frame.period
+            for frame in self.frames
+            if frame.period is not None
+        )
+
+    @property
+    def missed(self) -> List[FrameTiming]:
+        """Frames that can miss their deadline."""
+        return [frame for frame in self.frames if frame.missed]
+
+
+def _response_times(frames: List[Tuple[float, Optional[float]]]) -> List[float]:
+    """Worst-case response times of frames in priority order.
+
+    Frames are ``(transmission time, period)`` in bit times, and so are the
+    results. Higher priority frames are grouped by period, so every
+    interference sum is over the distinct periods instead of the frames.
+    """
+    # Blocking by the longest lower priority frame.
+    blocking = [0.0] * (len(frames) + 1)
+    for i in range(len(frames) - 1, -1, -1):
+        blocking[i] = max(blocking[i + 1], frames[i][0])
+
+    interference: Dict[float, float] = {}
+    utilization = 0.0
+    responses: List[float] = []
+
+    def queuing(b: float, w: float, deadline: float) -> float:
+        """Smallest fixed point of ``w = b + interference(w)``."""
+        while True:
+            new = b + sum(
+                math.ceil((w + 1) / period) * c for period, c in interference.items()
+            )
+            if new == w or new > deadline:
+                return new
+            w = new
+
+    for i, (c, period) in enumerate(frames):
+        b = blocking[i + 1]
+
+        if utilization + (0 if period is None else c / period) >= 1:
+            responses.append(math.inf)
+        elif period is None:
+            responses.append(queuing(b, b, math.inf) + c)
+        else:
+            # Length of the busy period that the frame is in.
+            t: float = c
+            while True:
+                new = b + sum(
+                    math.ceil(t / p) * cp
+                    for p, cp in list(interference.items()) + [(period, c)]
+                )
+                if new == t:
+                    break
+                t = new
+
+            response = 0.0
+            w: float = b
+            for q in range(math.ceil(t / period)):
+                w = queuing(b + q * c, max(w, b + q * c), (q + 1) * period - c)
+                response = max(response, w - q * period + c)
+                if response > period:
+                    break
+            responses.append(response)
+
+        if period is not None:
+            interference[period] = interference.get(period, 0) + c
+            utilization += c / period
+
+    return responses
+
+
+def analyze(
+    fcp: FcpV2,
+    bitrate: int = DEFAULT_BITRATE,
+    bus: Optional[str] = None,
+    data_bitrate: int = DEFAULT_DATA_BITRATE,
+) -> Dict[str, BusTiming]:
+    """Analyze the ``can`` impls of every bus, or only of ``bus``.
+
+    Schemas don't specify bus bitrates, every bus is analyzed at ``bitrate``
+    and ``data_bitrate`` is the bitrate of the data phase of CAN FD frames.
+    """
+    encoder = make_encoder(
+        "packed", fcp, PackedEncoderContext().with_unroll_arrays(True)
+    )
+
+    buses: Dict[str, BusTiming] = {}
+    for impl in fcp.get_matching_impls("can"):
+        impl_bus = impl.get_field("bus", "default").unwrap()
+        if bus is not None and impl_bus != bus:
+            continue
+
+        frame_id = impl.fields.get("id")
+        if not isinstance(frame_id, int):
+            raise ValueError(f"No id field found in impl {impl.name}")
+
+        encoding = encoder.generate(impl)
+        bitlength = max((v.bitstart + v.bitlength for v in encoding), default=0)
+        length = (bitlength + 7) >> 3
+        period = impl.fields.get("period")
+        frame = FrameTiming(
+            impl.name,
+            frame_id,
+            fd_length(length) if length > MAX_LENGTH else length,
+            period / 1000 if isinstance(period, (int, float)) and period > 0 else None,
+            0.0,
+        )
+        bits = transmission_bits(frame.length, frame.extended, bitrate, data_bitrate)
+        frame.transmission = bits / bitrate
+        buses.setdefault(impl_bus, BusTiming(impl_bus, bitrate)).frames.append(frame)
+
+    for timing in buses.values():
+        timing.frames.sort(key=FrameTiming.priority)
+        responses = _response_times(
+            [
+                (
+                    transmission_bits(
+                        frame.length, frame.extended, bitrate, data_bitrate
+                    ),
+                    None if frame.period is None else frame.period * bitrate,
+                )
+                for frame in timing.frames
+            ]
+        )
+        for frame, response in zip(timing.frames, responses):
+            frame.response = response / bitrate
+
+    return buses
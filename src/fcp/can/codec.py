@@ -0,0 +1,357 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Runtime codec of the CAN frames described by the ``can`` impls of a schema.
+
+Message layouts come from the packed encoder, the same as for the dbc and
+can_c generators. Every signal gets its shift, mask, sign, scale and offset
+computed once, and python source code is generated for the decode and encode
+functions of every message. Those work on the frame data as a single little
+endian integer.
+
+Signals are named after the values of the packed encoder with unrolled
+arrays: ``parent::child`` for fields of nested structs and ``name_<i>`` for
+array elements. Physical values are ``raw * scale + offset``, where ``scale``
+and ``offset`` are fields of the impl signal. Enums are decoded to their
+integer values and multiplexed signals to the value for the multiplexer of
+the frame.
+"""
+
+from beartype.typing import Any, Callable, Dict, List, Optional
+import struct
+
+from ..constants import FD_MAX_LENGTH as FD_MAX_LENGTH, MAX_LENGTH as MAX_LENGTH
+from ..encoding import PackedEncoderContext, Value, make_encoder
+from ..specs.impl import Impl
+from ..specs.v2 import FcpV2
+from ..specs.type import SignedType, FloatType, DoubleType
+
+# Data lengths of CAN FD frames, indexed by their data length code.
+FD_LENGTHS = (0, 1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 32, 48, 64)
+
+
+def _short_frame(name: str, length: int) -> None:
+    raise ValueError(f"Frame of message {name} is shorter than {length} bytes")
+
+
+_NAMESPACE = {
+    "_short_frame": _short_frame,
+    "_from_bytes": int.from_bytes,
+    "_pack_f": struct.Struct("<f").pack,
+    "_pack_d": struct.Struct("<d").pack,
+    "_unpack_f": struct.Struct("<f").unpack,
+    "_unpack_d": struct.Struct("<d").unpack,
+}
+
+
+class CanSignal:
+    """Bit layout and scaling of a signal of a CAN message.
+
+    ``kind`` is one of ``unsigned``, ``signed``, ``float`` or ``double``.
+    Big endian signals have the bytes of their bit field reversed.
+    """
+
+    __slots__ = (
+        "name",
+        "shift",
+        "length",
+        "mask",
+        "kind",
+        "big_endian",
+        "scale",
+        "offset",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        shift: int,
+        length: int,
+        kind: str = "unsigned",
+        big_endian: bool = False,
+        scale: float = 1,
+        offset: float = 0,
+    ) -> None:
+        if big_endian and length % 8:
+            raise ValueError(f"Big endian signal {name} is not a whole number of bytes")
+
+        self.name = name
+        self.shift = shift
+        self.length = length
+        self.mask = (1 << length) - 1
+        self.kind = kind
+        self.big_endian = big_endian
+        self.scale = scale
+        self.offset = offset
+
+    @property
+    def signed(self) -> bool:
+        """Whether the raw value is a two's complement integer."""
+        return self.kind == "signed"
+
+    def is_scaled(self) -> bool:
+        """Whether the physical value differs from the raw value."""
+        return self.scale != 1 or self.offset != 0
+
+    def __repr__(self) -> str:
+        return f"CanSignal name={self.name} shift={self.shift} length={self.length} kind={self.kind}"
+
+
+def _kind(value: Value) -> str:
+    if isinstance(value.type, FloatType):
+        return "float"
+    elif isinstance(value.type, DoubleType):
+        return "double"
+    elif isinstance(value.type, SignedType):
+        return "signed"
+    return "unsigned"
+
+
+def fd_length(length: int) -> int:
+    """Round a number of data bytes up to the data length of a CAN FD frame."""
+    for fd in FD_LENGTHS:
+        if length <= fd:
+            return fd
+    raise ValueError(f"CAN FD frames carry at most {FD_MAX_LENGTH} bytes, not {length}")
+
+
+def dlc_code(length: int) -> int:
+    """Get the data length code of a frame of ``length`` data bytes.
+
+    Lengths above 8 bytes are rounded up to a CAN FD data length.
+    """
+    return FD_LENGTHS.index(fd_length(length))
+
+
+def dlc_length(dlc: int) -> int:
+    """Get the number of data bytes of a frame from its data length code."""
+    if not 0 <= dlc < len(FD_LENGTHS):
+        raise ValueError(f"Invalid data length code {dlc}")
+    return FD_LENGTHS[dlc]
+
+
+def _make_signals(value: Value, prefix: str = "") -> List[CanSignal]:
+    """Flatten a value of the packed encoder into signals."""
+    if value.nested_fields:
+        return [
+            signal
+            for nested in value.nested_fields
+            for signal in _make_signals(nested, prefix + value.name + "::")
+        ]
+
+    return [
+        CanSignal(
+            prefix + value.name,
+            value.bitstart,
+            value.bitlength,
+            _kind(value),
+            value.endianess == "big",
+            value.extended_data.get("scale", 1),
+            value.extended_data.get("offset", 0),
+        )
+    ]
+
+
+def _decode_expression(signal: CanSignal) -> str:
+    raw = f"((word >> {signal.shift}) & {signal.mask})"
+    if signal.big_endian:
+        raw = f"_from_bytes({raw}.to_bytes({signal.length >> 3}, 'little'), 'big')"
+
+    if signal.kind == "float":
+        raw = f"_unpack_f({raw}.to_bytes(4, 'little'))[0]"
+    elif signal.kind == "double":
+        raw = f"_unpack_d({raw}.to_bytes(8, 'little'))[0]"
+    elif signal.kind == "signed":
+        sign = 1 << (signal.length - 1)
+        raw = f"(({raw} ^ {sign}) - {sign})"
+
+    if signal.is_scaled():
+        raw = f"{raw} * {signal.scale!r} + {signal.offset!r}"
+    return raw
+
+
+def _encode_expression(signal: CanSignal) -> str:
+    value = f"values[{signal.name!r}]"
+    if signal.is_scaled():
+        value = f"(({value} - {signal.offset!r}) / {signal.scale!r})"
+
+    if signal.kind == "float":
+        raw = f"_from_bytes(_pack_f({value}), 'little')"
+    elif signal.kind == "double":
+        raw = f"_from_bytes(_pack_d({value}), 'little')"
+    elif signal.is_scaled():
+        raw = f"round({value})"
+    else:
+        raw = f"int({value})"
+
+    raw = f"({raw} & {signal.mask})"
+    if signal.big_endian:
+        raw = f"_from_bytes({raw}.to_bytes({signal.length >> 3}, 'big'), 'little')"
+    return f"({raw} << {signal.shift})"
+
+
+class CanMessage:
+    """Layout of a CAN message and its compiled decode and encode functions.
+
+    ``decode(data)`` decodes the data of a frame into a dictionary of signal
+    values and ``encode(values)`` encodes it back into ``length`` bytes.
+    ``decode_word`` and ``encode_word`` do the same on the frame data as a
+    little endian integer. Messages longer than 8 bytes are CAN FD frames,
+    their ``length`` is a CAN FD data length.
+    """
+
+    def __init__(
+        self, name: str, frame_id: int, signals: List[CanSignal], length: int
+    ) -> None:
+        self.name = name
+        self.frame_id = frame_id
+        self.signals = signals
+        self.length = length
+
+        decode = ",\n".join(
+            f"        {signal.name!r}: {_decode_expression(signal)}"
+            for signal in signals
+        )
+        encode = "\n".join(
+            f"        | {_encode_expression(signal)}" for signal in signals
+        )
+        self.source = (
+            f"def decode_word(word):\n    return {{\n{decode}\n    }}\n\n\n"
+            f"def decode(data):\n"
+            f"    if len(data) < {length}:\n"
+            f"        _short_frame({name!r}, {length})\n"
+            f"    word = _from_bytes(data, 'little')\n"
+            f"    return {{\n{decode}\n    }}\n\n\n"
+            f"def encode_word(values):\n    return (\n        0\n{encode}\n    )\n"
+        )
+
+        namespace: Dict[str, Any] = dict(_NAMESPACE)
+        exec(compile(self.source, f"<fcp can message {name}>", "exec"), namespace)
+        self.decode_word: Callable[[int], Dict[str, Any]] = namespace["decode_word"]
+        self.decode: Callable[[Any], Dict[str, Any]] = namespace["decode"]
+        self.encode_word: Callable[[Dict[str, Any]], int] = namespace["encode_word"]
+
+    @property
+    def fd(self) -> bool:
+        """Whether the message is sent in a CAN FD frame."""
+        return self.length > MAX_LENGTH
+
+    @property
+    def dlc(self) -> int:
+        """Data length code of the frames of the message."""
+        return dlc_code(self.length)
+
+    def encode(self, values: Dict[str, Any]) -> bytes:
+        """Encode signal values into the data of a frame."""
+        return self.encode_word(values).to_bytes(self.length, "little")
+
+    def __repr__(self) -> str:
+        return (
+            f"CanMessage name={self.name} frame_id={self.frame_id} length={self.length}"
+        )
+
+
+def make_message(impl: Impl, encoding: List[Value]) -> CanMessage:
+    """Build a CAN message from a ``can`` impl and its packed encoding."""
+    frame_id = impl.fields.get("id")
+    if not isinstance(frame_id, int):
+        raise ValueError(f"No id field found in impl {impl.name}")
+
+    signals = [signal for value in encoding for signal in _make_signals(value)]
+    bitlength = max((s.shift + s.length for s in signals), default=0)
+    if bitlength > 8 * FD_MAX_LENGTH:
+        raise ValueError(f"Message {impl.name} too big. Current length: {bitlength}")
+
+    length = (bitlength + 7) >> 3
+    if length > MAX_LENGTH:
+        length = fd_length(length)
+    return CanMessage(impl.name, frame_id, signals, length)
+
+
+def impl_devices(fcp: FcpV2) -> Dict[str, str]:
+    """Map the names of ``can`` impls to the name of the device sending them.
+
+    Devices are resolved the same as by the can_c generator: the ``device``
+    field of the impl, then the impls bound in the can protocol of a device,
+    by name and then by type, and ``global`` otherwise.
+    """
+    by_name: Dict[str, str] = {}
+    by_type: Dict[str, str] = {}
+    for device in fcp.devices:
+        protocols = device.fields.get("protocols")
+        can = protocols.get("can") if isinstance(protocols, dict) else None
+        if not isinstance(can, dict):
+            continue
+        for binding in can.get("impls", []):
+            if isinstance(binding.get("name"), str):
+                by_name.setdefault(binding["name"], device.name)
+            if isinstance(binding.get("type"), str):
+                by_type.setdefault(binding["type"], device.name)
+
+    devices = {}
+    for impl in fcp.get_matching_impls("can"):
+        sender = impl.fields.get("device")
+        if not isinstance(sender, str):
+            sender = by_name.get(impl.name, by_type.get(impl.type, "global"))
+        devices[impl.name] = sender
+    return devices
+
+
+class CanCodec:
+    """Decoder and encoder of the CAN frames of the ``can`` impls of a schema.
+
+    Only impls on ``bus`` are used if it is given, frame ids must be unique
+    among the impls that are used.
+    """
+
+    def __init__(self, fcp: FcpV2, bus: Optional[str] = None) -> None:
+        encoder = make_encoder(
+            "packed", fcp, PackedEncoderContext().with_unroll_arrays(True)
+        )
+
+        self.messages: Dict[str, CanMessage] = {}
+        self.frames: Dict[int, CanMessage] = {}
+        for impl in fcp.get_matching_impls("can"):
+            if bus is not None and impl.get_field("bus", "default").unwrap() != bus:
+                continue
+
+            message = make_message(impl, encoder.generate(impl))
+            if message.frame_id in self.frames:
+                other = self.frames[message.frame_id].name
+                raise ValueError(
+                    f"Impls {other} and {impl.name} have the same id {message.frame_id}"
+                )
+            self.messages[message.name] = message
+            self.frames[message.frame_id] = message
+
+        self._decoders = {
+            frame_id: message.decode for frame_id, message in self.frames.items()
+        }
+
+    def decode(self, frame_id: int, data: Any) -> Dict[str, Any]:
+        """Decode the data of a frame into a dictionary of signal values.
+
+        Raises ``KeyError`` for unknown frame ids.
+        """
+        return self._decoders[frame_id](data)
+
+    def encode(self, name: str, values: Dict[str, Any]) -> bytes:
+        """Encode the signal values of the message ``name`` into frame data."""
+        return self.messages[name].encode(values)
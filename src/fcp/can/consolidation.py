@@ -0,0 +1,346 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Consolidation of small periodic CAN frames into fewer, fuller frames.
+
+Frames of the same bus, sending device and period are packed first fit
+decreasing into frames of at most ``max_length`` bytes, since every frame
+pays the same overhead however little data it carries. A merged frame gets
+the lowest id of the frames it replaces and a struct with the fields of all
+of them, where fields that share a name are renamed to ``<impl>_<field>``.
+
+Multiplexed frames and impls of enums are never merged, and neither are
+frames that would need different signal blocks for the same signal name.
+
+:func:`rewrite_schema` edits the schema sources to match a plan: the first
+impl of every merged frame is replaced by an impl of the new struct, the
+others are removed and the new structs are appended to the same module.
+"""
+
+from dataclasses import dataclass
+from beartype.typing import Any, Callable, Dict, List, Set, Tuple
+import re
+
+from .analysis import (
+    DEFAULT_BITRATE,
+    DEFAULT_DATA_BITRATE,
+    MAX_STANDARD_ID,
+    transmission_bits,
+)
+from .codec import MAX_LENGTH, fd_length, impl_devices
+from ..encoding import PackedEncoderContext, Value, make_encoder
+from ..specs.impl import Impl
+from ..specs.struct import Struct
+from ..specs.v2 import FcpV2
+
+
+@dataclass
+class MergedFrame:
+    """Frame replacing frames of a device sent with the same period."""
+
+    name: str
+    frame_id: int
+    bus: str
+    device: str
+    period: float
+    members: List[Impl]
+    bits: int
+
+    @property
+    def length(self) -> int:
+        """Length in bytes, a CAN FD data length above 8 bytes."""
+        return _length(self.bits)
+
+
+@dataclass
+class ConsolidationPlan:
+    """Merged frames and the bus loads before and after merging them."""
+
+    bitrate: int
+    frames: List[MergedFrame]
+    load_before: Dict[str, float]
+    load_after: Dict[str, float]
+
+    @property
+    def reduction(self) -> Dict[str, float]:
+        """Fraction of the bus time saved on every bus."""
+        return {
+            bus: load - self.load_after[bus] for bus, load in self.load_before.items()
+        }
+
+
+@dataclass
+class _Member:
+    impl: Impl
+    struct: Struct
+    bits: int
+    leaves: Set[str]
+    signals: Dict[str, Dict[str, Any]]
+
+    def conflicts(self, other: "_Member") -> bool:
+        """Whether a signal name would get different signal blocks if merged.
+
+        Signal blocks apply to every value with their name, except for top
+        level fields of both structs, which are renamed.
+        """
+        top = {f.name for f in self.struct.fields}
+        other_top = {f.name for f in other.struct.fields}
+        return any(
+            self.signals.get(name) != other.signals.get(name)
+            for name in self.leaves & other.leaves
+            if not (name in top and name in other_top)
+        )
+
+
+def _leaf_names(values: List[Value]) -> Set[str]:
+    names = set()
+    for value in values:
+        if value.nested_fields:
+            names |= _leaf_names(list(value.nested_fields))
+        else:
+            names.add(value.name.rsplit("::", 1)[-1])
+    return names
+
+
+def _length(bits: int) -> int:
+    length = (bits + 7) // 8
+    return fd_length(length) if length > MAX_LENGTH else length
+
+
+def _load(
+    bits: int, frame_id: int, period: float, bitrate: int, data_bitrate: int
+) -> float:
+    transmission = transmission_bits(
+        _length(bits), frame_id > MAX_STANDARD_ID, bitrate, data_bitrate
+    )
+    return transmission / (period / 1000) / bitrate
+
+
+def plan_consolidation(
+    fcp: FcpV2,
+    max_length: int = MAX_LENGTH,
+    bitrate: int = DEFAULT_BITRATE,
+    data_bitrate: int = DEFAULT_DATA_BITRATE,
+) -> ConsolidationPlan:
+    """Plan merging the periodic ``can`` impls of a schema.
+
+    Frames longer than 8 bytes are timed as CAN FD frames, with their data
+    phase sent at ``data_bitrate``.
+    """
+    encoder = make_encoder(
+        "packed", fcp, PackedEncoderContext().with_unroll_arrays(True)
+    )
+    devices = impl_devices(fcp)
+
+    load_before: Dict[str, float] = {}
+    groups: Dict[Tuple[str, str, float, bool], List[_Member]] = {}
+    for impl in fcp.get_matching_impls("can"):
+        bus = impl.get_field("bus", "default").unwrap()
+        frame_id = impl.fields.get("id")
+        period = impl.fields.get("period")
+        load_before.setdefault(bus, 0.0)
+        if not isinstance(frame_id, int):
+            raise ValueError(f"No id field found in impl {impl.name}")
+        if not isinstance(period, (int, float)) or period <= 0:
+            continue
+
+        encoding = encoder.generate(impl)
+        bits = max((v.bitstart + v.bitlength for v in encoding), default=0)
+        load_before[bus] += _load(bits, frame_id, period, bitrate, data_bitrate)
+
+        struct = fcp.get_struct(impl.type)
+        if struct.is_nothing() or any(
+            "mux_signal" in s.fields or "mux_count" in s.fields for s in impl.signals
+        ):
+            continue
+
+        signals: Dict[str, Dict[str, Any]] = {}
+        for signal in impl.signals:
+            signals.setdefault(signal.name, signal.fields)
+        key = (bus, devices[impl.name], period, frame_id > MAX_STANDARD_ID)
+        groups.setdefault(key, []).append(
+            _Member(impl, struct.unwrap(), bits, _leaf_names(encoding), signals)
+        )
+
+    taken = {struct.name for struct in fcp.structs} | {impl.name for impl in fcp.impls}
+    frames = []
+    load_after = dict(load_before)
+    for (bus, device, period, _), members in groups.items():
+        bins: List[Tuple[int, List[_Member]]] = []
+        for member in sorted(members, key=lambda m: (-m.bits, m.impl.fields["id"])):
+            for i, (bits, merged) in enumerate(bins):
+                if bits + member.bits <= 8 * max_length and not any(
+                    member.conflicts(other) for other in merged
+                ):
+                    bins[i] = (bits + member.bits, merged + [member])
+                    break
+            else:
+                bins.append((member.bits, [member]))
+
+        for bits, merged in bins:
+            if len(merged) < 2:
+                continue
+
+            merged.sort(key=lambda m: m.impl.fields["id"])
+            base = f"{device}_{period:g}ms".replace(".", "_")
+            index = 0
+            while f"{base}_{index}" in taken:
+                index += 1
+            taken.add(f"{base}_{index}")
+
+            frame = MergedFrame(
+                f"{base}_{index}",
+                merged[0].impl.fields["id"],
+                bus,
+                device,
+                period,
+                [member.impl for member in merged],
+                bits,
+            )
+            frames.append(frame)
+            load_after[bus] += _load(
+                bits, frame.frame_id, period, bitrate, data_bitrate
+            ) - sum(
+                _load(m.bits, m.impl.fields["id"], period, bitrate, data_bitrate)
+                for m in merged
+            )
+
+    return ConsolidationPlan(bitrate, frames, load_before, load_after)
+
+
+_FIELD_HEAD = re.compile(r"^\w+\s*@\s*\d+")
+_SIGNAL_HEAD = re.compile(r"^signal\s+\w+")
+
+
+def _removal(source: str, start: int, end: int) -> Tuple[int, int]:
+    """Span of a block with its indentation, line break and a blank line."""
+    line_start = source.rfind("\n", 0, start) + 1
+    if not source[line_start:start].strip():
+        start = line_start
+    if source.startswith("\n", end):
+        end += 1
+
+    next_line = source.find("\n", end)
+    previous_line = source.rfind("\n", 0, max(start - 1, 0))
+    if next_line != -1 and not source[end:next_line].strip():
+        end = next_line + 1
+    elif previous_line != -1 and not source[previous_line + 1 : start].strip():
+        start = previous_line + 1
+    return start, end
+
+
+def _merged_source(
+    frame: MergedFrame, fcp: FcpV2, read: Callable[[str], str]
+) -> Tuple[str, str]:
+    """Source of the impl and of the struct of a merged frame."""
+    structs = [fcp.get_struct(impl.type).unwrap() for impl in frame.members]
+    counts: Dict[str, int] = {}
+    for struct in structs:
+        for field in struct.fields:
+            counts[field.name] = counts.get(field.name, 0) + 1
+
+    fields: List[str] = []
+    signals: Dict[str, str] = {}
+    for impl, struct in zip(frame.members, structs):
+        renames = {
+            field.name: f"{impl.name}_{field.name}"
+            for field in struct.fields
+            if counts[field.name] > 1
+        }
+
+        for field in sorted(struct.fields, key=lambda f: f.field_id):
+            if field.meta is None:
+                raise ValueError(f"No source location of field {field.name}")
+            text = read(field.meta.filename)[field.meta.start_pos : field.meta.end_pos]
+            name = renames.get(field.name, field.name)
+            fields.append(_FIELD_HEAD.sub(f"{name} @{len(fields)}", text))
+
+        for signal in impl.signals:
+            if signal.meta is None:
+                raise ValueError(f"No source location of signal {signal.name}")
+            name = renames.get(signal.name, signal.name)
+            text = read(signal.meta.filename)[
+                signal.meta.start_pos : signal.meta.end_pos
+            ]
+            signals.setdefault(name, _SIGNAL_HEAD.sub(f"signal {name}", text))
+
+    first = frame.members[0]
+    if first.meta is None:
+        raise ValueError(f"No source location of impl {first.name}")
+    indent = " " * (first.meta.column - 1)
+    body = [f"id: {frame.frame_id:#x},", f"period: {frame.period},"]
+    for name in ("bus", "device"):
+        if name in first.fields:
+            body.append(f'{name}: "{first.fields[name]}",')
+
+    impl_source = f"impl {frame.name} {{\n"
+    impl_source += "".join(f"{indent}    {line}\n" for line in body)
+    if signals:
+        impl_source += "\n" + "\n".join(
+            f"{indent}    {signal}\n" for signal in signals.values()
+        )
+    impl_source += f"{indent}}},"
+
+    struct_source = f"struct {frame.name} {{\n"
+    struct_source += "".join(f"    {field}\n" for field in fields) + "}\n"
+    return impl_source, struct_source
+
+
+def rewrite_schema(
+    fcp: FcpV2, plan: ConsolidationPlan, read: Callable[[str], str]
+) -> Dict[str, str]:
+    """Rewrite the modules defining the impls of merged frames.
+
+    ``read`` returns the source of a module from the file name in the
+    metadata of its nodes. Returns the new source of every changed module.
+    """
+    edits: Dict[str, List[Tuple[int, int, str]]] = {}
+    structs: Dict[str, List[str]] = {}
+    for frame in plan.frames:
+        for impl in frame.members:
+            if impl.meta is None:
+                raise ValueError(f"No source location of impl {impl.name}")
+        filenames = {impl.meta.filename for impl in frame.members if impl.meta}
+        if len(filenames) != 1:
+            raise ValueError(f"Impls of merged frame {frame.name} are in many modules")
+        (filename,) = filenames
+        source = read(filename)
+
+        impl_source, struct_source = _merged_source(frame, fcp, read)
+        members = sorted(frame.members, key=lambda impl: impl.meta.start_pos)  # type: ignore
+        for i, impl in enumerate(members):
+            if impl.meta is None:
+                raise ValueError(f"No source location of impl {impl.name}")
+            if i == 0:
+                span = (impl.meta.start_pos, impl.meta.end_pos)
+            else:
+                span = _removal(source, impl.meta.start_pos, impl.meta.end_pos)
+            edits.setdefault(filename, []).append(
+                (*span, impl_source if i == 0 else "")
+            )
+        structs.setdefault(filename, []).append(struct_source)
+
+    sources = {}
+    for filename, spans in edits.items():
+        source = read(filename)
+        for start, end, text in sorted(spans, reverse=True):
+            source = source[:start] + text + source[end:]
+        sources[filename] = source.rstrip("\n") + "\n\n" + "\n".join(structs[filename])
+    return sources
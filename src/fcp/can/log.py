@@ -0,0 +1,259 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Bulk decoding of CAN logs into NumPy tables.
+
+Logs are read into a structured array of frames with a timestamp, id, dlc
+and 8 data bytes each. Supported formats are:
+
+    * ``candump`` - the log format of ``candump -l``,
+      ``(1436509052.249713) can0 123#11223344``
+    * ``asc`` - Vector ASCII logs with hexadecimal ids and data
+    * ``binary`` - frames stored back-to-back as :func:`frame_dtype` records,
+      see :func:`write_frames`
+
+Remote, error and CAN FD frames are skipped, as are the messages of
+:class:`fcp.can.CanCodec` longer than 8 bytes, which are only sent in CAN FD
+frames. Frames are grouped by id and
+every signal of a message is decoded with bit operations over the whole
+column of its payloads, using the layouts of :class:`fcp.can.CanCodec`.
+Payload bytes past the dlc of a frame are read as zero.
+
+NumPy is an optional dependency, install it with ``pip install fcp[numpy]``.
+"""
+
+from beartype.typing import Any, Dict, List, Optional
+import logging
+import os
+import re
+from pathlib import Path
+
+from .codec import CanCodec, CanSignal
+from ..batch import _import_numpy
+from ..constants import LOG_FORMATS
+
+FORMATS = LOG_FORMATS
+
+_CANDUMP = re.compile(
+    rb"^\s*\((\d+(?:\.\d*)?)\)\s+\S+\s+([0-9A-Fa-f]{1,8})#((?:[0-9A-Fa-f]{2}){0,8})\s*$",
+    re.MULTILINE,
+)
+_ASC = re.compile(
+    rb"^\s*(\d+(?:\.\d*)?)\s+\d+\s+([0-9A-Fa-f]{1,8})x?\s+(?:Rx|Tx)\s+d\s+([0-8])"
+    rb"((?:[ \t]+[0-9A-Fa-f]{2}(?![0-9A-Za-z]))*)",
+    re.MULTILINE,
+)
+_ASC_DECIMAL = re.compile(rb"^\s*base\s+dec", re.MULTILINE)
+
+
+def frame_dtype(np: Any) -> Any:
+    """Get the NumPy dtype of frames, ``np`` is the numpy module."""
+    return np.dtype(
+        {
+            "names": ["timestamp", "id", "dlc", "data"],
+            "formats": ["<f8", "<u4", "u1", ("u1", (8,))],
+            "offsets": [0, 8, 12, 16],
+            "itemsize": 24,
+        }
+    )
+
+
+def _make_frames(
+    np: Any, timestamps: List[bytes], ids: List[bytes], data: List[bytes]
+) -> Any:
+    """Build frames from the hexadecimal ids and data of a parsed log."""
+    frames = np.zeros(len(ids), dtype=frame_dtype(np))
+    if not ids:
+        return frames
+
+    frames["timestamp"] = np.array(timestamps, dtype="S").astype(np.float64)
+
+    hex_ids = np.char.zfill(np.array(ids, dtype="S8"), 8)
+    frames["id"] = np.frombuffer(bytes.fromhex(hex_ids.tobytes().decode()), ">u4")
+
+    hex_data = np.array(data, dtype="S16")
+    frames["dlc"] = np.char.str_len(hex_data) // 2
+    hex_data = np.char.ljust(hex_data, 16, b"0")
+    payloads = np.frombuffer(bytes.fromhex(hex_data.tobytes().decode()), np.uint8)
+    frames["data"] = payloads.reshape(-1, 8)
+    return frames
+
+
+def parse_candump(log: bytes) -> Any:
+    """Parse a log in the format of ``candump -l`` into frames."""
+    np = _import_numpy("fcp.can.log")
+    matches = _CANDUMP.findall(log)
+    return _make_frames(
+        np,
+        [m[0] for m in matches],
+        [m[1] for m in matches],
+        [m[2] for m in matches],
+    )
+
+
+def parse_asc(log: bytes) -> Any:
+    """Parse a Vector ASCII log with hexadecimal ids and data into frames."""
+    np = _import_numpy("fcp.can.log")
+    if _ASC_DECIMAL.search(log):
+        raise ValueError("ASC logs with decimal ids and data are not supported")
+
+    matches = _ASC.findall(log)
+    data = [b"".join(m[3].split()) for m in matches]
+    if any(len(d) < 2 * int(m[2]) for d, m in zip(data, matches)):
+        raise ValueError("ASC log has frames with fewer data bytes than their dlc")
+
+    return _make_frames(
+        np,
+        [m[0] for m in matches],
+        [m[1] for m in matches],
+        [d[: 2 * int(m[2])] for d, m in zip(data, matches)],
+    )
+
+
+def write_frames(path: str, frames: Any) -> None:
+    """Write frames to a binary log."""
+    np = _import_numpy("fcp.can.log")
+    np.asarray(frames, dtype=frame_dtype(np)).tofile(path)
+
+
+def _format_of(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix == ".asc":
+        return "asc"
+    elif suffix == ".bin":
+        return "binary"
+    return "candump"
+
+
+def read_log(path: str, format: Optional[str] = None) -> Any:
+    """Read the frames of a log file.
+
+    ``format`` is one of :data:`FORMATS`, it is guessed from the suffix of
+    ``path`` by default: ``.asc`` for ASC logs, ``.bin`` for binary logs and
+    candump logs otherwise.
+    """
+    np = _import_numpy("fcp.can.log")
+    format = format or _format_of(Path(path))
+    if format == "binary":
+        dtype = frame_dtype(np)
+        if os.path.getsize(path) % dtype.itemsize:
+            raise ValueError("Binary log ends in the middle of a frame")
+        return np.fromfile(path, dtype=dtype)
+
+    with open(path, "rb") as f:
+        log = f.read()
+    if format == "candump":
+        return parse_candump(log)
+    elif format == "asc":
+        return parse_asc(log)
+
+    raise ValueError(f"Unknown log format {format}")
+
+
+def _dtype(np: Any, signal: CanSignal) -> Any:
+    if signal.is_scaled() or signal.kind == "double":
+        return np.float64
+    elif signal.kind == "float":
+        return np.float32
+
+    bits = max(8, 1 << (signal.length - 1).bit_length())
+    return np.dtype(f"{'i' if signal.signed else 'u'}{bits >> 3}")
+
+
+def _decode_signal(np: Any, words: Any, signal: CanSignal) -> Any:
+    """Decode a signal from a column of little endian 64 bit payloads."""
+    raw = (words >> np.uint64(signal.shift)) & np.uint64(signal.mask)
+    if signal.big_endian:
+        raw = raw.byteswap() >> np.uint64(64 - signal.length)
+
+    if signal.kind == "float":
+        value = raw.astype(np.uint32).view(np.float32)
+    elif signal.kind == "double":
+        value = raw.view(np.float64)
+    elif signal.signed:
+        sign = np.uint64(1 << (signal.length - 1))
+        value = ((raw ^ sign) - sign).view(np.int64)
+    else:
+        value = raw
+
+    if signal.is_scaled():
+        return value.astype(np.float64) * signal.scale + signal.offset
+    return value.astype(_dtype(np, signal))
+
+
+def decode_frames(codec: CanCodec, frames: Any) -> Dict[str, Any]:
+    """Decode frames into a table per message.
+
+    Returns a dictionary of structured arrays keyed by message name, with a
+    ``timestamp`` and ``dlc`` field and a field per signal. Only messages
+    with frames are included, frames with unknown ids are skipped. CAN FD
+    messages are skipped with a warning, their payloads don't fit the 8 data
+    bytes of a frame.
+    """
+    np = _import_numpy("fcp.can.log")
+    frames = np.asarray(frames)
+
+    ids = frames["id"]
+    order = np.argsort(ids, kind="stable")
+    unique, starts = np.unique(ids[order], return_index=True)
+    ends = np.append(starts[1:], len(order))
+
+    words = np.ascontiguousarray(frames["data"]).view("<u8").reshape(-1)
+
+    tables = {}
+    for frame_id, start, end in zip(unique.tolist(), starts, ends):
+        message = codec.frames.get(frame_id)
+        if message is None:
+            continue
+        if message.fd:
+            logging.warning(
+                f"Skipping frames of CAN FD message {message.name}, "
+                f"only classic CAN frames are decoded"
+            )
+            continue
+
+        rows = order[start:end]
+        dtype = [("timestamp", np.float64), ("dlc", np.uint8)] + [
+            (signal.name, _dtype(np, signal)) for signal in message.signals
+        ]
+        table = np.empty(len(rows), dtype=dtype)
+        table["timestamp"] = frames["timestamp"][rows]
+        table["dlc"] = frames["dlc"][rows]
+
+        message_words = words[rows]
+        for signal in message.signals:
+            table[signal.name] = _decode_signal(np, message_words, signal)
+        tables[message.name] = table
+
+    return tables
+
+
+def decode_log(
+    codec: CanCodec, path: str, format: Optional[str] = None
+) -> Dict[str, Any]:
+    """Read a log file and decode its frames into a table per message."""
+    return decode_frames(codec, read_log(path, format))
+
+
+def save_tables(path: str, tables: Dict[str, Any]) -> None:
+    """Save the tables of :func:`decode_frames` to an ``.npz`` file."""
+    np = _import_numpy("fcp.can.log")
+    with open(path, "wb") as f:
+        np.savez(f, **tables)
@@ -0,0 +1,367 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Virtual CAN bus, network simulator and log replayer for asyncio.
+
+:class:`VirtualBus` delivers every frame sent on it to the taps subscribed
+to its id. :class:`Simulator` runs a task per device that sends each of its
+``can`` impls every ``period`` milliseconds, and :func:`replay` sends the
+frames of a recorded log with their original timing, scaled or as fast as
+possible.
+
+Time comes from the :class:`Clock` of the bus, the event loop clock by
+default. A :class:`VirtualClock` runs a simulation as fast as possible, with
+deterministic timestamps.
+
+.. code-block:: python
+
+    bus = VirtualBus()
+    with bus.tap({0x100, 0x101}) as tap:
+        simulation = asyncio.create_task(Simulator(fcp, bus).run(duration=60))
+        async for frame in tap:
+            ...
+"""
+
+from beartype.typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+import asyncio
+import heapq
+
+from .codec import CanCodec, CanMessage, impl_devices
+from ..specs.v2 import FcpV2
+
+# Replays as fast as possible yield to other tasks every so many frames.
+_REPLAY_BATCH = 64
+
+
+class Clock:
+    """Time source of a bus, the event loop clock."""
+
+    def time(self) -> float:
+        """Current time in seconds."""
+        return asyncio.get_running_loop().time()
+
+    async def sleep(self, delay: float) -> None:
+        """Wait for ``delay`` seconds."""
+        await asyncio.sleep(delay)
+
+
+class VirtualClock(Clock):
+    """Simulated time, which only moves while every task waits on the clock.
+
+    Once the tasks woken by the clock have run until their next await, the
+    clock jumps to the earliest pending wake-up time. Tasks waiting on
+    anything else, e.g. a tap or I/O, do not hold time back.
+    """
+
+    def __init__(self, start: float = 0.0) -> None:
+        self._now = start
+        # (wake-up time, sequence number, future) heap, the sequence number
+        # wakes tasks sleeping until the same time in order.
+        self._sleepers: List[Tuple[float, int, "asyncio.Future[None]"]] = []
+        self._count = 0
+        self._scheduled = False
+
+    def time(self) -> float:
+        """Current simulated time in seconds."""
+        return self._now
+
+    async def sleep(self, delay: float) -> None:
+        """Wait until the clock reaches ``delay`` seconds from now."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._sleepers, (self._now + max(delay, 0), self._count, future))
+        self._count += 1
+        self._schedule(loop)
+        await future
+
+    def _schedule(self, loop: asyncio.AbstractEventLoop) -> None:
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._advance, loop)
+
+    def _advance(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._scheduled = False
+        # Cancelled sleeps do not move the clock.
+        while self._sleepers and self._sleepers[0][2].cancelled():
+            heapq.heappop(self._sleepers)
+        if not self._sleepers:
+            return
+
+        self._now = max(self._now, self._sleepers[0][0])
+        while self._sleepers and self._sleepers[0][0] <= self._now:
+            future = heapq.heappop(self._sleepers)[2]
+            if not future.done():
+                future.set_result(None)
+        # Runs after the tasks just woken, which are scheduled first.
+        if self._sleepers:
+            self._schedule(loop)
+
+
+class Frame(NamedTuple):
+    """A CAN frame, stamped with the bus time it was sent at."""
+
+    timestamp: float
+    frame_id: int
+    data: bytes
+
+
+class Tap:
+    """Subscription to the frames of a bus, optionally only of some ids.
+
+    Frames are queued until they are read. If ``maxsize`` frames are already
+    queued, new frames are dropped and counted in ``dropped``, the same as a
+    full receive buffer of a CAN controller.
+    """
+
+    def __init__(
+        self, bus: "VirtualBus", ids: Optional[Iterable[int]], maxsize: int
+    ) -> None:
+        self.bus = bus
+        self.ids = None if ids is None else frozenset(ids)
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.closed = False
+        # Unbounded so that closing can always queue the end marker.
+        self._queue: "asyncio.Queue[Optional[Frame]]" = asyncio.Queue()
+
+    def _put(self, frame: Frame) -> None:
+        if self.maxsize > 0 and self._queue.qsize() >= self.maxsize:
+            self.dropped += 1
+        else:
+            self._queue.put_nowait(frame)
+
+    def pending(self) -> int:
+        """Number of queued frames."""
+        return self._queue.qsize() - self.closed
+
+    async def get(self) -> Frame:
+        """Wait for the next frame, raises ``EOFError`` once the tap is closed."""
+        frame = await self._queue.get()
+        if frame is None:
+            # Keeps the end marker for later reads.
+            self._queue.put_nowait(None)
+            raise EOFError("tap is closed")
+        return frame
+
+    def close(self) -> None:
+        """Unsubscribe from the bus, queued frames can still be read."""
+        if not self.closed:
+            self.closed = True
+            self.bus._unsubscribe(self)
+            self._queue.put_nowait(None)
+
+    def __aiter__(self) -> AsyncIterator[Frame]:
+        return self
+
+    async def __anext__(self) -> Frame:
+        try:
+            return await self.get()
+        except EOFError:
+            raise StopAsyncIteration from None
+
+    def __enter__(self) -> "Tap":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class VirtualBus:
+    """In-process CAN bus.
+
+    Sending never blocks, a frame is delivered to every tap subscribed to its
+    id at once. Frames are stamped with the time in seconds since the bus was
+    created, read from ``clock``.
+    """
+
+    def __init__(self, clock: Optional[Clock] = None) -> None:
+        self.clock = clock or Clock()
+        self._start = self.clock.time()
+        self._taps: List[Tap] = []
+        self._taps_by_id: Dict[int, List[Tap]] = {}
+        self.sent = 0
+
+    def time(self) -> float:
+        """Time in seconds since the bus was created."""
+        return self.clock.time() - self._start
+
+    def tap(self, ids: Optional[Iterable[int]] = None, maxsize: int = 0) -> Tap:
+        """Subscribe to the frames with the given ids, or all frames."""
+        tap = Tap(self, ids, maxsize)
+        if tap.ids is None:
+            self._taps.append(tap)
+        else:
+            for frame_id in tap.ids:
+                self._taps_by_id.setdefault(frame_id, []).append(tap)
+        return tap
+
+    def _unsubscribe(self, tap: Tap) -> None:
+        if tap.ids is None:
+            self._taps.remove(tap)
+        else:
+            for frame_id in tap.ids:
+                self._taps_by_id[frame_id].remove(tap)
+
+    def send(self, frame_id: int, data: bytes) -> Frame:
+        """Send a frame to every tap subscribed to its id."""
+        frame = Frame(self.time(), frame_id, bytes(data))
+        self.sent += 1
+        for tap in self._taps:
+            tap._put(frame)
+        for tap in self._taps_by_id.get(frame_id, ()):
+            tap._put(frame)
+        return frame
+
+
+SignalSource = Callable[[CanMessage, float], Dict[str, Any]]
+
+
+class Simulator:
+    """Simulated network of the devices of a schema.
+
+    Every device runs a task that sends each of its ``can`` impls with a
+    ``period`` field every ``period`` milliseconds, divided by ``speed``.
+    Message data is all zeros, unless ``signals`` is given: it is called with
+    the message and the simulated time in seconds and returns the signal
+    values to encode.
+    """
+
+    def __init__(
+        self,
+        fcp: FcpV2,
+        bus: VirtualBus,
+        signals: Optional[SignalSource] = None,
+        speed: float = 1.0,
+        codec: Optional[CanCodec] = None,
+    ) -> None:
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+
+        self.bus = bus
+        self.signals = signals
+        self.speed = speed
+        self.codec = codec or CanCodec(fcp)
+
+        devices = impl_devices(fcp)
+        self.devices: Dict[str, List[Tuple[CanMessage, float]]] = {}
+        for impl in fcp.get_matching_impls("can"):
+            period = impl.fields.get("period")
+            message = self.codec.messages.get(impl.name)
+            if message is None or not isinstance(period, (int, float)) or period <= 0:
+                continue
+            self.devices.setdefault(devices[impl.name], []).append(
+                (message, period / 1000)
+            )
+
+    async def run_device(self, name: str, duration: Optional[float] = None) -> None:
+        """Send the messages of a device until ``duration`` simulated seconds."""
+        clock = self.bus.clock
+        start = clock.time()
+        send = self.bus.send
+
+        # (due time, index, period count, message, period, data), due times are
+        # computed from the count so that they do not drift by rounding.
+        schedule = [
+            (0.0, i, 0, message, period, bytes(message.length))
+            for i, (message, period) in enumerate(self.devices.get(name, []))
+        ]
+        heapq.heapify(schedule)
+
+        while schedule:
+            due, i, count, message, period, data = schedule[0]
+            if duration is not None and due >= duration:
+                return
+
+            delay = start + due / self.speed - clock.time()
+            if delay > 0:
+                await clock.sleep(delay)
+
+            if self.signals is not None:
+                data = message.encode(self.signals(message, due))
+            send(message.frame_id, data)
+
+            # Missed periods are skipped instead of being sent in a burst.
+            now = (clock.time() - start) * self.speed
+            count = max(count + 1, int(now / period))
+            heapq.heapreplace(
+                schedule, (count * period, i, count, message, period, data)
+            )
+
+    async def run(self, duration: Optional[float] = None) -> None:
+        """Run every device until ``duration`` simulated seconds, or forever."""
+        await asyncio.gather(
+            *(self.run_device(name, duration) for name in self.devices)
+        )
+
+
+def _log_frames(frames: Any) -> Iterable[Tuple[float, int, bytes]]:
+    if hasattr(frames, "dtype"):
+        for frame in frames:
+            yield (
+                float(frame["timestamp"]),
+                int(frame["id"]),
+                frame["data"][: frame["dlc"]].tobytes(),
+            )
+    else:
+        for timestamp, frame_id, data in frames:
+            yield timestamp, frame_id, data
+
+
+async def replay(bus: VirtualBus, frames: Any, speed: Optional[float] = 1.0) -> int:
+    """Send recorded frames on a bus with their original timing.
+
+    ``frames`` are :class:`Frame` objects, ``(timestamp, frame_id, data)``
+    tuples or the frames of :func:`fcp.can.log.read_log`. Timing is scaled by
+    ``speed``, frames are sent as fast as possible when it is ``None``, and
+    waits use the clock of the bus. Returns the number of frames sent.
+    """
+    if speed is not None and speed <= 0:
+        raise ValueError("speed must be positive")
+
+    clock = bus.clock
+    start = clock.time()
+    first: Optional[float] = None
+    count = 0
+
+    for timestamp, frame_id, data in _log_frames(frames):
+        if speed is None:
+            if count % _REPLAY_BATCH == 0:
+                await asyncio.sleep(0)
+        else:
+            if first is None:
+                first = timestamp
+            delay = start + (timestamp - first) / speed - clock.time()
+            if delay > 0:
+                await clock.sleep(delay)
+
+        bus.send(frame_id, data)
+        count += 1
+
+    return count
@@ -0,0 +1,731 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Compiled encoders/decoders for fcp structs.
+
+``compile_codec`` resolves the layout of a struct once and generates python
+source code for its encode and decode functions. Consecutive integer fields
+are packed and unpacked with a single integer operation, nested structs are
+inlined and bit offsets are computed at compile time wherever they are static.
+The wire format is the same as the one of :mod:`fcp.serde`.
+"""
+
+from beartype.typing import Any, Callable, Dict, List, Optional, Tuple
+import abc
+import struct
+
+from .specs.struct import Struct
+from .specs.v2 import FcpV2
+from .specs.type import (
+    Type,
+    ArrayType,
+    StructType,
+    DynamicArrayType,
+    OptionalType,
+    StringType,
+    UnsignedType,
+    SignedType,
+    FloatType,
+    DoubleType,
+)
+
+_UNROLL_LIMIT = 64
+
+
+def _str_bytes(data: str) -> bytes:
+    try:
+        return data.encode("latin-1")
+    except UnicodeEncodeError:
+        return bytes(ord(c) & 0xFF for c in data)
+
+
+class BufferOverrun(ValueError):
+    """Decoding needs more bytes than there are in the data."""
+
+
+def _overrun() -> None:
+    raise BufferOverrun("buffer overrun")
+
+
+_NAMESPACE = {
+    "_str_bytes": _str_bytes,
+    "_overrun": _overrun,
+    "_pack_f": struct.Struct("f").pack,
+    "_pack_d": struct.Struct("d").pack,
+    "_unpack_f": struct.Struct("f").unpack_from,
+    "_unpack_d": struct.Struct("d").unpack_from,
+}
+
+
+def _is_integer(type: Type) -> bool:
+    return isinstance(type, UnsignedType) or isinstance(type, SignedType)
+
+
+def _is_leaf(type: Type) -> bool:
+    return (
+        _is_integer(type) or isinstance(type, FloatType) or isinstance(type, DoubleType)
+    )
+
+
+def _bit_size(fcp: FcpV2, type: Type) -> Optional[int]:
+    """Size in bits of a type, if it is static and doesn't need byte alignment."""
+    if _is_integer(type):
+        return type.get_length()
+    elif isinstance(type, ArrayType):
+        size = _bit_size(fcp, type.underlying_type)
+        return None if size is None else size * type.size
+    elif isinstance(type, StructType):
+        total = 0
+        for field in fcp.get_struct(type.name).unwrap().fields:
+            size = _bit_size(fcp, field.type)
+            if size is None:
+                return None
+            total += size
+        return total
+
+    return None
+
+
+def _preserves_alignment(fcp: FcpV2, type: Type) -> bool:
+    size = _bit_size(fcp, type)
+    return size is not None and size % 8 == 0
+
+
+class _Compiler(abc.ABC):
+    """Shared code generation state."""
+
+    def __init__(self, fcp: FcpV2, prefix: str) -> None:
+        self.fcp = fcp
+        self.prefix = prefix
+        self.lines: List[str] = []
+        self.indentation = 1
+        self.variables = 0
+        self.functions: Dict[str, str] = {}
+        self.sources: List[str] = []
+        self.stack: List[str] = []
+
+    def emit(self, line: str) -> None:
+        self.lines.append("    " * self.indentation + line)
+
+    def variable(self, prefix: str) -> str:
+        self.variables += 1
+        return f"{prefix}{self.variables}"
+
+    def get_struct(self, name: str) -> Struct:
+        return self.fcp.get_struct(name).unwrap()
+
+    def function_name(self, name: str) -> str:
+        """Name of the generated function of a struct, generating it if needed."""
+        if name not in self.functions:
+            self.functions[name] = f"_{self.prefix}_{len(self.functions)}"
+            self.generate_function(name, self.functions[name])
+
+        return self.functions[name]
+
+    @abc.abstractmethod
+    def generate_function(self, name: str, function_name: str) -> None:
+        """Generate ``function_name`` for the struct ``name``."""
+
+    def source(self) -> str:
+        return "\n\n".join(self.sources) + "\n"
+
+
+class _EncoderCompiler(_Compiler):
+    """Generates encode functions.
+
+    Generated code appends complete bytes to ``out`` and keeps the ``nacc``
+    (< 8) bits of the last incomplete byte in ``acc``. Integer fields are
+    collected in a group and written together. ``nacc`` holds the value of the
+    runtime variable when it is known at compile time. With ``into``, bytes are
+    written into ``out`` at ``pos`` instead of being appended.
+    """
+
+    def __init__(self, fcp: FcpV2, into: bool = False) -> None:
+        super().__init__(fcp, "encode_into" if into else "encode")
+        self.group: List[Tuple[str, int]] = []
+        self.nacc: Optional[int] = 0
+        self.into = into
+
+    def write(self, value: str, size: str) -> None:
+        """Write ``size`` bytes, ``out`` is written at ``pos`` when encoding into."""
+        if self.into:
+            self.emit(f"out[pos:pos + {size}] = {value}")
+            self.emit(f"pos += {size}")
+        else:
+            self.emit(f"out += {value}")
+
+    def write_acc(self) -> None:
+        if self.into:
+            self.write("bytes((acc,))", "1")
+        else:
+            self.emit("out.append(acc)")
+
+    def push(self, value: str, bits: int) -> None:
+        self.group.append((value, bits))
+
+    def flush(self) -> None:
+        if len(self.group) == 0:
+            return
+
+        terms = []
+        total = 0
+        for value, bits in self.group:
+            term = f"({value} & {hex((1 << bits) - 1)})"
+            terms.append(term if total == 0 else f"{term} << {total}")
+            total += bits
+        word = " | ".join(terms)
+        self.group = []
+
+        if self.nacc == 0 and total % 8 == 0:
+            self.write(f"({word}).to_bytes({total >> 3}, 'little')", str(total >> 3))
+        elif self.nacc is not None:
+            nacc = self.nacc + total
+            self.emit(
+                f"acc |= ({word}) << {self.nacc}" if self.nacc else f"acc = {word}"
+            )
+            if nacc >= 8:
+                mask = hex((1 << (nacc & ~7)) - 1)
+                self.write(
+                    f"(acc & {mask}).to_bytes({nacc >> 3}, 'little')", str(nacc >> 3)
+                )
+                self.emit(f"acc >>= {nacc & ~7}")
+            self.emit(f"nacc = {nacc & 7}")
+            self.nacc = nacc & 7
+        else:
+            self.emit(f"acc |= ({word}) << nacc")
+            self.emit(f"nacc += {total}")
+            self.emit("n = nacc & -8")
+            self.write("(acc & ((1 << n) - 1)).to_bytes(n >> 3, 'little')", "(n >> 3)")
+            self.emit("acc >>= n")
+            self.emit("nacc &= 7")
+
+    def align(self) -> None:
+        self.flush()
+        if self.nacc is None:
+            self.emit("if nacc:")
+            self.indentation += 1
+            self.write_acc()
+            self.emit("acc = nacc = 0")
+            self.indentation -= 1
+        elif self.nacc != 0:
+            self.write_acc()
+            self.emit("acc = nacc = 0")
+        self.nacc = 0
+
+    def bind(self, value: str) -> str:
+        if value.isidentifier():
+            return value
+        variable = self.variable("v")
+        self.emit(f"{variable} = {value}")
+        return variable
+
+    def loop(self, header: str, type: Type, value: str) -> None:
+        """Encode ``value`` in every iteration of a loop."""
+        self.flush()
+        nacc = self.nacc if _preserves_alignment(self.fcp, type) else None
+
+        self.emit(header)
+        self.indentation += 1
+        self.nacc = nacc
+        body = len(self.lines)
+        self.encode(type, value)
+        self.flush()
+        if len(self.lines) == body:
+            self.emit("pass")
+        self.indentation -= 1
+
+        self.nacc = nacc
+
+    def encode(self, type: Type, value: str) -> None:
+        if _is_integer(type):
+            self.push(value, type.get_length())
+        elif isinstance(type, FloatType) or isinstance(type, DoubleType):
+            self.align()
+            pack = "_pack_f" if isinstance(type, FloatType) else "_pack_d"
+            self.write(f"{pack}({value})", str(type.get_length() >> 3))
+        elif isinstance(type, StringType):
+            value = self.bind(value)
+            data = self.variable("b")
+            self.emit(f"{data} = _str_bytes({value})")
+            self.push(f"len({data})", 32)
+            self.flush()
+            if self.nacc == 0:
+                self.write(data, f"len({data})")
+            else:
+                self.emit("if nacc:")
+                self.indentation += 1
+                self.emit(f"acc |= int.from_bytes({data}, 'little') << nacc")
+                self.emit(f"n = len({data}) << 3")
+                self.write(
+                    "(acc & ((1 << n) - 1)).to_bytes(n >> 3, 'little')", "(n >> 3)"
+                )
+                self.emit("acc >>= n")
+                self.indentation -= 1
+                self.emit("else:")
+                self.indentation += 1
+                self.write(data, f"len({data})")
+                self.indentation -= 1
+        elif isinstance(type, StructType):
+            self.encode_struct(type.name, value)
+        elif isinstance(type, ArrayType):
+            value = self.bind(value)
+            if _is_leaf(type.underlying_type) and type.size <= _UNROLL_LIMIT:
+                for i in range(type.size):
+                    self.encode(type.underlying_type, f"{value}[{i}]")
+            else:
+                self.flush()
+                nacc, size = self.nacc, _bit_size(self.fcp, type)
+                index = self.variable("i")
+                self.loop(
+                    f"for {index} in range({type.size}):",
+                    type.underlying_type,
+                    f"{value}[{index}]",
+                )
+                if nacc is not None and size is not None:
+                    self.nacc = (nacc + size) & 7
+        elif isinstance(type, DynamicArrayType):
+            value = self.bind(value)
+            self.push(f"len({value})", 32)
+            element = self.variable("x")
+            self.loop(f"for {element} in {value}:", type.underlying_type, element)
+        elif isinstance(type, OptionalType):
+            value = self.bind(value)
+            self.push(f"({value} is not None)", 8)
+            self.loop(f"if {value} is not None:", type.underlying_type, value)
+        else:
+            raise ValueError("Unmatched type " + str(type))
+
+    def encode_struct(self, name: str, value: str) -> None:
+        if name in self.stack:
+            self.flush()
+            function = self.function_name(name)
+            if self.into:
+                self.emit(f"acc, nacc, pos = {function}(out, pos, acc, nacc, {value})")
+            else:
+                self.emit(f"acc, nacc = {function}(out, acc, nacc, {value})")
+            self.nacc = None
+            return
+
+        value = self.bind(value)
+        self.stack.append(name)
+        for field in self.get_struct(name).fields:
+            self.encode(field.type, f"{value}[{field.name!r}]")
+        self.stack.pop()
+
+    def generate_function(self, name: str, function_name: str) -> None:
+        compiler = _EncoderCompiler(self.fcp, self.into)
+        compiler.functions = self.functions
+        compiler.sources = self.sources
+        compiler.nacc = None
+        compiler.encode_struct(name, "data")
+        compiler.flush()
+        if self.into:
+            compiler.emit("return acc, nacc, pos")
+            arguments = "out, pos, acc, nacc, data"
+        else:
+            compiler.emit("return acc, nacc")
+            arguments = "out, acc, nacc, data"
+        self.sources.append(
+            f"def {function_name}({arguments}):\n" + "\n".join(compiler.lines)
+        )
+
+    def finish(self) -> None:
+        """Write the last incomplete byte."""
+        self.flush()
+        if self.nacc is None:
+            self.emit("if nacc:")
+            self.indentation += 1
+            self.write_acc()
+            self.indentation -= 1
+        elif self.nacc != 0:
+            self.write_acc()
+
+    def compile(self, name: str) -> str:
+        self.emit("out = bytearray()")
+        self.emit("acc = nacc = 0")
+        self.encode_struct(name, "data")
+        self.finish()
+        self.emit("return bytes(out)")
+        self.sources.append("def encode(data):\n" + "\n".join(self.lines))
+        return self.source()
+
+    def compile_into(self, name: str) -> str:
+        """Generate ``encode_into``, writes go through a memoryview of ``buf``.
+
+        Writing past the end of the memoryview raises instead of growing it.
+        """
+        self.emit("if offset < 0:")
+        self.emit("    raise ValueError('negative offset')")
+        self.emit("out = memoryview(buf).cast('B')")
+        self.emit("pos = offset")
+        self.emit("acc = nacc = 0")
+        self.emit("try:")
+        self.indentation += 1
+        self.encode_struct(name, "data")
+        self.finish()
+        self.indentation -= 1
+        self.emit("except ValueError as e:")
+        self.emit("    raise ValueError('buffer too small') from e")
+        self.emit("return pos - offset")
+        self.sources.append(
+            "def encode_into(data, buf, offset=0):\n" + "\n".join(self.lines)
+        )
+        return self.source()
+
+
+class _DecoderCompiler(_Compiler):
+    """Generates decode functions.
+
+    Generated code reads ``data``, which is ``nbits`` long, starting at bit
+    ``pos``. Integer fields are collected in a group and read together. ``spos``
+    holds the position when it is known at compile time, in which case ``pos``
+    is not kept up to date, and ``smod`` holds the position modulo 8.
+    """
+
+    def __init__(self, fcp: FcpV2) -> None:
+        super().__init__(fcp, "decode")
+        self.word = ""
+        self.group: List[str] = []
+        self.group_bits = 0
+        self.spos: Optional[int] = 0
+        self.smod: Optional[int] = 0
+
+    def pull(self, bits: int, signed: bool = False) -> str:
+        if self.group_bits == 0:
+            self.word = self.variable("w")
+
+        mask = hex((1 << bits) - 1)
+        word = f"{self.word} >> {self.group_bits}" if self.group_bits else self.word
+        self.group_bits += bits
+
+        if not signed:
+            return f"({word} & {mask})"
+
+        value = self.variable("s")
+        self.group.append(f"{value} = {word} & {mask}")
+        self.group.append(f"if {value} >= {hex(1 << (bits - 1))}:")
+        self.group.append(f"    {value} -= {hex(1 << bits)}")
+        return value
+
+    def flush(self) -> None:
+        if self.group_bits == 0:
+            return
+
+        total = self.group_bits
+        if self.spos is not None:
+            self.emit(f"if nbits < {self.spos + total}:")
+            self.emit("    _overrun()")
+            start, end = self.spos >> 3, (self.spos + total + 7) >> 3
+            read = f"int.from_bytes(data[{start}:{end}], 'little')"
+            if self.spos & 7:
+                read += f" >> {self.spos & 7}"
+            self.emit(f"{self.word} = {read}")
+            self.spos += total
+        else:
+            self.emit(f"if pos + {total} > nbits:")
+            self.emit("    _overrun()")
+            read = f"int.from_bytes(data[pos >> 3:(pos + {total + 7}) >> 3], 'little')"
+            if self.smod is None:
+                read += " >> (pos & 7)"
+            elif self.smod != 0:
+                read += f" >> {self.smod}"
+            self.emit(f"{self.word} = {read}")
+            self.emit(f"pos += {total}")
+
+        for line in self.group:
+            self.emit(line)
+        if self.smod is not None:
+            self.smod = (self.smod + total) & 7
+        self.group = []
+        self.group_bits = 0
+
+    def sync(self) -> None:
+        """Make the runtime position valid."""
+        self.flush()
+        if self.spos is not None:
+            self.emit(f"pos = {self.spos}")
+            self.spos = None
+
+    def pull_flushed(self, bits: int) -> str:
+        """Read an unsigned integer into a variable that can be used right away."""
+        value = self.pull(bits)
+        self.flush()
+        return self.temporary(value)
+
+    def temporary(self, value: str) -> str:
+        variable = self.variable("t")
+        self.emit(f"{variable} = {value}")
+        return variable
+
+    def loop(self, header: str, type: Type) -> str:
+        """Decode a list of ``type`` in a loop."""
+        self.sync()
+        smod = self.smod if _preserves_alignment(self.fcp, type) else None
+
+        result = self.temporary("[]")
+        self.emit(header)
+        self.indentation += 1
+        self.smod = smod
+        value = self.decode(type)
+        self.flush()
+        self.emit(f"{result}.append({value})")
+        self.indentation -= 1
+
+        self.smod = smod
+        return result
+
+    def decode(self, type: Type) -> str:
+        if _is_integer(type):
+            return self.pull(type.get_length(), isinstance(type, SignedType))
+        elif isinstance(type, FloatType) or isinstance(type, DoubleType):
+            return self.decode_float(type)
+        elif isinstance(type, StringType):
+            length = self.pull_flushed(32)
+            self.sync()
+            self.emit(f"if pos + ({length} << 3) > nbits:")
+            self.emit("    _overrun()")
+            aligned = f"str(data[pos >> 3:(pos >> 3) + {length}], 'ascii')"
+            unaligned = (
+                f"((int.from_bytes(data[pos >> 3:(pos >> 3) + {length} + 1], 'little')"
+                f" >> (pos & 7)) & ((1 << ({length} << 3)) - 1))"
+                f".to_bytes({length}, 'little').decode('ascii')"
+            )
+            value = self.variable("t")
+            if self.smod == 0:
+                self.emit(f"{value} = {aligned}")
+            elif self.smod is None:
+                self.emit(f"{value} = {unaligned} if pos & 7 else {aligned}")
+            else:
+                self.emit(f"{value} = {unaligned}")
+            self.emit(f"pos += {length} << 3")
+            return value
+        elif isinstance(type, StructType):
+            return self.decode_struct(type.name)
+        elif isinstance(type, ArrayType):
+            if _is_leaf(type.underlying_type) and type.size <= _UNROLL_LIMIT:
+                values = [self.decode(type.underlying_type) for _ in range(type.size)]
+                return "[" + ", ".join(values) + "]"
+
+            self.flush()
+            spos, smod = self.spos, self.smod
+            size = _bit_size(self.fcp, type)
+            value = self.loop(f"for _ in range({type.size}):", type.underlying_type)
+            if size is not None:
+                self.spos = None if spos is None else spos + size
+                self.smod = None if smod is None else (smod + size) & 7
+            return value
+        elif isinstance(type, DynamicArrayType):
+            length = self.pull_flushed(32)
+            return self.loop(f"for _ in range({length}):", type.underlying_type)
+        elif isinstance(type, OptionalType):
+            is_some = self.pull_flushed(8)
+            self.sync()
+            smod = self.smod
+            value = self.variable("t")
+            self.emit(f"if {is_some} != 0:")
+            self.indentation += 1
+            some = self.decode(type.underlying_type)
+            self.sync()
+            self.emit(f"{value} = {some}")
+            self.indentation -= 1
+            self.emit("else:")
+            self.emit(f"    {value} = None")
+            preserved = _preserves_alignment(self.fcp, type.underlying_type)
+            self.smod = smod if preserved else None
+            return value
+        else:
+            raise ValueError("Unmatched type " + str(type))
+
+    def decode_float(self, type: Type) -> str:
+        self.flush()
+        bits = type.get_length()
+        unpack = "_unpack_f" if isinstance(type, FloatType) else "_unpack_d"
+
+        if self.spos is not None:
+            self.spos = (self.spos + 7) & ~7
+            self.emit(f"if nbits < {self.spos + bits}:")
+            self.emit("    _overrun()")
+            value = self.temporary(f"{unpack}(data, {self.spos >> 3})[0]")
+            self.spos += bits
+        else:
+            if self.smod != 0:
+                self.emit("pos = (pos + 7) & -8")
+            self.emit(f"if pos + {bits} > nbits:")
+            self.emit("    _overrun()")
+            value = self.temporary(f"{unpack}(data, pos >> 3)[0]")
+            self.emit(f"pos += {bits}")
+
+        self.smod = 0
+        return value
+
+    def decode_struct(self, name: str) -> str:
+        if name in self.stack:
+            self.sync()
+            function = self.function_name(name)
+            value = self.variable("t")
+            self.emit(f"{value}, pos = {function}(data, nbits, pos)")
+            self.smod = None
+            return value
+
+        self.stack.append(name)
+        fields = [
+            f"{field.name!r}: {self.decode(field.type)}"
+            for field in self.get_struct(name).fields
+        ]
+        self.stack.pop()
+        return "{" + ", ".join(fields) + "}"
+
+    def generate_function(self, name: str, function_name: str) -> None:
+        compiler = _DecoderCompiler(self.fcp)
+        compiler.functions = self.functions
+        compiler.sources = self.sources
+        compiler.spos = compiler.smod = None
+        value = compiler.decode_struct(name)
+        compiler.sync()
+        compiler.emit(f"return {value}, pos")
+        self.sources.append(
+            f"def {function_name}(data, nbits, pos):\n" + "\n".join(compiler.lines)
+        )
+
+    def compile(self, name: str) -> str:
+        self.emit("nbits = len(data) << 3")
+        value = self.decode_struct(name)
+        self.flush()
+        self.emit(f"return {value}")
+        self.sources.append("def decode(data):\n" + "\n".join(self.lines))
+
+        # Offsets are whole bytes, so only the bit position is unknown.
+        compiler = _DecoderCompiler(self.fcp)
+        compiler.functions = self.functions
+        compiler.sources = self.sources
+        compiler.spos = None
+        compiler.emit("if offset < 0:")
+        compiler.emit("    raise ValueError('negative offset')")
+        compiler.emit("data = memoryview(data).cast('B')")
+        compiler.emit("nbits = len(data) << 3")
+        compiler.emit("pos = offset << 3")
+        value = compiler.decode_struct(name)
+        compiler.sync()
+        compiler.emit(f"return {value}, ((pos + 7) >> 3) - offset")
+        self.sources.append(
+            "def decode_from(data, offset=0):\n" + "\n".join(compiler.lines)
+        )
+        return self.source()
+
+
+_SizeFunction = Callable[[int, Any], int]
+
+
+def _size_function(
+    fcp: FcpV2, type: Type, structs: Dict[str, _SizeFunction]
+) -> _SizeFunction:
+    """Build a function that advances a bit position past an encoded value."""
+    static_size = _bit_size(fcp, type)
+    if static_size is not None:
+        bits = static_size
+        return lambda pos, data: pos + bits
+    elif isinstance(type, FloatType) or isinstance(type, DoubleType):
+        bits = type.get_length()
+        return lambda pos, data: ((pos + 7) & ~7) + bits
+    elif isinstance(type, StringType):
+        return lambda pos, data: pos + 32 + 8 * len(data)
+    elif isinstance(type, ArrayType) or isinstance(type, DynamicArrayType):
+        element = _size_function(fcp, type.underlying_type, structs)
+        header = 32 if isinstance(type, DynamicArrayType) else 0
+
+        def size_array(pos: int, data: Any) -> int:
+            pos += header
+            for x in data:
+                pos = element(pos, x)
+            return pos
+
+        return size_array
+    elif isinstance(type, OptionalType):
+        some = _size_function(fcp, type.underlying_type, structs)
+        return lambda pos, data: pos + 8 if data is None else some(pos + 8, data)
+    elif isinstance(type, StructType):
+        name = type.name
+        if name not in structs:
+            # Registered before the fields so that recursive structs terminate.
+            structs[name] = lambda pos, data: structs[name](pos, data)
+            fields = [
+                (field.name, _size_function(fcp, field.type, structs))
+                for field in fcp.get_struct(name).unwrap().fields
+            ]
+
+            def size_struct(pos: int, data: Any) -> int:
+                for field, size in fields:
+                    pos = size(pos, data[field])
+                return pos
+
+            structs[name] = size_struct
+        return lambda pos, data: structs[name](pos, data)
+
+    raise ValueError("Unmatched type " + str(type))
+
+
+class Codec:
+    """Compiled encoder/decoder of a fcp struct.
+
+    ``encode(data)`` encodes a dictionary into bytes and ``decode(data)``
+    decodes a bytes-like object into a dictionary, the same as
+    :func:`fcp.serde.encode` and :func:`fcp.serde.decode`.
+    ``decode_from(data, offset=0)`` decodes a struct starting at byte
+    ``offset`` of a buffer-protocol object without copying it and returns the
+    dictionary and the number of bytes consumed, the same as
+    :func:`fcp.serde.decode_from`. ``encode_into(data, buf, offset=0)``
+    encodes a dictionary into a writable buffer starting at byte ``offset``
+    and returns the number of bytes written, the same as
+    :func:`fcp.serde.encode_into`.
+    """
+
+    def __init__(self, fcp: FcpV2, name: str) -> None:
+        fcp.get_struct(name).unwrap()
+
+        self.name = name
+        self.source = (
+            _EncoderCompiler(fcp).compile(name)
+            + "\n\n"
+            + _EncoderCompiler(fcp, into=True).compile_into(name)
+            + "\n\n"
+            + _DecoderCompiler(fcp).compile(name)
+        )
+        self._size = _size_function(fcp, StructType(name), {})
+
+        namespace: Dict[str, Any] = dict(_NAMESPACE)
+        exec(compile(self.source, f"<fcp codec {name}>", "exec"), namespace)
+        self.encode: Callable[[Dict[str, Any]], bytes] = namespace["encode"]
+        self.decode: Callable[[Any], Dict[str, Any]] = namespace["decode"]
+        self.decode_from: Callable[..., Tuple[Dict[str, Any], int]] = namespace[
+            "decode_from"
+        ]
+        self.encode_into: Callable[..., int] = namespace["encode_into"]
+
+    def encoded_size(self, data: Dict[str, Any]) -> int:
+        """Size in bytes of the encoded data."""
+        return (self._size(0, data) + 7) >> 3
+
+    def __repr__(self) -> str:
+        return f"Codec name={self.name}"
+
+
+def compile_codec(fcp: FcpV2, name: str) -> Codec:
+    """Compile the encoder/decoder of the struct ``name``."""
+    return Codec(fcp, name)
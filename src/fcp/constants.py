@@ -0,0 +1,39 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Constants shared by the fcp modules and the command line.
+
+Kept in a module without imports, so that the command line can use them as
+option defaults without importing the modules implementing the commands.
+"""
+
+# Output formats of fcp.serde.parallel.decode_capture.
+CAPTURE_FORMATS = ("jsonl", "csv", "npz")
+
+# Log formats of fcp.can.log.read_log.
+LOG_FORMATS = ("candump", "asc", "binary")
+
+# Bitrates of CAN buses and of the data phase of CAN FD frames, in bit/s.
+DEFAULT_BITRATE = 500000
+DEFAULT_DATA_BITRATE = 2000000
+
+# Data bytes of classic CAN and CAN FD frames.
+MAX_LENGTH = 8
+FD_MAX_LENGTH = 64
@@ -22,6 +22,7 @@
 
 Available encoders:
     * PackedEncoder - encoder for static length packed data
+    * OptimizedEncoder - packed encoder that reorders data to shorten frames
 
 The generate function in the encoder returns a list of encodeable pieces.
 Availble encodeable pieces:
@@ -38,10 +39,20 @@ Usage example:
             ...
 """
 
-from beartype.typing import Union, NoReturn, List, Dict, Any, Optional
+from beartype.typing import (
+    Union,
+    NoReturn,
+    List,
+    Dict,
+    Any,
+    Mapping,
+    Optional,
+    Sequence,
+)
 from typing_extensions import Self, TypeAlias, Set, Tuple
 from math import log2, ceil
-from copy import copy
+from copy import copy, deepcopy
+from types import MappingProxyType
 
 from .specs.struct import Struct
 from .specs.enum import Enum
@@ -60,9 +71,31 @@ from .specs.v2 import FcpV2
 from .specs.impl import Impl
 from .maybe import Some, Nothing
 
+_NO_EXTENDED_DATA: Mapping[str, Any] = MappingProxyType({})
+
+# Generated layouts with the impl and a copy of its state they were made for.
+_Layouts: TypeAlias = Dict[Tuple[int, bool, bool], Tuple[Impl, Any, List["Value"]]]
+
 
 class Value:
-    """Encodable piece data value."""
+    """Encodable piece data value.
+
+    Unrolled arrays produce a value per element, so values are slotted and
+    share a read-only empty ``extended_data`` and ``nested_fields`` when they
+    have none.
+    """
+
+    __slots__ = (
+        "name",
+        "type",
+        "bitstart",
+        "bitlength",
+        "endianess",
+        "extended_data",
+        "unit",
+        "composite_type",
+        "nested_fields",
+    )
 
     def __init__(
         self,
@@ -72,19 +105,21 @@ class Value:
         bitlength: int,
         endianess: str = "little",
         unit: Optional[str] = None,
-        extended_data: Dict[str, Any] = dict(),
+        extended_data: Optional[Mapping[str, Any]] = None,
         composite_type: Optional[str] = Nothing(),
-        nested_fields: Optional[List["Value"]] = None,
+        nested_fields: Optional[Sequence["Value"]] = None,
     ) -> None:
         self.name = name
         self.type = type
         self.bitstart = bitstart
         self.bitlength = bitlength
         self.endianess = endianess
-        self.extended_data = extended_data
+        self.extended_data = (
+            _NO_EXTENDED_DATA if extended_data is None else extended_data
+        )
         self.unit = unit
         self.composite_type = composite_type
-        self.nested_fields = nested_fields or []
+        self.nested_fields = nested_fields or ()
 
     def __repr__(self) -> str:
         return f"Value name={self.name} type={self.type} bitstart={self.bitstart} bitlength={self.bitlength} endianess={self.endianess}"
@@ -146,9 +181,44 @@ class PackedEncoder:
         self.ctx = ctx
         self.encoding: List[Value] = []
         self.bitstart = 0
+        self._signals: Optional[Tuple[Impl, Dict[str, Dict[str, Any]]]] = None
+
+    def _signal_fields(self, extension: Impl, name: str) -> Mapping[str, Any]:
+        """Get the fields of the impl signal ``name``, looked up by name once."""
+        if self._signals is None or self._signals[0] is not extension:
+            index: Dict[str, Dict[str, Any]] = {}
+            for signal in extension.signals:
+                index.setdefault(signal.name, signal.fields)
+            self._signals = (extension, index)
+
+        return self._signals[1].get(name, _NO_EXTENDED_DATA)
+
+    def _type_lengths(self, fcp: FcpV2) -> Dict[Tuple[str, str], int]:
+        """Lengths of structs and enums, shared by every encoder of ``fcp``."""
+        lengths: Dict[Tuple[str, str], int] = fcp.cached(
+            "fcp.encoding.type_lengths", dict
+        )
+        return lengths
+
+    def _layouts(self) -> _Layouts:
+        """Generated layouts, shared by every encoder of the same fcp."""
+        layouts: _Layouts = self.fcp.cached("fcp.encoding.packed_layouts", dict)
+        return layouts
 
     def _get_type_length(
         self, fcp: FcpV2, type: Type, _seen: Optional[Set[Tuple[str, str]]] = None
+    ) -> int:
+        if isinstance(type, EnumType) or isinstance(type, StructType):
+            lengths = self._type_lengths(fcp)
+            key = ("enum" if isinstance(type, EnumType) else "struct", type.name)
+            if key not in lengths:
+                lengths[key] = self._compute_type_length(fcp, type, _seen)
+            return lengths[key]
+
+        return self._compute_type_length(fcp, type, _seen)
+
+    def _compute_type_length(
+        self, fcp: FcpV2, type: Type, _seen: Optional[Set[Tuple[str, str]]] = None
     ) -> int:
         if _seen is None:
             _seen = set()
@@ -256,11 +326,7 @@ class PackedEncoder:
                 )
             else:
                 type_length = self._get_type_length(self.fcp, nested_field.type)
-                fields_data: Dict[str, Any] = (
-                    extension.get_signal(nested_field.name)
-                    .and_then(lambda s: Some(s.fields))
-                    .unwrap_or({})
-                )
+                fields_data = self._signal_fields(extension, nested_field.name)
                 self.encoding.append(
                     Value(
                         name=nested_prefix + nested_field.name,
@@ -318,11 +384,7 @@ class PackedEncoder:
                 bitstart += total_bitlength
             else:
                 type_length = self._get_type_length(self.fcp, field.type)
-                fields_data: Dict[str, Any] = (
-                    extension.get_signal(field.name)
-                    .and_then(lambda s: Some(s.fields))
-                    .unwrap_or({})
-                )
+                fields_data = self._signal_fields(extension, field.name)
 
                 result.append(
                     Value(
@@ -347,20 +409,28 @@ class PackedEncoder:
             self._generate_array_type(field.type, field, extension, prefix)
             return
 
-        type_length = self._get_type_length(self.fcp, field.type)
-        fields: Dict[str, Any] = (
-            extension.get_signal(field.name)
-            .and_then(lambda s: Some(s.fields))
-            .unwrap_or({})
-        )
+        self._generate_scalar(field.name, field.type, field.unit, extension, prefix)
+
+    def _generate_scalar(
+        self,
+        name: str,
+        type: Type,
+        unit: Optional[str],
+        extension: Impl,
+        prefix: str = "",
+        type_length: Optional[int] = None,
+    ) -> None:
+        if type_length is None:
+            type_length = self._get_type_length(self.fcp, type)
+        fields = self._signal_fields(extension, name)
         self.encoding.append(
             Value(
-                name=prefix + field.name,
-                type=field.type,
+                name=prefix + name,
+                type=type,
                 bitstart=self.bitstart,
                 bitlength=type_length,
                 endianess=fields.get("endianess") or "little",
-                unit=field.unit,
+                unit=unit,
                 extended_data=fields,
             )
         )
@@ -403,14 +473,16 @@ class PackedEncoder:
     def _generate_array_type(
         self, type: ArrayType, field: StructField, extension: Impl, prefix: str = ""
     ) -> NoReturn:
-        for i in range(type.size):
-            derived_field = copy(field)
-            derived_field.type = type.underlying_type
-            derived_field.name = field.name + "_" + str(i)
+        underlying_type = type.underlying_type
+        if isinstance(underlying_type, StructType):
+            struct = self.fcp.get_struct(underlying_type.name).unwrap()
+        elif not isinstance(underlying_type, ArrayType):
+            type_length = self._get_type_length(self.fcp, underlying_type)
 
-            if isinstance(type.underlying_type, StructType):
-                struct = self.fcp.get_struct(type.underlying_type.name).unwrap()
+        for i in range(type.size):
+            name = field.name + "_" + str(i)
 
+            if isinstance(underlying_type, StructType):
                 nested_values = self._generate_struct_recursive(
                     struct, extension, self.bitstart
                 )
@@ -419,18 +491,25 @@ class PackedEncoder:
 
                 self.encoding.append(
                     Value(
-                        name=prefix + derived_field.name,
-                        type=type.underlying_type,
+                        name=prefix + name,
+                        type=underlying_type,
                         bitstart=self.bitstart,
                         bitlength=total_bitlength,
-                        composite_type=Some(type.underlying_type.name),
+                        composite_type=Some(underlying_type.name),
                         nested_fields=nested_values,
-                        unit=derived_field.unit,
+                        unit=field.unit,
                     )
                 )
                 self.bitstart += total_bitlength
-            else:
+            elif isinstance(underlying_type, ArrayType):
+                derived_field = copy(field)
+                derived_field.type = underlying_type
+                derived_field.name = name
                 self._generate_signal(derived_field, extension, prefix)
+            else:
+                self._generate_scalar(
+                    name, underlying_type, field.unit, extension, prefix, type_length
+                )
 
     def _generate(self, type: Type, extension: Impl, prefix: str = "") -> NoReturn:
         if isinstance(type, StructType) or isinstance(type, EnumType):
@@ -439,23 +518,260 @@ class PackedEncoder:
             raise ValueError("Expected StructType or EnumType")
 
     def generate(self, impl: Impl) -> List[EncodeablePiece]:
-        """Generate encoding instructions."""
+        """Generate encoding instructions.
+
+        Layouts are cached per impl and context options for as long as the
+        structs, enums and impls of the fcp and the fields and signals of the
+        impl are unchanged. Every call returns new values.
+        """
+        layouts = self._layouts()
+        key = (id(impl), self.ctx.unroll_arrays, self.ctx.preserve_nested_structs)
+        cached = _cached_layout(layouts.get(key), impl)
+        if cached is not None:
+            return cached
+
         self.encoding = []
         self.bitstart = 0
+        self._signals = None
 
         self._generate(
             StructType(impl.type),  # type: ignore
             impl,
         )
-        return self.encoding
+        layouts[key] = (impl, deepcopy(_impl_state(impl)), self.encoding)
+        return _copied(self.encoding)
+
+
+def _impl_state(impl: Impl) -> Any:
+    """What the layout of an impl depends on, besides the structs and enums."""
+    return (impl.type, impl.fields, [(s.name, s.fields) for s in impl.signals])
+
+
+def _cached_layout(
+    entry: Optional[Tuple[Impl, Any, List[Value]]], impl: Impl
+) -> Optional[List[Value]]:
+    """Copy of a cached layout, if it was generated for the impl as it is now.
+
+    The impl is stored with its layout, so its id can't be reused.
+    """
+    if entry is None or entry[0] is not impl or entry[1] != _impl_state(impl):
+        return None
+    return _copied(entry[2])
+
+
+def _copied(values: List[Value]) -> List[Value]:
+    return [_shifted(value, 0) for value in values]
+
+
+def _shifted(value: Value, offset: int) -> Value:
+    """Copy of a value and its nested fields moved by ``offset`` bits."""
+    moved = copy(value)
+    moved.bitstart += offset
+    if value.nested_fields:
+        moved.nested_fields = [
+            _shifted(nested, offset) for nested in value.nested_fields
+        ]
+    return moved
+
+
+def _leaves(value: Value) -> List[Value]:
+    if value.nested_fields:
+        return [leaf for nested in value.nested_fields for leaf in _leaves(nested)]
+    return [value]
+
+
+def _crossing(bitstart: int, bitlength: int) -> int:
+    """Bytes spanned by a signal beyond the fewest it fits in."""
+    spanned = (bitstart + bitlength - 1) // 8 - bitstart // 8 + 1
+    return spanned - (bitlength + 7) // 8 if bitlength > 0 else 0
+
+
+def layout_length(encoding: Sequence[Value]) -> int:
+    """Length in bytes of a layout."""
+    return (max((v.bitstart + v.bitlength for v in encoding), default=0) + 7) // 8
+
+
+def layout_crossings(encoding: Sequence[Value]) -> int:
+    """Number of extra bytes read by the signals of a layout.
+
+    A signal that fits in ``n`` bytes but straddles ``n + k`` of them counts
+    ``k``, such signals need unaligned extractions.
+    """
+    return sum(
+        _crossing(leaf.bitstart, leaf.bitlength)
+        for value in encoding
+        for leaf in _leaves(value)
+    )
+
+
+class PackingSavings:
+    """Optimized layout of an impl compared to its packed layout."""
+
+    def __init__(
+        self,
+        impl: Impl,
+        packed_length: int,
+        length: int,
+        packed_crossings: int,
+        crossings: int,
+    ) -> None:
+        self.impl = impl
+        self.packed_length = packed_length
+        self.length = length
+        self.packed_crossings = packed_crossings
+        self.crossings = crossings
+
+    @property
+    def saved_bytes(self) -> int:
+        """Bytes saved on every frame."""
+        return self.packed_length - self.length
+
+    @property
+    def saved_crossings(self) -> int:
+        """Byte crossings removed."""
+        return self.packed_crossings - self.crossings
+
+    def __repr__(self) -> str:
+        return f"PackingSavings impl={self.impl.name} length={self.packed_length}->{self.length} crossings={self.packed_crossings}->{self.crossings}"
+
+
+class OptimizedEncoder(PackedEncoder):
+    """Packed encoder that reorders values to shorten frames.
+
+    Starts from the layout of the packed encoder and places its top level
+    values, preferring the shortest layout and then the fewest byte crossings
+    (see :func:`layout_crossings`). Nested struct values are moved as a whole.
+    Values with a ``bitstart`` signal field are pinned at that bit. A few
+    greedy placement orders are tried, and the packed layout is kept unless
+    one of them is better.
+    """
+
+    def _optimized_layouts(self) -> _Layouts:
+        layouts: _Layouts = self.fcp.cached("fcp.encoding.optimized_layouts", dict)
+        return layouts
+
+    def _place(
+        self,
+        values: Sequence[Value],
+        pinned: Dict[int, int],
+        order: Sequence[int],
+    ) -> Optional[List[Value]]:
+        """Place values greedily in ``order`` after the pinned ones."""
+        occupied = 0
+        end = 0
+        starts: Dict[int, int] = {}
+        for i, bitstart in pinned.items():
+            mask = ((1 << values[i].bitlength) - 1) << bitstart
+            if occupied & mask:
+                return None
+            occupied |= mask
+            end = max(end, bitstart + values[i].bitlength)
+            starts[i] = bitstart
+
+        for i in order:
+            value = values[i]
+            leaves = [
+                (leaf.bitstart - value.bitstart, leaf.bitlength)
+                for leaf in _leaves(value)
+            ]
+            mask = (1 << value.bitlength) - 1
+            # Bits from the end on are free, so the next byte boundary always
+            # fits and is the last start worth trying.
+            aligned = (end + 7) // 8 * 8
+            best = (
+                (aligned + value.bitlength + 7) // 8,
+                sum(_crossing(aligned + o, n) for o, n in leaves),
+                aligned,
+            )
+            for bitstart in range(aligned):
+                if occupied & (mask << bitstart):
+                    continue
+                key = (
+                    (max(end, bitstart + value.bitlength) + 7) // 8,
+                    sum(_crossing(bitstart + o, n) for o, n in leaves),
+                    bitstart,
+                )
+                if key < best:
+                    best = key
+                # Nothing later can be shorter or cross fewer bytes.
+                if key[0] == (end + 7) // 8 and key[1] == 0:
+                    break
+
+            starts[i] = best[2]
+            occupied |= mask << best[2]
+            end = max(end, best[2] + value.bitlength)
+
+        return sorted(
+            (
+                _shifted(value, starts[i] - value.bitstart)
+                for i, value in enumerate(values)
+            ),
+            key=lambda value: value.bitstart,
+        )
+
+    def _optimize(self, impl: Impl, packed: List[Value]) -> List[Value]:
+        pinned: Dict[int, int] = {}
+        for i, value in enumerate(packed):
+            bitstart = value.extended_data.get("bitstart")
+            if isinstance(bitstart, int):
+                pinned[i] = bitstart
+
+        free = [i for i in range(len(packed)) if i not in pinned]
+        lengths = [value.bitlength for value in packed]
+        orders = [
+            free,
+            sorted(free, key=lambda i: -lengths[i]),
+            sorted(free, key=lambda i: (lengths[i] % 8 != 0, -lengths[i])),
+        ]
+
+        candidates = []
+        for order in orders:
+            layout = self._place(packed, pinned, order)
+            if layout is not None:
+                candidates.append(layout)
+        if all(packed[i].bitstart == bitstart for i, bitstart in pinned.items()):
+            candidates.append(packed)
+        if not candidates:
+            raise ValueError(f"Pinned signals of impl {impl.name} overlap")
+
+        return min(candidates, key=lambda c: (layout_length(c), layout_crossings(c)))
+
+    def generate(self, impl: Impl) -> List[EncodeablePiece]:
+        """Generate encoding instructions with an optimized layout.
+
+        Layouts are cached the same as by :meth:`PackedEncoder.generate`.
+        """
+        layouts = self._optimized_layouts()
+        key = (id(impl), self.ctx.unroll_arrays, self.ctx.preserve_nested_structs)
+        cached = _cached_layout(layouts.get(key), impl)
+        if cached is not None:
+            return cached
+
+        encoding = self._optimize(impl, super().generate(impl))
+        layouts[key] = (impl, deepcopy(_impl_state(impl)), encoding)
+        return _copied(encoding)
+
+    def savings(self, impl: Impl) -> PackingSavings:
+        """Compare the optimized layout of an impl to its packed layout."""
+        packed = super().generate(impl)
+        optimized = self.generate(impl)
+        return PackingSavings(
+            impl,
+            layout_length(packed),
+            layout_length(optimized),
+            layout_crossings(packed),
+            layout_crossings(optimized),
+        )
 
 
-Encoder: TypeAlias = Union[PackedEncoder]
+Encoder: TypeAlias = Union[PackedEncoder, OptimizedEncoder]
 
 
 def make_encoder(name: str, fcp: FcpV2, ctx: EncoderContext) -> Encoder:
     """Create encoder from encoder name."""
     if name == "packed":
         return PackedEncoder(fcp, ctx)
+    if name == "optimized":
+        return OptimizedEncoder(fcp, ctx)
 
     raise KeyError(f"Invalid encoding name {name}")
@@ -22,16 +22,23 @@
 
 from beartype.typing import Any, Union, Callable, Tuple, List, Dict, Optional
 from dataclasses import dataclass
+import errno
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 import os
 import pathlib
+import sys
 from typing import cast
 
+import lark
 from lark import (
     Lark,
     Transformer,
     v_args,
     UnexpectedCharacters,
     UnexpectedEOF,
+    UnexpectedInput,
     ParseTree,
 )
 
@@ -60,13 +67,12 @@ from .specs.type import (
 )
 from .specs import v2
 from .result import Result, Ok, Err
-from .maybe import catch
+from .maybe import Maybe, Some, Nothing, catch
+from .cache import AstCache
 from .specs.metadata import MetaData
 from .error import Logger, FcpError, error
 
-
-fcp_parser = Lark(
-    """
+FCP_GRAMMAR = """
     start: preamble (struct | enum | mod_expr | service | device)*
 
     preamble: "version" ":" string
@@ -75,8 +81,8 @@ fcp_parser = Lark(
     struct_field: identifier "@" number ":" type "|"? param* ","
     type: (unsigned_type | signed_type | float_type | double_type | str_type | array_type | composed_type | dynamic_array_type | optional_type)
     str_type: "str"
-    unsigned_type: "u" (DIGIT | DIGIT DIGIT)
-    signed_type: "i" (DIGIT | DIGIT DIGIT)
+    unsigned_type: UNSIGNED_TYPE
+    signed_type: SIGNED_TYPE
     float_type: "f32"
     double_type: "f64"
     array_type: "[" type "," number "]"
@@ -123,16 +129,109 @@ fcp_parser = Lark(
     %import common.DIGIT   // imports from terminal library
     %import common.SIGNED_NUMBER   // imports from terminal library
     %import common.ESCAPED_STRING   // imports from terminal library
-    HEX_NUMBER: /0x[0-9a-fA-F]+/
+    HEX_NUMBER.2: /0x[0-9a-fA-F]+/
+    UNSIGNED_TYPE.2: /u[0-9]{1,2}(?!\\w)/
+    SIGNED_TYPE.2: /i[0-9]{1,2}(?!\\w)/
     %import common.C_COMMENT // imports from terminal library
     %import common.CPP_COMMENT // imports from terminal library
     %ignore " "           // Disregard spaces in text
     %ignore "\\n"
     %ignore "\\t"
     %ignore COMMENT
-    """,
-    propagate_positions=True,
-)
+    """
+
+PARSERS = ["lalr", "earley"]
+
+
+def _get_parser_tables_path(cache: Optional[AstCache]) -> Optional[str]:
+    """Get the path where the compiled LALR tables are stored with ``cache``.
+
+    Lark stores a hash of the grammar and parser options in the file and
+    recompiles the grammar when it doesn't match. Nothing is stored without a
+    cache.
+    """
+    if cache is None:
+        return None
+
+    directory = cache.directory
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return None
+
+    python_version = "".join(map(str, sys.version_info[:2]))
+    return str(directory / f"lalr_{lark.__version__}_py{python_version}.tables")
+
+
+@lru_cache(maxsize=None)
+def make_parser(parser: str = "lalr", tables: Optional[str] = None) -> Lark:
+    """Build the fcp parser.
+
+    Parsers are built on first use. If ``tables`` is given, the LALR tables
+    are serialized to that file so that later runs can load them instead of
+    compiling the grammar. :func:`get_fcp` stores them next to the entries of
+    its AST cache.
+
+    Available parsers:
+        * lalr - LALR(1) parser with a contextual lexer (default)
+        * earley - Earley parser, slower but with better syntax error diagnostics
+    """
+    if parser == "lalr":
+        return Lark(
+            FCP_GRAMMAR,
+            parser="lalr",
+            lexer="contextual",
+            propagate_positions=True,
+            cache=tables or False,
+        )
+    elif parser == "earley":
+        return Lark(FCP_GRAMMAR, parser="earley", propagate_positions=True)
+
+    raise ValueError(f"Invalid parser name {parser}")
+
+
+def __getattr__(name: str) -> Any:
+    if name == "fcp_parser":
+        return make_parser("lalr")
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _parse(
+    source: str, parser: str = "lalr", tables: Optional[str] = None
+) -> ParseTree:
+    """Parse fcp source code into a lark tree.
+
+    Syntax errors found by the LALR parser are reported by re-parsing with the
+    Earley parser, so diagnostics are the same regardless of the parser used.
+    """
+    try:
+        return make_parser(parser, tables).parse(source)
+    except UnexpectedInput:
+        if parser == "earley":
+            raise
+        return make_parser("earley").parse(source)
+
+
+def _parse_job(source: str, parser: str, tables: Optional[str]) -> Optional[ParseTree]:
+    """Parse a module in a worker process.
+
+    Modules with syntax errors are left to the serial path, which reports them.
+    """
+    try:
+        return make_parser(parser, tables).parse(source)
+    except UnexpectedInput:
+        return None
+
+
+def _get_imported_modules(
+    filename: pathlib.Path, fcp_ast: ParseTree
+) -> List[pathlib.Path]:
+    modules = []
+    for mod in fcp_ast.find_data("mod_expr"):
+        names = mod.scan_values(lambda value: isinstance(value, lark.Token))
+        modules.append(filename.parent / ("/".join(map(str, names)) + ".fcp"))
+    return modules
 
 
 def _get_meta(tree: ParseTree, parser: Lark) -> MetaData:
@@ -147,6 +246,25 @@ def _get_meta(tree: ParseTree, parser: Lark) -> MetaData:
     )
 
 
+def _node_key(node: Any) -> Any:
+    meta = getattr(node, "meta", None)
+    if meta is None:
+        return id(node)
+    return (meta.filename, meta.start_pos, meta.end_pos)
+
+
+def _merge_nodes(nodes: List[Any], module_nodes: List[Any]) -> None:
+    keys = {_node_key(node) for node in nodes}
+    nodes += [node for node in module_nodes if _node_key(node) not in keys]
+
+
+def _merge_module(fcp: v2.FcpV2, module: v2.FcpV2) -> None:
+    """Merge an imported module, skipping definitions already merged."""
+    _merge_nodes(fcp.structs, module.structs)
+    _merge_nodes(fcp.enums, module.enums)
+    _merge_nodes(fcp.impls, module.impls)
+
+
 class Token:
     """Metadata stub for any token."""
 
@@ -201,8 +319,14 @@ def _convert_params(params: Dict[str, Callable]) -> Dict[str, Any]:
 class ParserContext:
     """Retains context during parsing."""
 
-    def __init__(self) -> None:
+    def __init__(self, parser: str = "lalr", cache: Optional[AstCache] = None) -> None:
         self.modules: Dict[str, str] = {}
+        self.parser = parser
+        self.cache = cache
+        self.tables = _get_parser_tables_path(cache)
+        self.imports: Dict[pathlib.Path, Tuple[v2.FcpV2, Dict[pathlib.Path, str]]] = {}
+        self.import_stack: List[pathlib.Path] = []
+        self.parse_trees: Dict[pathlib.Path, ParseTree] = {}
 
     def set_module(self, name: str, module: str) -> None:
         """Set the source code module being parsed."""
@@ -212,6 +336,128 @@ class ParserContext:
         """Get all the parsed source code modules."""
         return self.modules
 
+    def get_cached(
+        self,
+        filename: pathlib.Path,
+        source: str,
+        filesystem_proxy: "IFileSystemProxy",
+        logger: Logger,
+    ) -> Maybe[Tuple[v2.FcpV2, Dict[pathlib.Path, str]]]:
+        """Get a cached fcp AST, registering the sources it was built from."""
+        if self.cache is None:
+            return Nothing()
+
+        cached = self.cache.get(filename, source, filesystem_proxy.read)
+        if cached.is_nothing():
+            return cached
+
+        _, dependencies = cached.unwrap()
+        for path, dependency_source in dependencies.items():
+            self.set_module(path.name, dependency_source)
+            logger.add_source(path.name, dependency_source)
+
+        return cached
+
+    def set_cached(
+        self,
+        filename: pathlib.Path,
+        source: str,
+        fcp: v2.FcpV2,
+        dependencies: Dict[pathlib.Path, str],
+    ) -> None:
+        """Store a fcp AST in the cache."""
+        if self.cache is not None:
+            self.cache.put(filename, source, fcp, dependencies)
+
+    def parse(self, filename: pathlib.Path, source: str) -> ParseTree:
+        """Parse a module, reusing its parse tree if it was parsed in advance."""
+        if filename in self.parse_trees:
+            return self.parse_trees.pop(filename)
+        return _parse(source, self.parser, self.tables)
+
+    def parse_modules(
+        self,
+        filename: pathlib.Path,
+        fcp_ast: ParseTree,
+        filesystem_proxy: "IFileSystemProxy",
+        jobs: int,
+    ) -> None:
+        """Parse the modules imported by a schema in advance, using a process pool.
+
+        The import graph is walked one level at a time and every module of a
+        level is parsed concurrently. Modules that can't be read or parsed, or
+        that are in the cache, are left to be handled when they are imported.
+        """
+        seen = {filename.resolve()}
+        pending = _get_imported_modules(filename, fcp_ast)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            while pending:
+                sources: Dict[pathlib.Path, str] = {}
+                for module in pending:
+                    path = module.resolve()
+                    if path in seen:
+                        continue
+                    seen.add(path)
+
+                    try:
+                        source = filesystem_proxy.read(path)
+                    except OSError:
+                        continue
+
+                    cached = (
+                        self.cache.get(path, source, filesystem_proxy.read)
+                        if self.cache is not None
+                        else Nothing()
+                    )
+                    if cached.is_nothing():
+                        sources[path] = source
+
+                trees = executor.map(
+                    _parse_job,
+                    sources.values(),
+                    repeat(self.parser),
+                    repeat(self.tables),
+                )
+
+                pending = []
+                for path, tree in zip(sources, trees):
+                    if tree is not None:
+                        self.parse_trees[path] = tree
+                        pending += _get_imported_modules(path, tree)
+
+    def get_import(
+        self, filename: pathlib.Path
+    ) -> Maybe[Tuple[v2.FcpV2, Dict[pathlib.Path, str]]]:
+        """Get a module already imported during this build."""
+        if filename in self.imports:
+            return Some(self.imports[filename])
+        return Nothing()
+
+    def set_import(
+        self,
+        filename: pathlib.Path,
+        fcp: v2.FcpV2,
+        dependencies: Dict[pathlib.Path, str],
+    ) -> None:
+        """Record a module imported during this build."""
+        self.imports[filename] = (fcp, dependencies)
+
+    def push_import(self, filename: pathlib.Path) -> Maybe[List[pathlib.Path]]:
+        """Mark a module as being imported.
+
+        Returns the import cycle if the module is already being imported.
+        """
+        if filename in self.import_stack:
+            index = self.import_stack.index(filename)
+            return Some(self.import_stack[index:] + [filename])
+
+        self.import_stack.append(filename)
+        return Nothing()
+
+    def pop_import(self) -> None:
+        """Mark the innermost module as imported."""
+        self.import_stack.pop()
+
 
 class IFileSystemProxy:
     """Filesystem proxy interface."""
@@ -240,11 +486,17 @@ class InMemoryFileSystemProxy(IFileSystemProxy):
     """In-memory filesystem proxy."""
 
     def __init__(self, files: Dict[pathlib.Path, str]) -> None:
-        self.files = files
+        self.files = {
+            pathlib.Path(filename).resolve(): source
+            for filename, source in files.items()
+        }
 
     def read(self, filename: pathlib.Path) -> str:
         """Read file from the in-memory filesystem."""
-        return str(self.files[filename])
+        path = pathlib.Path(filename).resolve()
+        if path not in self.files:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(path))
+        return str(self.files[path])
 
 
 class FcpV2Transformer(Transformer):
@@ -266,6 +518,7 @@ class FcpV2Transformer(Transformer):
 
         self.source = self.filesystem_proxy.read(self.filename)
         self.parser_context.set_module(self.filename.name, self.source)
+        self.dependencies: Dict[pathlib.Path, str] = {self.filename: self.source}
 
     @v_args(tree=True)  # type: ignore
     def preamble(self, tree: ParseTree) -> Result[Nil, FcpError]:
@@ -285,11 +538,11 @@ class FcpV2Transformer(Transformer):
 
     def unsigned_type(self, args: List[str]) -> Result[UnsignedType, FcpError]:
         """Parse an unsigned type."""
-        return Ok(UnsignedType("u" + "".join(args)))
+        return Ok(UnsignedType(str(args[0])))
 
     def signed_type(self, args: List[str]) -> Result[SignedType, FcpError]:
         """Parse a signed type."""
-        return Ok(SignedType("i" + "".join(args)))
+        return Ok(SignedType(str(args[0])))
 
     def float_type(self, args: List[str]) -> Result[FloatType, FcpError]:
         """Parse a float type."""
@@ -379,7 +632,7 @@ class FcpV2Transformer(Transformer):
                     for field in fields
                 ],
                 meta=meta,
-            )  # type:ignore
+            )  # type: ignore
         )
 
         self.fcp.impls.append(
@@ -441,18 +694,67 @@ class FcpV2Transformer(Transformer):
     @catch
     @v_args(tree=True)  # type: ignore
     def mod_expr(self, tree: ParseTree) -> Result[Nil, FcpError]:
-        """Parse a mod_expr node of the fcp AST."""
+        """Parse a mod_expr node of the fcp AST.
+
+        Modules are imported once per build, importing an already imported
+        module only merges the definitions that are not yet present.
+        """
         filename = self.path / (".".join(tree.children).replace(".", "/") + ".fcp")
+        path = filename.resolve()
+
+        imported = self.parser_context.get_import(path)
+        if imported.is_some():
+            fcp, dependencies = imported.unwrap()
+        else:
+            fcp, dependencies = self._import_module(tree, filename).attempt()
+            self.parser_context.set_import(path, fcp, dependencies)
+
+        self.dependencies.update(dependencies)
+        _merge_module(self.fcp, fcp)
+
+        return Ok(())
+
+    @catch
+    def _import_module(
+        self, tree: ParseTree, filename: pathlib.Path
+    ) -> Result[Tuple[v2.FcpV2, Dict[pathlib.Path, str]], FcpError]:
+        path = filename.resolve()
+
+        cycle = self.parser_context.push_import(path)
+        if cycle.is_some():
+            return error(
+                "Import cycle: "
+                + " -> ".join(module.name for module in cycle.unwrap()),
+                Token(_get_meta(tree, self)),
+            )
 
         try:
-            with open(filename) as f:
-                source = f.read()
-        except FileNotFoundError as e:
-            return error(f"File not found: {pathlib.Path(e.filename).name}")
+            return cast(
+                Result[Tuple[v2.FcpV2, Dict[pathlib.Path, str]], FcpError],
+                self._load_module(tree, filename, path),
+            )
+        finally:
+            self.parser_context.pop_import()
 
+    @catch
+    def _load_module(
+        self, tree: ParseTree, filename: pathlib.Path, path: pathlib.Path
+    ) -> Result[Tuple[v2.FcpV2, Dict[pathlib.Path, str]], FcpError]:
         try:
-            self.error_logger.add_source(filename.name, source)
-            fcp_ast = fcp_parser.parse(source)
+            source = self.filesystem_proxy.read(path)
+        except FileNotFoundError:
+            return error(f"File not found: {filename.name}")
+
+        self.error_logger.add_source(filename.name, source)
+
+        cached = self.parser_context.get_cached(
+            path, source, self.filesystem_proxy, self.error_logger
+        )
+        if cached.is_some():
+            return Ok(cached.unwrap())
+
+        try:
+            fcp_ast = self.parser_context.parse(path, source)
         except (UnexpectedCharacters, UnexpectedEOF) as e:
             return error(
                 self.error_logger.log_lark(filename.name, e),
@@ -461,22 +763,25 @@ class FcpV2Transformer(Transformer):
                 ),
             )
 
-        fcp = FcpV2Transformer(
-            pathlib.Path(filename).resolve(),
+        transformer = FcpV2Transformer(
+            path,
             self.parser_context,
             self.filesystem_proxy,
             self.error_logger,
-        ).transform(fcp_ast)
-
-        self.fcp.merge(
-            fcp.map_err(
+        )
+        fcp = (
+            transformer.transform(fcp_ast)
+            .map_err(
                 lambda err: err.results_in(
                     f"Failed to import {filename}", Token(_get_meta(tree, self))
                 )
-            ).attempt()
+            )
+            .attempt()
         )
 
-        return Ok(())
+        self.parser_context.set_cached(path, source, fcp, transformer.dependencies)
+
+        return Ok((fcp, transformer.dependencies))
 
     @v_args(tree=True)  # type: ignore
     def protocol_impl(self, tree: ParseTree) -> ProtocolImplBlock:
@@ -706,42 +1011,66 @@ def _get_fcp(
     filename: pathlib.Path,
     filesystem_proxy: IFileSystemProxy,
     logger: Logger,
+    parser: str = "lalr",
+    cache: Optional[AstCache] = None,
+    jobs: int = 1,
 ) -> Result[v2.FcpV2, FcpError]:
     source = filesystem_proxy.read(filename)
     logger.add_source(filename.name, source)
+
+    parser_context = ParserContext(parser, cache)
+
+    cached = parser_context.get_cached(filename, source, filesystem_proxy, logger)
+    if cached.is_some():
+        fcp, _ = cached.unwrap()
+        return Ok(fcp)
+
     try:
-        fcp_ast = fcp_parser.parse(source)
+        fcp_ast = _parse(source, parser, parser_context.tables)
     except UnexpectedCharacters as e:
         return error(
             logger.log_lark(filename.name, e),
             Token(MetaData(e.line, e.line, e.column, e.column, 0, 0, str(filename))),
         )
 
-    parser_context = ParserContext()
+    if jobs > 1:
+        parser_context.parse_modules(filename, fcp_ast, filesystem_proxy, jobs)
 
-    fcp = FcpV2Transformer(
-        filename, parser_context, filesystem_proxy, logger
-    ).transform(fcp_ast)
+    transformer = FcpV2Transformer(filename, parser_context, filesystem_proxy, logger)
+    parser_context.push_import(filename.resolve())
+    fcp = transformer.transform(fcp_ast).attempt()
 
-    return Ok(fcp.attempt())
+    parser_context.set_cached(filename, source, fcp, transformer.dependencies)
+
+    return Ok(fcp)
 
 
 @catch
 def get_fcp(
-    fcp_filename: str, logger: Logger = Logger({})
+    fcp_filename: str,
+    logger: Logger = Logger({}),
+    parser: str = "lalr",
+    cache: Optional[AstCache] = None,
+    jobs: int = 1,
 ) -> Result[v2.FcpV2, FcpError]:
     """Build a fcp AST from the filename of an fcp schema.
 
     Returns the Fcp AST and source code information for debugging.
+    The parser can be either "lalr" (default) or "earley". When a cache is
+    given, unchanged schema files are loaded from it instead of being parsed,
+    and the compiled LALR tables are stored in its directory.
+    With more than one job, imported modules are parsed in a process pool.
     """
     filesystem_proxy = FileSystemProxy()
-    return _get_fcp(pathlib.Path(fcp_filename), filesystem_proxy, logger)
+    return _get_fcp(
+        pathlib.Path(fcp_filename), filesystem_proxy, logger, parser, cache, jobs
+    )
 
 
 @catch
 def get_fcp_from_string(
-    source: str, logger: Logger = Logger({})
+    source: str, logger: Logger = Logger({}), parser: str = "lalr"
 ) -> Result[v2.FcpV2, FcpError]:
     """Build a fcp AST from the source code of an fcp schema."""
     filesystem_proxy = InMemoryFileSystemProxy({pathlib.Path("main.fcp"): source})
-    return _get_fcp(pathlib.Path("main.fcp"), filesystem_proxy, logger)
+    return _get_fcp(pathlib.Path("main.fcp"), filesystem_proxy, logger, parser)
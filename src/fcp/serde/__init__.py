@@ -0,0 +1,584 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Serialization/Deserialization library using fcp schemas."""
+
+from beartype.typing import Dict, Any, Iterator, Union, List, Tuple
+import struct
+
+from ..batch import decode_batch as decode_batch
+from ..codec import (
+    BufferOverrun as BufferOverrun,
+    Codec as Codec,
+    compile_codec as compile_codec,
+)
+from ..specs.v2 import FcpV2
+from ..specs.struct_field import StructField
+from ..specs.type import (
+    Type,
+    ArrayType,
+    StructType,
+    DynamicArrayType,
+    OptionalType,
+    StringType,
+    UnsignedType,
+    SignedType,
+    FloatType,
+    DoubleType,
+)
+
+_UNSIGNED_FORMATS = {8: "B", 16: "H", 32: "I", 64: "Q"}
+_SIGNED_FORMATS = {8: "b", 16: "h", 32: "i", 64: "q"}
+
+
+def _is_byte_integer(type: Type) -> bool:
+    """Integers that fill whole bytes can be packed by the struct module."""
+    return (
+        isinstance(type, UnsignedType) or isinstance(type, SignedType)
+    ) and type.get_length() in _UNSIGNED_FORMATS
+
+
+def _is_bulk(type: Type) -> bool:
+    """Arrays of these types are encoded and decoded in one struct operation."""
+    return (
+        _is_byte_integer(type)
+        or isinstance(type, FloatType)
+        or isinstance(type, DoubleType)
+    )
+
+
+class _Buffer:
+    """Bit buffer, bits are packed LSB first."""
+
+    def __init__(self, data: Union[bytes, bytearray] = b"") -> None:
+        self.buffer = bytearray(data)
+        self.bitaddr: int = 0
+
+    def push_word(self, word: int, bits: int) -> None:
+        if bits == 0:
+            return
+
+        start = self.bitaddr >> 3
+        end = (self.bitaddr + bits + 7) >> 3
+        if len(self.buffer) < end:
+            self.buffer += bytes(end - len(self.buffer))
+
+        word = (word & ((1 << bits) - 1)) << (self.bitaddr & 7)
+        word |= int.from_bytes(self.buffer[start:end], "little")
+        self.buffer[start:end] = word.to_bytes(end - start, "little")
+        self.bitaddr += bits
+
+    def push_bytes(self, bytes: Union[bytes, bytearray]) -> None:
+        self.buffer += bytes
+        self.bitaddr = len(self.buffer) * 8
+
+    def read_word(self, bits: int) -> int:
+        if bits == 0:
+            return 0
+
+        start = self.bitaddr >> 3
+        end = (self.bitaddr + bits + 7) >> 3
+        if len(self.buffer) < end:
+            raise BufferOverrun("buffer overrrun")
+
+        word = int.from_bytes(self.buffer[start:end], "little") >> (self.bitaddr & 7)
+        self.bitaddr += bits
+        return word & ((1 << bits) - 1)
+
+    def read_bytes(self, bytes: int) -> bytearray:
+        byteaddr = (self.bitaddr + 7) >> 3
+        self.bitaddr = 8 * (byteaddr + bytes)
+        return self.buffer[byteaddr : byteaddr + bytes]
+
+    def get_buffer(self) -> bytearray:
+        return self.buffer
+
+
+class _TargetBuffer(_Buffer):
+    """Bit buffer writing into ``view`` from byte ``offset``, never resized.
+
+    Bytes past the encoded bits are ignored, not assumed to be zero.
+    """
+
+    def __init__(self, view: memoryview, offset: int) -> None:
+        super().__init__()
+        self.view = view
+        self.offset = offset
+
+    def push_word(self, word: int, bits: int) -> None:
+        if bits == 0:
+            return
+
+        start = self.offset + (self.bitaddr >> 3)
+        used = self.offset + ((self.bitaddr + 7) >> 3)
+        end = self.offset + ((self.bitaddr + bits + 7) >> 3)
+        if len(self.view) < end:
+            raise ValueError("buffer too small")
+
+        word = (word & ((1 << bits) - 1)) << (self.bitaddr & 7)
+        word |= int.from_bytes(self.view[start:used], "little")
+        self.view[start:end] = word.to_bytes(end - start, "little")
+        self.bitaddr += bits
+
+    def push_bytes(self, bytes: Union[bytes, bytearray]) -> None:
+        start = self.offset + ((self.bitaddr + 7) >> 3)
+        end = start + len(bytes)
+        if len(self.view) < end:
+            raise ValueError("buffer too small")
+
+        self.view[start:end] = bytes
+        self.bitaddr = 8 * (end - self.offset)
+
+
+def _encode_builtin_unsigned(buffer: _Buffer, type: UnsignedType, data: Any) -> None:
+    length = type.get_length()
+    buffer.push_word(data, length)
+
+
+def _encode_builtin_signed(buffer: _Buffer, type: SignedType, data: Any) -> None:
+    length = type.get_length()
+    buffer.push_word(data, length)
+
+
+def _encode_builtin_float(buffer: _Buffer, type: FloatType, data: Any) -> None:
+    buffer.push_bytes(struct.pack("f", data))
+
+
+def _encode_builtin_double(buffer: _Buffer, type: DoubleType, data: Any) -> None:
+    buffer.push_bytes(struct.pack("d", data))
+
+
+def _encode_str(buffer: _Buffer, fcp: FcpV2, type: StringType, data: Any) -> None:
+    _encode_builtin_unsigned(buffer, UnsignedType("u32"), len(data))
+    characters = bytes(ord(x) & 0xFF for x in data)
+    buffer.push_word(int.from_bytes(characters, "little"), 8 * len(characters))
+
+
+def _run_format(types: List[Type], count: int) -> str:
+    """Struct format of ``count`` times ``types``, ``types`` are all integers."""
+    if isinstance(types[0], FloatType):
+        return f"={count}f"
+    elif isinstance(types[0], DoubleType):
+        return f"={count}d"
+
+    chars = [
+        (_SIGNED_FORMATS if isinstance(type, SignedType) else _UNSIGNED_FORMATS)[
+            type.get_length()
+        ]
+        for type in types
+    ]
+    return f"<{count}{chars[0]}" if count > 1 else "<" + "".join(chars)
+
+
+def _encode_run(
+    buffer: _Buffer, types: List[Type], values: Any, count: int = 1
+) -> bool:
+    """Encode ``count`` times ``types`` with a single struct.pack.
+
+    Returns False, without encoding anything, if a value doesn't fit the
+    struct format, the caller then encodes the values one by one.
+    """
+    format = _run_format(types, count)
+    if format == f"<{count}B" and isinstance(values, (bytes, bytearray)):
+        packed = bytes(values)
+    else:
+        try:
+            packed = struct.pack(format, *values)
+        except struct.error:
+            return False
+
+    if format[0] == "=" or buffer.bitaddr & 7 == 0:
+        buffer.push_bytes(packed)
+    else:
+        buffer.push_word(int.from_bytes(packed, "little"), 8 * len(packed))
+    return True
+
+
+def _field_runs(fields: List[StructField]) -> List[List[StructField]]:
+    """Group consecutive fields of whole byte integers together."""
+    runs: List[List[StructField]] = []
+    for field in fields:
+        if runs and _is_byte_integer(field.type) and _is_byte_integer(runs[-1][0].type):
+            runs[-1].append(field)
+        else:
+            runs.append([field])
+    return runs
+
+
+def _encode_struct(
+    buffer: _Buffer, fcp: FcpV2, name: str, data: Dict[str, Any]
+) -> None:
+    struct = fcp.get_struct(name).unwrap()
+
+    for run in _field_runs(struct.fields):
+        values = [data[field.name] for field in run]
+        types = [field.type for field in run]
+        if len(run) > 1 and _encode_run(buffer, types, values):
+            continue
+
+        for type, value in zip(types, values):
+            _encode(buffer, fcp, type, value)
+
+
+def _encode_array(buffer: _Buffer, fcp: FcpV2, type: ArrayType, data: Any) -> None:
+    if (
+        _is_bulk(type.underlying_type)
+        and type.size > 0
+        and _encode_run(buffer, [type.underlying_type], data[: type.size], type.size)
+    ):
+        return
+
+    for i in range(type.size):
+        _encode(buffer, fcp, type.underlying_type, data[i])
+
+
+def _encode_dynamic_array(
+    buffer: _Buffer, fcp: FcpV2, type: DynamicArrayType, data: Any
+) -> None:
+    _encode_builtin_unsigned(buffer, UnsignedType("u32"), len(data))
+
+    if (
+        _is_bulk(type.underlying_type)
+        and len(data) > 0
+        and _encode_run(buffer, [type.underlying_type], data, len(data))
+    ):
+        return
+
+    for x in data:
+        _encode(buffer, fcp, type.underlying_type, x)
+
+
+def _encode_optional(
+    buffer: _Buffer, fcp: FcpV2, type: OptionalType, data: Any
+) -> None:
+
+    is_some = data is not None
+    _encode_builtin_unsigned(buffer, UnsignedType("u8"), 1 if is_some else 0)
+    if is_some:
+        _encode(buffer, fcp, type.underlying_type, data)
+
+
+def _encode(
+    buffer: _Buffer, fcp: FcpV2, type: Type, data: Union[Any, Dict[str, Any]]
+) -> None:
+
+    if isinstance(type, UnsignedType):
+        _encode_builtin_unsigned(buffer, type, data)
+    elif isinstance(type, SignedType):
+        _encode_builtin_signed(buffer, type, data)
+    elif isinstance(type, FloatType):
+        _encode_builtin_float(buffer, type, data)
+    elif isinstance(type, DoubleType):
+        _encode_builtin_double(buffer, type, data)
+    elif isinstance(type, StringType):
+        _encode_str(buffer, fcp, type, data)
+    elif isinstance(type, StructType):
+        _encode_struct(buffer, fcp, type.name, data)
+    elif isinstance(type, ArrayType):
+        _encode_array(buffer, fcp, type, data)
+    elif isinstance(type, DynamicArrayType):
+        _encode_dynamic_array(buffer, fcp, type, data)
+    elif isinstance(type, OptionalType):
+        _encode_optional(buffer, fcp, type, data)
+    else:
+        raise ValueError("Unmatched type " + str(type))
+
+
+def encode(fcp: FcpV2, name: str, data: Dict[str, Any]) -> bytearray:
+    """Encode data using fcp schema."""
+    buffer = _Buffer()
+    _encode_struct(buffer, fcp, name, data)
+    return buffer.get_buffer()
+
+
+def encode_into(
+    fcp: FcpV2, name: str, data: Dict[str, Any], buf: Any, offset: int = 0
+) -> int:
+    """Encode data using fcp schema into ``buf``, starting at byte ``offset``.
+
+    ``buf`` is any writable buffer-protocol object, such as a ``bytearray`` or
+    a ``memoryview``, it is never resized. Returns the number of bytes written.
+    Fields are written straight into ``buf``, if the struct doesn't fit
+    ``ValueError`` is raised and the bytes before the end of ``buf`` may have
+    been written. Compile a codec with :func:`compile_codec` to encode without
+    allocating at all.
+    """
+    if offset < 0:
+        raise ValueError("negative offset")
+
+    view = memoryview(buf).cast("B")
+    if offset > len(view):
+        raise ValueError("buffer too small")
+
+    buffer = _TargetBuffer(view, offset)
+    _encode_struct(buffer, fcp, name, data)
+    return (buffer.bitaddr + 7) >> 3
+
+
+def _encoded_bits(bitaddr: int, fcp: FcpV2, type: Type, data: Any) -> int:
+    if isinstance(type, UnsignedType) or isinstance(type, SignedType):
+        return bitaddr + type.get_length()
+    elif isinstance(type, FloatType) or isinstance(type, DoubleType):
+        return ((bitaddr + 7) & ~7) + type.get_length()
+    elif isinstance(type, StringType):
+        return bitaddr + 32 + 8 * len(data)
+    elif isinstance(type, StructType):
+        for field in fcp.get_struct(type.name).unwrap().fields:
+            bitaddr = _encoded_bits(bitaddr, fcp, field.type, data[field.name])
+        return bitaddr
+    elif isinstance(type, ArrayType) or isinstance(type, DynamicArrayType):
+        if isinstance(type, DynamicArrayType):
+            bitaddr += 32
+        for x in data:
+            bitaddr = _encoded_bits(bitaddr, fcp, type.underlying_type, x)
+        return bitaddr
+    elif isinstance(type, OptionalType):
+        if data is None:
+            return bitaddr + 8
+        return _encoded_bits(bitaddr + 8, fcp, type.underlying_type, data)
+    else:
+        raise ValueError("Unmatched type " + str(type))
+
+
+def encoded_size(fcp: FcpV2, name: str, data: Dict[str, Any]) -> int:
+    """Size in bytes of data encoded using fcp schema."""
+    return (_encoded_bits(0, fcp, StructType(name), data) + 7) >> 3
+
+
+def _decode_builtin_unsigned(buffer: _Buffer, type: UnsignedType) -> int:
+    length = type.get_length()
+    return buffer.read_word(length)
+
+
+def _decode_builtin_signed(buffer: _Buffer, type: SignedType) -> int:
+    length = type.get_length()
+    word = buffer.read_word(length)
+
+    max = 2**length
+    if word >= max / 2:
+        return int(-(max - word))
+    else:
+        return int(word)
+
+
+def _decode_builtin_float(buffer: _Buffer, type: FloatType) -> float:
+    return float(struct.unpack("f", buffer.read_bytes(4))[0])
+
+
+def _decode_builtin_double(buffer: _Buffer, type: DoubleType) -> float:
+    return float(struct.unpack("d", buffer.read_bytes(8))[0])
+
+
+def _decode_str(buffer: _Buffer, type: StringType) -> str:
+    len = _decode_builtin_unsigned(buffer, UnsignedType("u32"))
+    return buffer.read_word(8 * len).to_bytes(len, "little").decode("ascii")
+
+
+def _decode_run(buffer: _Buffer, types: List[Type], count: int = 1) -> List[Any]:
+    """Decode ``count`` times ``types`` with a single struct.unpack."""
+    format = _run_format(types, count)
+    size = struct.calcsize(format)
+
+    if format[0] == "=" or buffer.bitaddr & 7 == 0:
+        data = buffer.read_bytes(size)
+        if len(data) < size:
+            raise BufferOverrun("buffer overrun")
+    else:
+        data = bytearray(buffer.read_word(8 * size).to_bytes(size, "little"))
+
+    if format == f"<{count}B":
+        return list(data)
+    elif format[0] == "=":
+        return list(struct.unpack(format, data))
+
+    # Signed integers are read as unsigned words and converted from two's
+    # complement.
+    words = struct.unpack(format.upper(), data)
+    if count > 1:
+        types = types * count
+    values = []
+    for word, type in zip(words, types):
+        length = type.get_length()
+        if isinstance(type, SignedType) and word >= 2 ** (length - 1):
+            word -= 2**length
+        values.append(word)
+    return values
+
+
+def _decode_array(buffer: _Buffer, fcp: FcpV2, type: ArrayType) -> List[Any]:
+    if _is_bulk(type.underlying_type) and type.size > 0:
+        return _decode_run(buffer, [type.underlying_type], type.size)
+
+    data = []
+    for i in range(type.size):
+        data.append(_decode(buffer, fcp, type.underlying_type))
+
+    return data
+
+
+def _decode_dynamic_array(
+    buffer: _Buffer, fcp: FcpV2, type: DynamicArrayType
+) -> List[Any]:
+    len = _decode_builtin_unsigned(buffer, UnsignedType("u32"))
+    if _is_bulk(type.underlying_type) and len > 0:
+        return _decode_run(buffer, [type.underlying_type], len)
+
+    data = []
+    for i in range(len):
+        data.append(_decode(buffer, fcp, type.underlying_type))
+
+    return data
+
+
+def _decode_optional(buffer: _Buffer, fcp: FcpV2, type: OptionalType) -> List[Any]:
+    is_some = _decode_builtin_unsigned(buffer, UnsignedType("u8")) != 0
+    if is_some:
+        return _decode(buffer, fcp, type.underlying_type)
+    else:
+        return None
+
+
+def _decode_struct(buffer: _Buffer, fcp: FcpV2, name: str) -> Dict[str, Any]:
+    struct = fcp.get_struct(name).unwrap()
+
+    data = {}
+    for run in _field_runs(struct.fields):
+        if len(run) > 1:
+            values = _decode_run(buffer, [field.type for field in run])
+        else:
+            values = [_decode(buffer, fcp, run[0].type)]
+        for field, value in zip(run, values):
+            data[field.name] = value
+
+    return data
+
+
+def _decode(buffer: _Buffer, fcp: FcpV2, type: Type) -> Dict[str, Any]:
+    if isinstance(type, UnsignedType):
+        return _decode_builtin_unsigned(buffer, type)
+    elif isinstance(type, SignedType):
+        return _decode_builtin_signed(buffer, type)
+    elif isinstance(type, FloatType):
+        return _decode_builtin_float(buffer, type)
+    elif isinstance(type, DoubleType):
+        return _decode_builtin_double(buffer, type)
+    elif isinstance(type, StringType):
+        return _decode_str(buffer, type)
+    elif isinstance(type, StructType):
+        return _decode_struct(buffer, fcp, type.name)
+    elif isinstance(type, ArrayType):
+        return _decode_array(buffer, fcp, type)
+    elif isinstance(type, DynamicArrayType):
+        return _decode_dynamic_array(buffer, fcp, type)
+    elif isinstance(type, OptionalType):
+        return _decode_optional(buffer, fcp, type)
+    else:
+        raise ValueError("Unmatched type")
+
+
+def decode(fcp: FcpV2, name: str, data: bytearray) -> Dict[str, Any]:
+    """Decode bytearray using fcp schema."""
+    return _decode_struct(_Buffer(data), fcp, name)
+
+
+def decode_from(
+    fcp: FcpV2, name: str, data: Any, offset: int = 0
+) -> Tuple[Dict[str, Any], int]:
+    """Decode a struct starting at byte ``offset`` of a buffer-protocol object.
+
+    ``data`` can be any object supporting the buffer protocol, such as
+    ``bytes``, ``memoryview`` or ``mmap``, it is read in place without being
+    copied. Returns the decoded data and the number of bytes consumed.
+    """
+    if offset < 0:
+        raise ValueError("negative offset")
+
+    buffer = _Buffer()
+    # The buffer is only read from, so the memoryview can stand in for it.
+    buffer.buffer = memoryview(data).cast("B")  # type: ignore
+    buffer.bitaddr = 8 * offset
+    value = _decode_struct(buffer, fcp, name)
+    return value, ((buffer.bitaddr + 7) >> 3) - offset
+
+
+class _StreamDecoder:
+    """Incremental decoder of back-to-back encoded structs.
+
+    Bytes are fed in as they arrive and complete records are decoded from
+    them, only the bytes of records that weren't decoded yet are kept.
+    """
+
+    def __init__(self, codec: Codec) -> None:
+        self.codec = codec
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def feed(self, data: Any) -> None:
+        del self.buffer[: self.offset]
+        self.offset = 0
+        self.buffer += data
+
+    def pending(self) -> int:
+        return len(self.buffer) - self.offset
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        while True:
+            try:
+                value, size = self.codec.decode_from(self.buffer, self.offset)
+            except BufferOverrun:
+                return
+
+            if size == 0:
+                raise ValueError(f"Struct {self.codec.name} is encoded in zero bytes")
+            self.offset += size
+            yield value
+
+    def close(self) -> None:
+        if self.pending():
+            raise ValueError("Stream ended in the middle of a record")
+
+
+def iter_decode(
+    fcp: FcpV2, name: str, stream: Any, chunk_size: int = 1 << 16
+) -> Iterator[Dict[str, Any]]:
+    """Decode a stream of back-to-back encoded structs, one at a time.
+
+    ``stream`` is a binary file object or an iterator of bytes-like chunks,
+    e.g. ``iter(functools.partial(sock.recv, 4096), b"")`` for a socket.
+    Records can be split across reads, only the unread part of the stream and
+    the record being decoded are kept in memory.
+    """
+    decoder = _StreamDecoder(compile_codec(fcp, name))
+
+    read = getattr(stream, "read1", getattr(stream, "read", None))
+    chunks = iter(stream) if read is None else iter(())
+
+    while True:
+        yield from decoder
+
+        # Read more at once while a record keeps growing past the chunk size.
+        if read is None:
+            chunk = next(chunks, b"")
+        else:
+            chunk = read(max(chunk_size, decoder.pending()))
+        if not chunk:
+            decoder.close()
+            return
+        decoder.feed(chunk)
@@ -0,0 +1,93 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""asyncio streams of serde encoded structs.
+
+Records are encoded and decoded with a :class:`fcp.serde.Codec`, compile it
+once with :func:`fcp.serde.compile_codec` and share it between connections.
+"""
+
+from beartype.typing import Any, AsyncIterator, Dict
+import asyncio
+
+from . import Codec, _StreamDecoder
+
+
+async def read_records(
+    reader: asyncio.StreamReader, codec: Codec, chunk_size: int = 1 << 16
+) -> AsyncIterator[Dict[str, Any]]:
+    """Decode back-to-back records from a stream reader, one at a time.
+
+    Nothing is read from the connection while a record is being processed,
+    so a slow consumer applies back-pressure to the peer.
+    """
+    decoder = _StreamDecoder(codec)
+
+    while True:
+        for record in decoder:
+            yield record
+
+        chunk = await reader.read(max(chunk_size, decoder.pending()))
+        if not chunk:
+            decoder.close()
+            return
+        decoder.feed(chunk)
+
+
+class RecordWriter:
+    """Encode records into a stream writer.
+
+    Records are buffered and written together once ``flush_size`` bytes are
+    pending, or when ``flush`` is called. Flushing waits for the transport to
+    drain, so writers block while the peer doesn't keep up.
+    """
+
+    def __init__(
+        self, writer: asyncio.StreamWriter, codec: Codec, flush_size: int = 1 << 16
+    ) -> None:
+        self.writer = writer
+        self.codec = codec
+        self.flush_size = flush_size
+        self.buffer = bytearray()
+
+    async def write(self, record: Dict[str, Any]) -> None:
+        """Encode a record, flushing if enough data is pending."""
+        self.buffer += self.codec.encode(record)
+        if len(self.buffer) >= self.flush_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write every pending record and wait for the transport to drain."""
+        if self.buffer:
+            self.writer.write(bytes(self.buffer))
+            self.buffer.clear()
+        await self.writer.drain()
+
+    async def close(self) -> None:
+        """Flush pending records and close the writer."""
+        await self.flush()
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    async def __aenter__(self) -> "RecordWriter":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
@@ -0,0 +1,296 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Parallel decoding of large captures of back-to-back serde encoded structs.
+
+The capture is mapped into memory and split into shards that start and end on
+record boundaries. Shards are decoded by a pool of processes, each of which
+compiles the codec and maps the capture once, and their results are written
+to the output in capture order.
+
+Records of structs with a fixed layout all have the same size, so shards are
+cut without reading the capture and decoded with
+:func:`fcp.batch.decode_batch` for ``npz`` output. Records of other structs
+are skipped over once, without being decoded, to find the shard boundaries.
+"""
+
+from beartype.typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+import csv
+import io
+import json
+import mmap
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice, repeat
+from pathlib import Path
+
+from . import BufferOverrun, _Buffer, compile_codec
+from .projection import _skip_function
+from ..batch import (
+    decode_batch,
+    _columns,
+    _decode_fixed,
+    _get_layout,
+    _import_numpy,
+    _leaves,
+    _to_columns,
+)
+from ..constants import CAPTURE_FORMATS
+from ..specs.v2 import FcpV2
+from ..specs.type import StructType
+
+FORMATS = CAPTURE_FORMATS
+
+_Shard = Tuple[int, int]
+
+# State of a pool process, set up once by _init_worker.
+_worker: Dict[str, Any] = {}
+
+
+def _map_file(path: str) -> Any:
+    with open(path, "rb") as f:
+        if f.seek(0, io.SEEK_END) == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def shard_capture(
+    fcp: FcpV2, name: str, data: Any, shard_size: int = 1 << 24
+) -> List[_Shard]:
+    """Split a capture into record-aligned ``(start, end)`` byte ranges.
+
+    Every shard but the last holds at least ``shard_size`` bytes. Raises
+    ``ValueError`` if the capture ends in the middle of a record.
+    """
+    fcp.get_struct(name).unwrap()
+    length = len(data)
+    if length == 0:
+        return []
+
+    layout = _get_layout(fcp, name)
+    if layout is not None:
+        size = layout.size()
+        if size == 0:
+            raise ValueError(f"Struct {name} is encoded in zero bytes")
+        if length % size:
+            raise ValueError("Capture ends in the middle of a record")
+        step = max(1, -(-shard_size // size)) * size
+        return [(start, min(start + step, length)) for start in range(0, length, step)]
+
+    skip = _skip_function(fcp, StructType(name))
+    buffer = _Buffer()
+    # The buffer is only read from, so the memoryview can stand in for it.
+    buffer.buffer = memoryview(data).cast("B")  # type: ignore
+
+    shards = []
+    start = offset = 0
+    while offset < length:
+        buffer.bitaddr = 8 * offset
+        try:
+            skip(buffer)
+        except BufferOverrun:
+            raise ValueError("Capture ends in the middle of a record") from None
+
+        end = (buffer.bitaddr + 7) >> 3
+        if end > length:
+            raise ValueError("Capture ends in the middle of a record")
+        if end == offset:
+            raise ValueError(f"Struct {name} is encoded in zero bytes")
+
+        offset = end
+        if offset - start >= shard_size:
+            shards.append((start, offset))
+            start = offset
+
+    if start < length:
+        shards.append((start, length))
+    return shards
+
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, (int, float, str)):
+        return value
+    return json.dumps(value)
+
+
+def _decode_shard_with(state: Dict[str, Any], shard: _Shard, format: str) -> Any:
+    fcp, name, capture = state["fcp"], state["name"], state["capture"]
+    start, end = shard
+
+    layout = state["layout"]
+    if format == "npz" and layout is not None:
+        np = _import_numpy()
+        frames = np.frombuffer(capture, np.uint8, end - start, start)
+        return _decode_fixed(np, layout, frames.reshape(-1, layout.size()))
+
+    decode_from = state["codec"].decode_from
+    records = []
+    while start < end:
+        record, size = decode_from(capture, start)
+        records.append(record)
+        start += size
+
+    if format == "jsonl":
+        return "".join(json.dumps(record) + "\n" for record in records)
+    elif format == "csv":
+        text = io.StringIO()
+        writer = csv.writer(text)
+        for record in records:
+            leaves = _leaves(fcp, StructType(name), "", record)
+            writer.writerow(_cell(value) for value in leaves.values())
+        return text.getvalue()
+
+    return _to_columns(_import_numpy(), fcp, name, records)
+
+
+def _worker_state(fcp: FcpV2, name: str, capture: Any) -> Dict[str, Any]:
+    return {
+        "fcp": fcp,
+        "name": name,
+        "capture": capture,
+        "codec": compile_codec(fcp, name),
+        "layout": _get_layout(fcp, name),
+    }
+
+
+def _init_worker(fcp: FcpV2, name: str, path: str) -> None:
+    _worker.update(_worker_state(fcp, name, _map_file(path)))
+
+
+def _decode_shard(shard: _Shard, format: str) -> Any:
+    return _decode_shard_with(_worker, shard, format)
+
+
+def _decode_in_order(
+    executor: ProcessPoolExecutor,
+    shards: List[_Shard],
+    format: str,
+    pending: "Deque[Future[Any]]",
+    in_flight: int,
+) -> Iterator[Any]:
+    """Decode shards in a pool, yielding their results in order.
+
+    At most ``in_flight`` shards are submitted and not yet yielded, so that
+    results don't pile up in memory while earlier shards are written. The
+    submitted futures are kept in ``pending`` for the caller to cancel.
+    """
+    remaining = iter(shards)
+    for shard in islice(remaining, in_flight):
+        pending.append(executor.submit(_decode_shard, shard, format))
+
+    while pending:
+        result = pending[0].result()
+        pending.popleft()
+        for shard in islice(remaining, 1):
+            pending.append(executor.submit(_decode_shard, shard, format))
+        yield result
+
+
+def _format_of(output: Path) -> str:
+    suffix = output.suffix.lstrip(".").lower()
+    return suffix if suffix in FORMATS else "jsonl"
+
+
+def decode_capture(
+    fcp: FcpV2,
+    name: str,
+    capture: str,
+    output: str,
+    format: Optional[str] = None,
+    jobs: Optional[int] = None,
+    shard_size: int = 1 << 24,
+) -> None:
+    """Decode a capture file of back-to-back structs ``name`` into ``output``.
+
+    ``format`` is one of ``jsonl`` (a JSON object per record), ``csv`` (a row
+    per record and a column per leaf field, variable sized fields are JSON
+    encoded) or ``npz`` (the columns of :func:`fcp.batch.decode_batch`), it is
+    guessed from the suffix of ``output`` by default. Shards are decoded by
+    ``jobs`` processes, all available cores by default, with at most two
+    shards per process decoded ahead of the output. The columns of ``npz``
+    output are kept in memory until they are saved.
+    """
+    format = format or _format_of(Path(output))
+    if format not in FORMATS:
+        raise ValueError(f"Unknown output format {format}")
+    if format == "npz":
+        np = _import_numpy()
+
+    data = _map_file(capture)
+    pool = jobs is None or jobs > 1
+    workers = jobs or os.cpu_count() or 1
+    if pool:
+        # Give every process a few shards so uneven shards even out.
+        shard_size = max(1, min(shard_size, -(-len(data) // (4 * workers))))
+    shards = shard_capture(fcp, name, data, shard_size)
+
+    if pool and len(shards) > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(fcp, name, capture),
+        )
+        pending: "Deque[Future[Any]]" = deque()
+        results: Iterable[Any] = _decode_in_order(
+            executor, shards, format, pending, 2 * workers
+        )
+    else:
+        executor = None
+        pending = deque()
+        state = _worker_state(fcp, name, data)
+        results = map(_decode_shard_with, repeat(state), shards, repeat(format))
+
+    try:
+        if format == "npz":
+            chunks = list(results)
+            if not chunks:
+                chunks = [decode_batch(fcp, name, [])]
+            columns = {
+                path: np.concatenate([chunk[path] for chunk in chunks])
+                for path in chunks[0]
+            }
+            with open(output, "wb") as f:
+                np.savez(f, **columns)
+            return
+
+        with open(output, "w", newline="") as f:
+            if format == "csv":
+                header = _columns(fcp, StructType(name), "")
+                csv.writer(f).writerow(path for path, _ in header)
+            for chunk in results:
+                f.write(chunk)
+    finally:
+        if executor is not None:
+            # Executor.shutdown(cancel_futures=True) needs Python 3.9.
+            for future in pending:
+                future.cancel()
+            executor.shutdown()
+        if isinstance(data, mmap.mmap):
+            data.close()
@@ -0,0 +1,282 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Decoding of selected fields of a struct.
+
+A :class:`Projection` decodes only the fields selected by a list of
+:class:`fcp.xpath.Xpath` expressions. The steps to reach every field are
+planned once: fields of static size are jumped over with precomputed bit
+offsets, dynamic fields that aren't selected are skipped by reading their
+lengths only, and nothing after the last selected field is read.
+"""
+
+from beartype.typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from . import _Buffer, _decode
+from ..codec import _bit_size
+from ..specs.v2 import FcpV2
+from ..specs.type import (
+    Type,
+    ArrayType,
+    StructType,
+    DynamicArrayType,
+    OptionalType,
+    StringType,
+    FloatType,
+    DoubleType,
+)
+from ..xpath import Xpath
+
+_Step = Callable[[_Buffer, Dict[str, Any]], None]
+_Skip = Callable[[_Buffer], None]
+
+
+def _skip_function(fcp: FcpV2, type: Type) -> _Skip:
+    """Build a function that moves a buffer past a value without decoding it."""
+    static_size = _bit_size(fcp, type)
+    if static_size is not None:
+        size = static_size
+
+        def skip_static(buffer: _Buffer) -> None:
+            buffer.bitaddr += size
+
+        return skip_static
+    elif isinstance(type, FloatType) or isinstance(type, DoubleType):
+        length = type.get_length()
+
+        def skip_float(buffer: _Buffer) -> None:
+            buffer.bitaddr = ((buffer.bitaddr + 7) & ~7) + length
+
+        return skip_float
+    elif isinstance(type, StringType):
+
+        def skip_str(buffer: _Buffer) -> None:
+            length = buffer.read_word(32)
+            buffer.bitaddr += 8 * length
+
+        return skip_str
+    elif isinstance(type, ArrayType) or isinstance(type, DynamicArrayType):
+        element = _skip_function(fcp, type.underlying_type)
+        element_size = _bit_size(fcp, type.underlying_type)
+        count = type.size if isinstance(type, ArrayType) else None
+
+        def skip_array(buffer: _Buffer) -> None:
+            length = buffer.read_word(32) if count is None else count
+            if element_size is not None:
+                buffer.bitaddr += length * element_size
+                return
+            for _ in range(length):
+                element(buffer)
+
+        return skip_array
+    elif isinstance(type, OptionalType):
+        some = _skip_function(fcp, type.underlying_type)
+
+        def skip_optional(buffer: _Buffer) -> None:
+            if buffer.read_word(8) != 0:
+                some(buffer)
+
+        return skip_optional
+    elif isinstance(type, StructType):
+        fields: List[_Skip] = []
+
+        def skip_struct(buffer: _Buffer) -> None:
+            for skip in fields:
+                skip(buffer)
+
+        # Built on first use, recursive structs only recurse through dynamic
+        # fields so the functions of their fields can't be built upfront.
+        def skip_lazy(buffer: _Buffer) -> None:
+            if not fields:
+                struct = fcp.get_struct(type.name).unwrap()
+                fields.extend(_skip_function(fcp, f.type) for f in struct.fields)
+            skip_struct(buffer)
+
+        return skip_lazy
+
+    raise ValueError("Unmatched type " + str(type))
+
+
+class _Planner:
+    """Plans the steps of a projection.
+
+    ``static`` is the bit position relative to the start of the struct while it
+    is known at plan time, ``pending`` are bits to jump over before the next
+    step.
+    """
+
+    def __init__(self, fcp: FcpV2) -> None:
+        self.fcp = fcp
+        self.steps: List[_Step] = []
+        self.static: Optional[int] = 0
+        self.pending = 0
+
+    def flush(self) -> None:
+        if self.pending:
+            bits = self.pending
+
+            def advance(buffer: _Buffer, result: Dict[str, Any]) -> None:
+                buffer.bitaddr += bits
+
+            self.steps.append(advance)
+            self.pending = 0
+
+    def step(self, step: _Step, type: Type) -> None:
+        """Add a step that reads a value of ``type``."""
+        self.flush()
+        self.steps.append(step)
+
+        size = _bit_size(self.fcp, type)
+        if self.static is None:
+            return
+        elif size is not None:
+            self.static += size
+        elif isinstance(type, FloatType) or isinstance(type, DoubleType):
+            self.static = ((self.static + 7) & ~7) + type.get_length()
+        else:
+            self.static = None
+
+    def skip(self, type: Type) -> None:
+        size = _bit_size(self.fcp, type)
+        if size is not None:
+            self.pending += size
+            if self.static is not None:
+                self.static += size
+        elif self.static is not None and (
+            isinstance(type, FloatType) or isinstance(type, DoubleType)
+        ):
+            aligned = (self.static + 7) & ~7
+            self.pending += aligned - self.static + type.get_length()
+            self.static = aligned + type.get_length()
+        else:
+            skip = _skip_function(self.fcp, type)
+            self.step(lambda buffer, result: skip(buffer), type)
+
+    def decode(self, key: str, type: Type) -> None:
+        fcp = self.fcp
+
+        def decode(buffer: _Buffer, result: Dict[str, Any]) -> None:
+            result[key] = _decode(buffer, fcp, type)
+
+        self.step(decode, type)
+
+    def struct(self, name: str, selection: Dict[str, Any], tail: bool) -> None:
+        """Plan the fields of a struct.
+
+        ``selection`` maps field names to the xpath to decode them as or to the
+        selection of their own fields. Unless ``tail`` is set, no field after
+        the last selected one is needed.
+        """
+        struct = self.fcp.get_struct(name).unwrap()
+        names = [field.name for field in struct.fields]
+        for field_name in selection:
+            if field_name not in names:
+                raise ValueError(f"Field {field_name} not found in struct {name}")
+
+        remaining = len(selection)
+        for field in struct.fields:
+            if remaining == 0 and not tail:
+                return
+
+            selected = selection.get(field.name)
+            if selected is None:
+                self.skip(field.type)
+                continue
+
+            remaining -= 1
+            if isinstance(selected, str):
+                self.decode(selected, field.type)
+            elif isinstance(field.type, StructType):
+                self.struct(field.type.name, selected, tail or remaining > 0)
+            else:
+                raise ValueError(f"Can't select fields inside {field.name}")
+
+
+class Projection:
+    """Decoder of the fields of a struct selected by xpaths.
+
+    ``decode(data, offset=0)`` decodes the struct starting at byte ``offset``
+    of a buffer-protocol object and returns a dictionary from each xpath, as a
+    string, to the value of its field.
+    """
+
+    def __init__(self, fcp: FcpV2, xpaths: Sequence[Union[Xpath, str]]) -> None:
+        parsed = [Xpath(x) if isinstance(x, str) else x for x in xpaths]
+        roots = set(xpath.root for xpath in parsed)
+        if len(roots) != 1:
+            raise ValueError("Projected xpaths must have one root struct")
+
+        self.root = roots.pop()
+        self.xpaths = [str(xpath) for xpath in parsed]
+
+        # Fields inside a selected field are picked from its decoded value.
+        selection: Dict[str, Any] = {}
+        self.nested: List[Tuple[str, str, List[str]]] = []
+        for xpath in sorted(parsed, key=lambda xpath: len(xpath.path)):
+            node = selection
+            for i, name in enumerate(xpath.path[:-1]):
+                child = node.setdefault(name, {})
+                if isinstance(child, str):
+                    self.nested.append((str(xpath), child, xpath.path[i + 1 :]))
+                    break
+                node = child
+            else:
+                node[xpath.path[-1]] = str(xpath)
+
+        planner = _Planner(fcp)
+        planner.struct(self.root, selection, False)
+        self.steps = planner.steps
+
+    def decode(self, data: Any, offset: int = 0) -> Dict[str, Any]:
+        """Decode the selected fields."""
+        if offset < 0:
+            raise ValueError("negative offset")
+
+        buffer = _Buffer()
+        # The buffer is only read from, so the memoryview can stand in for it.
+        buffer.buffer = memoryview(data).cast("B")  # type: ignore
+        buffer.bitaddr = 8 * offset
+
+        result: Dict[str, Any] = {}
+        for step in self.steps:
+            step(buffer, result)
+
+        for key, parent, path in self.nested:
+            value = result[parent]
+            for name in path:
+                value = value[name]
+            result[key] = value
+
+        return result
+
+    def __repr__(self) -> str:
+        return f"Projection xpaths={self.xpaths}"
+
+
+def compile_projection(fcp: FcpV2, xpaths: Sequence[Union[Xpath, str]]) -> Projection:
+    """Plan the decoding of the fields selected by ``xpaths``."""
+    return Projection(fcp, xpaths)
+
+
+def decode_projected(
+    fcp: FcpV2, xpaths: Sequence[Union[Xpath, str]], data: Any, offset: int = 0
+) -> Dict[str, Any]:
+    """Decode the fields selected by ``xpaths``, see :class:`Projection`."""
+    return Projection(fcp, xpaths).decode(data, offset)
@@ -20,7 +20,16 @@
 
 """fcp version 2 AST."""
 
-from beartype.typing import Any, Callable, Union, List, Dict, Generator
+from beartype.typing import (
+    Any,
+    Callable,
+    Union,
+    List,
+    Dict,
+    Generator,
+    Tuple,
+    TypeVar,
+)
 import serde
 import re
 
@@ -40,6 +49,78 @@ def _flatten(xss: List[List[Any]]) -> List[Any]:
     return [x for xs in xss for x in xs]
 
 
+class _NodeList(list):  # type: ignore
+    """List of AST nodes that counts its own mutations.
+
+    FcpV2 uses the mutation count to know when its lookup indexes are stale.
+    """
+
+    def __init__(self, *args: Any) -> None:
+        super().__init__(*args)
+        self.version = 0
+
+    def __reduce__(self) -> Any:
+        # Unpickle through __init__, list unpickling would call extend before
+        # version is set.
+        return (_NodeList, (list(self),))
+
+    def _mutated(self) -> None:
+        self.version += 1
+
+    def append(self, node: Any) -> None:
+        self._mutated()
+        super().append(node)
+
+    def extend(self, nodes: Any) -> None:
+        self._mutated()
+        super().extend(nodes)
+
+    def insert(self, index: Any, node: Any) -> None:
+        self._mutated()
+        super().insert(index, node)
+
+    def remove(self, node: Any) -> None:
+        self._mutated()
+        super().remove(node)
+
+    def pop(self, index: Any = -1) -> Any:
+        self._mutated()
+        return super().pop(index)
+
+    def clear(self) -> None:
+        self._mutated()
+        super().clear()
+
+    def sort(self, *args: Any, **kwargs: Any) -> None:
+        self._mutated()
+        super().sort(*args, **kwargs)
+
+    def reverse(self) -> None:
+        self._mutated()
+        super().reverse()
+
+    def __setitem__(self, index: Any, node: Any) -> None:
+        self._mutated()
+        super().__setitem__(index, node)
+
+    def __delitem__(self, index: Any) -> None:
+        self._mutated()
+        super().__delitem__(index)
+
+    def __iadd__(self, nodes: Any) -> "_NodeList":  # type: ignore
+        self._mutated()
+        return super().__iadd__(nodes)  # type: ignore
+
+    def __imul__(self, n: Any) -> "_NodeList":  # type: ignore
+        self._mutated()
+        return super().__imul__(n)  # type: ignore
+
+
+_INDEXED_FIELDS = ("structs", "enums", "impls")
+
+T = TypeVar("T")
+
+
 def encode_version(version: str) -> int:
     """Encode version string to an integer."""
     major, minor = version.split(".")
@@ -48,7 +129,12 @@ def encode_version(version: str) -> int:
 
 @serde.serde(type_check=serde.strict)
 class FcpV2:
-    """The fcp version 2 AST."""
+    """The fcp version 2 AST.
+
+    Lookups of structs, enums, types and impls go through indexes that are
+    rebuilt whenever the corresponding node lists are modified or replaced.
+    Renaming a node in place is not tracked.
+    """
 
     structs: List[Struct] = serde.field(default_factory=list)
     enums: List[Enum] = serde.field(default_factory=list)
@@ -57,6 +143,83 @@ class FcpV2:
     devices: List[Device] = serde.field(default_factory=list)
     version: str = "3.0"
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in _INDEXED_FIELDS:
+            if not isinstance(value, _NodeList):
+                value = _NodeList(value)
+            self.__dict__.pop("_indexes", None)
+        super().__setattr__(name, value)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state.pop("_indexes", None)
+        return state
+
+    def _get_index(
+        self, name: str, fields: Tuple[str, ...], build: Callable[[], Any]
+    ) -> Any:
+        """Get a lookup index, rebuilding it if its node lists changed."""
+        indexes = self.__dict__.setdefault("_indexes", {})
+        stamp = tuple(getattr(self, field).version for field in fields)
+        if name not in indexes or indexes[name][0] != stamp:
+            indexes[name] = (stamp, build())
+
+        return indexes[name][1]
+
+    def cached(self, name: str, build: Callable[[], T]) -> T:
+        """Get a value derived from the AST, built by ``build`` on first use.
+
+        The value is built again once the structs, enums or impls are modified
+        or replaced, the same as the lookup indexes. ``name`` must be unique
+        to its user, e.g. prefixed by the module name.
+        """
+        return self._get_index(name, _INDEXED_FIELDS, build)  # type: ignore
+
+    def _get_struct_index(self) -> Dict[str, Struct]:
+        def build() -> Dict[str, Struct]:
+            index: Dict[str, Struct] = {}
+            for struct in self.structs:
+                index.setdefault(struct.name, struct)
+            return index
+
+        return self._get_index("structs", ("structs",), build)  # type: ignore
+
+    def _get_enum_index(self) -> Dict[str, Enum]:
+        def build() -> Dict[str, Enum]:
+            index: Dict[str, Enum] = {}
+            for enum in self.enums:
+                index.setdefault(enum.name, enum)
+            return index
+
+        return self._get_index("enums", ("enums",), build)  # type: ignore
+
+    def _get_type_index(self) -> Dict[str, Union[Struct, Enum]]:
+        def build() -> Dict[str, Union[Struct, Enum]]:
+            index: Dict[str, Union[Struct, Enum]] = {}
+            for type in self.structs + self.enums:
+                index.setdefault(type.name, type)
+            return index
+
+        return self._get_index("types", ("structs", "enums"), build)  # type: ignore
+
+    def _get_impl_index(self) -> Dict[Tuple[str, str], List[Impl]]:
+        def build() -> Dict[Tuple[str, str], List[Impl]]:
+            index: Dict[Tuple[str, str], List[Impl]] = {}
+            for impl in self.impls:
+                index.setdefault((impl.type, impl.protocol), []).append(impl)
+            return index
+
+        return self._get_index("impls", ("impls",), build)  # type: ignore
+
+    def _get_protocol_index(self) -> Dict[str, List[Impl]]:
+        def build() -> Dict[str, List[Impl]]:
+            index: Dict[str, List[Impl]] = {}
+            for impl in self.impls:
+                index.setdefault(impl.protocol, []).append(impl)
+            return index
+
+        return self._get_index("protocols", ("impls",), build)  # type: ignore
+
     def merge(self, fcp: "FcpV2") -> None:
         """Merge two fcp ASTs."""
         self.structs += fcp.structs
@@ -65,10 +228,9 @@ class FcpV2:
 
     def get_type(self, type: Type) -> Maybe[Union[Enum, Struct]]:
         """Get node corresponding to type."""
-        for type_ in self.structs + self.enums:
-            if (
-                isinstance(type, StructType) or isinstance(type, EnumType)
-            ) and type.name == type_.name:
+        if isinstance(type, StructType) or isinstance(type, EnumType):
+            type_ = self._get_type_index().get(type.name)
+            if type_ is not None:
                 return Some(type_)
 
         return Nothing()
@@ -107,46 +269,38 @@ class FcpV2:
 
     def get_matching_impl(self, struct: Struct, protocol: str) -> List[Impl]:
         """Get impl for corresponding struct with a specific protocol."""
-        impls = []
-        for extension in self.impls:
-            if extension.type == struct.name and extension.protocol == protocol:
-                impls.append(extension)
-
-        return impls
+        return list(self._get_impl_index().get((struct.name, protocol), []))
 
     def get_matching_impls(self, protocol: str) -> Generator[Impl, None, None]:
         """Get impls by protocol name."""
-        for impl in self.impls:
-            if impl.protocol == protocol:
-                yield impl
+        yield from list(self._get_protocol_index().get(protocol, []))
 
     def get_matching_impls_or_default(self, protocol: str) -> List[Impl]:
         """Get list of impls matching protocol or the default for a given struct."""
+        index = self._get_impl_index()
         impls = []
         for struct in self.structs:
-            tmp = self.get_matching_impl(struct, protocol)
-            if len(tmp) != 0:
-                impls += tmp
-            else:
-                impls += self.get_matching_impl(struct, "default")
+            impls += index.get((struct.name, protocol)) or index.get(
+                (struct.name, "default"), []
+            )
 
         return impls
 
     def get_struct(self, name: str) -> Maybe[Struct]:
         """Get struct by name."""
-        for struct in self.structs:
-            if struct.name == name:
-                return Some(struct)
+        struct = self._get_struct_index().get(name)
+        if struct is None:
+            return Nothing()
 
-        return Nothing()
+        return Some(struct)
 
     def get_enum(self, name: str) -> Maybe[Enum]:
         """Get enum by name."""
-        for enum in self.enums:
-            if enum.name == name:
-                return Some(enum)
+        enum = self._get_enum_index().get(name)
+        if enum is None:
+            return Nothing()
 
-        return Nothing()
+        return Some(enum)
 
     def get_xpath(self, xpath: Xpath) -> Result[StructField, str]:
         """Get struct field by xpath."""
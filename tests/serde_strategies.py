@@ -0,0 +1,163 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# ruff: noqa: D103 D100
+
+"""Hypothesis strategies for random fcp schemas and matching data.
+
+Schemas are drawn as plain tuples and built with build_schema outside of the
+strategies, as the fcp AST nodes are type checked by beartype which relies on
+the random module.
+"""
+
+from beartype.typing import Any, Callable, List, Tuple
+from hypothesis import strategies as st
+
+from fcp.specs.v2 import FcpV2
+from fcp.specs.struct import Struct
+from fcp.specs.struct_field import StructField
+from fcp.specs.type import (
+    Type,
+    ArrayType,
+    StructType,
+    DynamicArrayType,
+    OptionalType,
+    StringType,
+    UnsignedType,
+    SignedType,
+    FloatType,
+    DoubleType,
+)
+
+LEAF_KINDS = ["unsigned", "signed", "float", "double", "str"]
+KINDS = LEAF_KINDS + ["array", "dynamic_array", "optional", "struct"]
+FIXED_LEAF_KINDS = ["unsigned", "signed", "float", "double"]
+FIXED_KINDS = FIXED_LEAF_KINDS + ["array", "struct"]
+
+
+def draw_type(
+    draw: Callable[..., Any], depth: int = 0, fixed: bool = False
+) -> Tuple[Any, ...]:
+    if fixed:
+        kind = draw(st.sampled_from(FIXED_KINDS if depth < 3 else FIXED_LEAF_KINDS))
+    else:
+        kind = draw(st.sampled_from(KINDS if depth < 3 else LEAF_KINDS))
+
+    if kind == "unsigned":
+        return ("unsigned", draw(st.integers(1, 64)))
+    elif kind == "signed":
+        return ("signed", draw(st.integers(2, 64)))
+    elif kind == "array":
+        underlying_type = draw_type(draw, depth + 1, fixed)
+        sizes = [0, 1, 3, 70] if underlying_type[0] == "unsigned" else [1, 3]
+        return ("array", underlying_type, draw(st.sampled_from(sizes)))
+    elif kind == "dynamic_array" or kind == "optional":
+        return (kind, draw_type(draw, depth + 1))
+    elif kind == "struct":
+        return draw_struct(draw, depth + 1, fixed)
+
+    return (kind,)
+
+
+def draw_struct(
+    draw: Callable[..., Any], depth: int = 0, fixed: bool = False
+) -> Tuple[Any, ...]:
+    fields = [draw_type(draw, depth, fixed) for _ in range(draw(st.integers(1, 5)))]
+    return ("struct", fields)
+
+
+def draw_value(draw: Callable[..., Any], type: Tuple[Any, ...]) -> Any:
+    kind = type[0]
+    if kind == "unsigned":
+        return draw(st.integers(0, 2 ** type[1] - 1))
+    elif kind == "signed":
+        half = 2 ** (type[1] - 1)
+        return draw(st.integers(-half, half - 1))
+    elif kind == "float":
+        return draw(st.floats(width=32, allow_nan=False))
+    elif kind == "double":
+        return draw(st.floats(allow_nan=False))
+    elif kind == "str":
+        return draw(st.text(st.characters(codec="ascii"), max_size=8))
+    elif kind == "array":
+        return [draw_value(draw, type[1]) for _ in range(type[2])]
+    elif kind == "dynamic_array":
+        return [draw_value(draw, type[1]) for _ in range(draw(st.integers(0, 3)))]
+    elif kind == "optional":
+        return None if draw(st.booleans()) else draw_value(draw, type[1])
+    elif kind == "struct":
+        return {f"field{i}": draw_value(draw, field) for i, field in enumerate(type[1])}
+
+    raise ValueError(f"Unexpected type {type}")
+
+
+@st.composite
+def schemas_and_values(draw: Callable[..., Any]) -> Tuple[Tuple[Any, ...], Any]:
+    """Draw a random schema and data for it."""
+    schema = draw_struct(draw)
+    return schema, draw_value(draw, schema)
+
+
+@st.composite
+def schemas_and_batches(
+    draw: Callable[..., Any], fixed: bool = False
+) -> Tuple[Tuple[Any, ...], List[Any]]:
+    """Draw a random schema and a batch of data for it.
+
+    With ``fixed`` the schema only has fields of static size.
+    """
+    schema = draw_struct(draw, fixed=fixed)
+    values = [draw_value(draw, schema) for _ in range(draw(st.integers(0, 5)))]
+    return schema, values
+
+
+def _build_type(fcp: FcpV2, type: Tuple[Any, ...]) -> Type:
+    kind = type[0]
+    if kind == "unsigned":
+        return UnsignedType(f"u{type[1]}")
+    elif kind == "signed":
+        return SignedType(f"i{type[1]}")
+    elif kind == "float":
+        return FloatType()
+    elif kind == "double":
+        return DoubleType()
+    elif kind == "str":
+        return StringType()
+    elif kind == "array":
+        return ArrayType(_build_type(fcp, type[1]), type[2])
+    elif kind == "dynamic_array":
+        return DynamicArrayType(_build_type(fcp, type[1]))
+    elif kind == "optional":
+        return OptionalType(_build_type(fcp, type[1]))
+
+    fields: List[StructField] = [
+        StructField(f"field{i}", i, _build_type(fcp, field))
+        for i, field in enumerate(type[1])
+    ]
+    name = f"S{len(fcp.structs)}"
+    fcp.structs.append(Struct(name, fields))
+    return StructType(name)
+
+
+def build_schema(schema: Tuple[Any, ...]) -> Tuple[FcpV2, str]:
+    """Build the fcp AST of a drawn schema and the name of its top level struct."""
+    fcp = FcpV2()
+    name = _build_type(fcp, schema).name  # type: ignore
+    return fcp, name
@@ -0,0 +1,166 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ruff: noqa: D103 D100
+
+from beartype.typing import Any, List, Tuple
+from hypothesis import given, settings
+import pytest
+
+from fcp.serde import encode, decode, decode_batch
+from fcp.specs.v2 import FcpV2
+from fcp.specs.struct import Struct
+from fcp.specs.struct_field import StructField
+from fcp.specs.type import (
+    ArrayType,
+    StructType,
+    DynamicArrayType,
+    StringType,
+    UnsignedType,
+    SignedType,
+    FloatType,
+)
+
+from .serde_strategies import schemas_and_batches, build_schema
+
+np = pytest.importorskip("numpy")
+
+
+def pick(value: Any, path: List[str]) -> Any:
+    if not path:
+        return value
+    if isinstance(value, list):
+        return [pick(x, path) for x in value]
+    return pick(value[path[0]], path[1:])
+
+
+def matches(actual: Any, expected: Any) -> bool:
+    if isinstance(expected, list) and isinstance(actual, np.ndarray):
+        return len(actual) == len(expected) and all(
+            matches(a, e) for a, e in zip(actual, expected)
+        )
+    return bool(actual == expected)
+
+
+def check_batch(schema: Tuple[Any, ...], values: List[Any]) -> None:
+    fcp, name = build_schema(schema)
+    frames = [encode(fcp, name, value) for value in values]
+
+    columns = decode_batch(fcp, name, frames)
+
+    for path, column in columns.items():
+        assert len(column) == len(frames)
+        for row, frame in zip(column, frames):
+            assert matches(row, pick(decode(fcp, name, frame), path.split("/")))
+
+
+@settings(max_examples=200, deadline=None)  # type: ignore
+@given(schemas_and_batches(fixed=True))  # type: ignore
+def test_decode_batch_fixed_layout(schema_and_values: Tuple[Any, Any]) -> None:
+    check_batch(*schema_and_values)
+
+
+@settings(max_examples=100, deadline=None)  # type: ignore
+@given(schemas_and_batches())  # type: ignore
+def test_decode_batch_matches_decode(schema_and_values: Tuple[Any, Any]) -> None:
+    check_batch(*schema_and_values)
+
+
+def test_decode_batch_columns() -> None:
+    fcp = FcpV2(
+        structs=[
+            Struct(
+                "Point",
+                [
+                    StructField("x", 0, SignedType("i12")),
+                    StructField("y", 1, FloatType()),
+                ],
+            ),
+            Struct(
+                "Msg",
+                [
+                    StructField("flag", 0, UnsignedType("u1")),
+                    StructField("points", 1, ArrayType(StructType("Point"), 2)),
+                    StructField("raw", 2, UnsignedType("u64")),
+                ],
+            ),
+        ]
+    )
+    values = [
+        {
+            "flag": i % 2,
+            "points": [{"x": -i, "y": i / 2}, {"x": 2047 - i, "y": -1.5}],
+            "raw": 2**64 - 1 - i,
+        }
+        for i in range(4)
+    ]
+    frames = np.array([list(encode(fcp, "Msg", value)) for value in values], np.uint8)
+
+    columns = decode_batch(fcp, "Msg", frames)
+
+    assert sorted(columns) == ["flag", "points/x", "points/y", "raw"]
+    assert columns["flag"].dtype == np.uint8
+    assert columns["flag"].tolist() == [0, 1, 0, 1]
+    assert columns["points/x"].dtype == np.int16
+    assert columns["points/x"].tolist() == [[-i, 2047 - i] for i in range(4)]
+    assert columns["points/y"].dtype == np.float32
+    assert columns["points/y"].tolist() == [[i / 2, -1.5] for i in range(4)]
+    assert columns["raw"].dtype == np.uint64
+    assert columns["raw"].tolist() == [2**64 - 1 - i for i in range(4)]
+
+
+def test_decode_batch_dynamic_fields() -> None:
+    fcp = FcpV2(
+        structs=[
+            Struct(
+                "Msg",
+                [
+                    StructField("id", 0, UnsignedType("u16")),
+                    StructField("name", 1, StringType()),
+                    StructField("data", 2, DynamicArrayType(UnsignedType("u8"))),
+                ],
+            ),
+        ]
+    )
+    values = [
+        {"id": 1, "name": "a", "data": []},
+        {"id": 2, "name": "bcd", "data": [1, 2, 3]},
+    ]
+
+    columns = decode_batch(fcp, "Msg", [encode(fcp, "Msg", x) for x in values])
+
+    assert columns["id"].dtype == np.uint16
+    assert columns["id"].tolist() == [1, 2]
+    assert columns["name"].dtype == object
+    assert columns["name"].tolist() == ["a", "bcd"]
+    assert columns["data"].tolist() == [[], [1, 2, 3]]
+
+
+def test_decode_batch_overrun() -> None:
+    fcp = FcpV2(
+        structs=[Struct("Msg", [StructField("x", 0, UnsignedType("u32"))])],
+    )
+
+    with pytest.raises(ValueError):
+        decode_batch(fcp, "Msg", [b"\x00\x00\x00\x00", b"\x00\x00"])
+    with pytest.raises(ValueError):
+        decode_batch(fcp, "Msg", np.zeros((2, 3), dtype=np.uint8))
+
+    columns = decode_batch(fcp, "Msg", [b"\x01\x00\x00\x00\xff"])
+    assert columns["x"].tolist() == [1]
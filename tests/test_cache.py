@@ -0,0 +1,107 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# ruff: noqa: D103 D100
+
+import os
+import pytest
+from pathlib import Path
+
+import fcp.parser
+from fcp.cache import AstCache
+from fcp.parser import get_fcp
+
+
+def write_schema(directory: Path) -> Path:
+    (directory / "units.fcp").write_text(
+        'version: "3"\n\nstruct Units {\n    volt @0: u8,\n}\n'
+    )
+    main = directory / "main.fcp"
+    main.write_text(
+        'version: "3"\n\nmod units;\n\nstruct S1 {\n    field1 @0: Units,\n}\n'
+    )
+    return main
+
+
+def test_cache_hit(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = AstCache(tmp_path / "cache")
+    main = write_schema(tmp_path)
+
+    parsed = get_fcp(main, cache=cache).unwrap()
+    monkeypatch.setattr(fcp.parser, "_parse", None)
+    cached = get_fcp(main, cache=cache).unwrap()
+
+    assert cached == parsed
+    assert cached is not parsed
+    assert cached.structs[0].meta == parsed.structs[0].meta
+
+
+def test_cache_is_invalidated_by_imported_modules(tmp_path: Path) -> None:
+    cache = AstCache(tmp_path / "cache")
+    main = write_schema(tmp_path)
+
+    get_fcp(main, cache=cache).unwrap()
+    (tmp_path / "units.fcp").write_text(
+        'version: "3"\n\nstruct Units {\n    volt @0: u16,\n}\n'
+    )
+    fcp = get_fcp(main, cache=cache).unwrap()
+
+    assert fcp.get_struct("Units").unwrap().fields[0].type.name == "u16"
+
+
+def test_cache_clear(tmp_path: Path) -> None:
+    cache = AstCache(tmp_path / "cache")
+    main = write_schema(tmp_path)
+
+    get_fcp(main, cache=cache).unwrap()
+    assert any(cache.directory.iterdir())
+
+    other = cache.directory / "other.txt"
+    other.write_text("not a cache entry")
+
+    cache.clear()
+    assert list(cache.directory.iterdir()) == [other]
+
+
+def test_cache_is_keyed_by_working_directory(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cache = AstCache(tmp_path / "cache")
+    main = write_schema(tmp_path)
+
+    monkeypatch.chdir(tmp_path)
+    get_fcp(main, cache=cache).unwrap()
+    (tmp_path / "sub").mkdir()
+    monkeypatch.chdir(tmp_path / "sub")
+    fcp = get_fcp(main, cache=cache).unwrap()
+
+    assert fcp.structs[0].meta.filename == os.path.join("..", "units.fcp")
+
+
+def test_cache_hit_with_shared_imports(tmp_path: Path) -> None:
+    (tmp_path / "a.fcp").write_text('version: "3"\n\nmod units;\n')
+    main = write_schema(tmp_path)
+    main.write_text(main.read_text().replace("mod units;", "mod units;\nmod a;"))
+    cache = AstCache(tmp_path / "cache")
+
+    get_fcp(str(tmp_path / "a.fcp"), cache=cache).unwrap()
+    fcp = get_fcp(str(main), cache=cache).unwrap()
+
+    assert [struct.name for struct in fcp.structs] == ["Units", "S1"]
@@ -0,0 +1,262 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ruff: noqa: D103 D100
+
+import glob
+import math
+import os
+import random
+from beartype.typing import Any, Dict, List
+import cantools
+import pytest
+
+from fcp.can import CanCodec
+from fcp.can.codec import dlc_code, dlc_length, fd_length
+from fcp.parser import get_fcp, get_fcp_from_string
+from fcp.specs.v2 import FcpV2
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DBC_SCHEMAS = os.path.join(
+    THIS_DIR, "..", "plugins", "fcp_dbc", "tests", "schemas", "generator"
+)
+
+SCHEMA = """version: "3"
+
+enum State {
+    Off = 0,
+    On = 1,
+    Error = 2,
+}
+
+struct Point {
+    x @0: i4,
+    y @1: u4,
+}
+
+struct Engine {
+    rpm @0: u12,
+    temp @1: i8,
+    state @2: State,
+    torque @3: i10,
+    power @4: f32,
+}
+
+struct Path {
+    points @0: [Point, 3],
+    speed @1: u16,
+    origin @2: Point,
+}
+
+struct Precise {
+    value @0: f64,
+}
+
+device ecu {
+    protocol can {
+        impl Engine {
+            id: 0x100,
+
+            signal rpm {
+                scale: 0.25,
+            },
+
+            signal temp {
+                offset: -40,
+            },
+        },
+
+        impl Path {
+            id: 0x101,
+
+            signal speed {
+                endianess: "big",
+            },
+        },
+
+        impl Precise {
+            id: 0x102,
+        },
+    },
+}
+"""
+
+
+def make_fcp(source: str = SCHEMA) -> FcpV2:
+    return get_fcp_from_string(source).unwrap()
+
+
+def test_decode_encode() -> None:
+    codec = CanCodec(make_fcp())
+    engine = {
+        "rpm": 900.25,
+        "temp": -20,
+        "state": 2,
+        "torque": -512,
+        "power": 0.5,
+    }
+
+    data = codec.encode("Engine", engine)
+
+    assert len(data) == 8
+    assert codec.decode(0x100, data) == engine
+    assert codec.decode(0x100, bytearray(data)) == engine
+    assert codec.frames[0x100].decode_word(int.from_bytes(data, "little")) == engine
+
+
+def test_signal_layout() -> None:
+    message = CanCodec(make_fcp()).messages["Engine"]
+
+    assert [(s.name, s.shift, s.length, s.kind) for s in message.signals] == [
+        ("rpm", 0, 12, "unsigned"),
+        ("temp", 12, 8, "signed"),
+        ("state", 20, 2, "unsigned"),
+        ("torque", 22, 10, "signed"),
+        ("power", 32, 32, "float"),
+    ]
+    assert message.signals[0].scale == 0.25
+    assert message.signals[1].offset == -40
+    assert message.length == 8
+
+
+def test_nested_structs_and_arrays() -> None:
+    codec = CanCodec(make_fcp())
+    path = {
+        "points_0::x": -8,
+        "points_0::y": 15,
+        "points_1::x": 7,
+        "points_1::y": 0,
+        "points_2::x": -1,
+        "points_2::y": 3,
+        "speed": 0x1234,
+        "origin::x": 1,
+        "origin::y": 2,
+    }
+
+    data = codec.encode("Path", path)
+
+    assert codec.decode(0x101, data) == path
+    # speed is big endian, it starts at bit 24.
+    assert data[3:5] == b"\x12\x34"
+
+
+def test_double() -> None:
+    codec = CanCodec(make_fcp())
+
+    for value in [math.pi, -0.0, math.inf, 1e300]:
+        data = codec.encode("Precise", {"value": value})
+        assert codec.decode(0x102, data) == {"value": value}
+
+
+def test_values_are_masked() -> None:
+    codec = CanCodec(make_fcp())
+    path = {signal.name: 0 for signal in codec.messages["Path"].signals}
+    data = codec.encode("Path", {**path, "speed": 0x12345, "points_0::x": 9})
+
+    decoded = codec.decode(0x101, data)
+
+    assert decoded["speed"] == 0x2345
+    assert decoded["points_0::x"] == -7
+
+
+def test_errors() -> None:
+    codec = CanCodec(make_fcp())
+
+    with pytest.raises(KeyError):
+        codec.decode(0x200, bytes(8))
+    with pytest.raises(ValueError, match="shorter than 6 bytes"):
+        codec.decode(0x101, bytes(5))
+
+    duplicate = SCHEMA.replace("id: 0x102", "id: 0x100")
+    with pytest.raises(ValueError, match="same id"):
+        CanCodec(make_fcp(duplicate))
+
+    too_big = SCHEMA.replace("value @0: f64,", "value @0: f64,\n    more @1: [u64, 8],")
+    with pytest.raises(ValueError, match="too big"):
+        CanCodec(make_fcp(too_big))
+
+
+def test_can_fd() -> None:
+    fd = SCHEMA.replace("value @0: f64,", "value @0: f64,\n    more @1: [u16, 2],")
+    codec = CanCodec(make_fcp(fd))
+    message = codec.messages["Precise"]
+
+    assert (message.length, message.dlc, message.fd) == (12, 9, True)
+    assert not codec.messages["Path"].fd
+
+    values = {"value": 0.5, "more_0": 0x1234, "more_1": 0xABCD}
+    data = codec.encode("Precise", values)
+    assert len(data) == 12
+    assert data[8:] == b"\x34\x12\xcd\xab"
+    assert codec.decode(0x102, data) == values
+
+
+def test_dlc() -> None:
+    assert [fd_length(n) for n in (0, 8, 9, 12, 13, 33, 64)] == [
+        0,
+        8,
+        12,
+        12,
+        16,
+        48,
+        64,
+    ]
+    assert [dlc_code(n) for n in (0, 5, 8, 10, 20, 40, 64)] == [0, 5, 8, 9, 11, 14, 15]
+    assert [dlc_length(dlc_code(n)) for n in range(65)] == [
+        fd_length(n) for n in range(65)
+    ]
+
+    with pytest.raises(ValueError, match="at most 64 bytes"):
+        dlc_code(65)
+    with pytest.raises(ValueError, match="Invalid data length code"):
+        dlc_length(16)
+
+
+def dbc_schemas() -> List[Any]:
+    params = []
+    for path in sorted(glob.glob(os.path.join(DBC_SCHEMAS, "*.fcp"))):
+        for dbc in sorted(glob.glob(path[: -len(".fcp")] + "_*.dbc")):
+            bus = dbc[len(path) - len(".fcp") + 1 : -len(".dbc")]
+            params.append(pytest.param(path, dbc, bus, id=os.path.basename(dbc)))
+    return params
+
+
+@pytest.mark.parametrize("path,dbc,bus", dbc_schemas())
+def test_matches_dbc(path: str, dbc: str, bus: str) -> None:
+    codec = CanCodec(get_fcp(path).unwrap(), None if bus == "default" else bus)
+    database = cantools.database.load_file(dbc)
+    assert isinstance(database, cantools.database.can.Database)
+    rng = random.Random(0)
+
+    for message in database.messages:
+        ours = codec.frames[message.frame_id]
+        for _ in range(100):
+            data = bytes(rng.randrange(256) for _ in range(message.length))
+            try:
+                expected = message.decode(data, decode_choices=False)
+                assert isinstance(expected, dict)
+            except cantools.database.errors.DecodeError:
+                continue
+
+            decoded: Dict[str, Any] = {
+                name.replace("::", "_"): value
+                for name, value in ours.decode(data).items()
+            }
+            assert {name: decoded[name] for name in expected} == expected
+            assert ours.decode(ours.encode(ours.decode(data))) == ours.decode(data)
@@ -0,0 +1,144 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ruff: noqa: D103 D100
+
+import math
+import os
+import tempfile
+from click.testing import CliRunner
+import pytest
+
+from fcp.__main__ import main
+from fcp.can import CanCodec
+from fcp.can.analysis import (
+    FrameTiming,
+    _response_times,
+    analyze,
+    fd_frame_bits,
+    frame_bits,
+    transmission_bits,
+)
+from fcp.parser import get_fcp_from_string
+
+from .test_can import SCHEMA
+
+PERIODIC = SCHEMA.replace("id: 0x100,", "id: 0x100, period: 10,").replace(
+    "id: 0x101,", "id: 0x101, period: 20,"
+)
+
+
+def test_frame_bits() -> None:
+    assert frame_bits(0) == 55
+    assert frame_bits(8) == 135
+    assert frame_bits(0, extended=True) == 80
+    assert frame_bits(8, extended=True) == 160
+
+
+def test_fd_frame_bits() -> None:
+    assert fd_frame_bits(12) == (34, 153)
+    assert fd_frame_bits(64) == (34, 678)
+    assert fd_frame_bits(64, extended=True) == (57, 679)
+
+    assert transmission_bits(8) == frame_bits(8)
+    # Rounded up to 12 bytes, the data phase four times as fast.
+    assert transmission_bits(10, False, 500000, 2000000) == 34 + 153 / 4
+
+
+def test_response_times_revised() -> None:
+    # Example of Davis et al. (2007), 1 ms frames at 125 bit/ms, where the
+    # second instance of the lowest priority frame has the longest response.
+    assert _response_times([(125, 312.5), (125, 437.5), (125, 437.5)]) == [
+        250,
+        375,
+        437.5,
+    ]
+
+
+def test_response_times_overload() -> None:
+    responses = _response_times([(100, 150), (100, 200), (50, None)])
+
+    assert responses[0] == 200
+    assert responses[1:] == [math.inf, math.inf]
+
+
+def test_priority() -> None:
+    frames = [
+        FrameTiming("a", 0x101 << 18, 0, None, 0.0),
+        FrameTiming("b", 0x101, 0, None, 0.0),
+        FrameTiming("c", 0x100 << 18 | 0x3FFFF, 0, None, 0.0),
+    ]
+
+    assert [f.name for f in sorted(frames, key=FrameTiming.priority)] == [
+        "c",
+        "b",
+        "a",
+    ]
+
+
+def test_analyze() -> None:
+    fcp = get_fcp_from_string(PERIODIC).unwrap()
+    timing = analyze(fcp)["default"]
+    engine, path, precise = timing.frames
+
+    assert {f.name: f.length for f in timing.frames} == {
+        m.name: m.length for m in CanCodec(fcp).messages.values()
+    }
+    assert [f.period for f in timing.frames] == [0.01, 0.02, None]
+    assert engine.transmission == pytest.approx(135 / 500000)
+    assert timing.utilization == pytest.approx(135 / 5000 + 115 / 10000)
+    assert engine.response == pytest.approx(270 / 500000)
+    assert path.response == pytest.approx(385 / 500000)
+    assert precise.response == pytest.approx(385 / 500000)
+    assert timing.missed == []
+
+    assert not any(f.fd for f in timing.frames)
+
+    slow = analyze(fcp, bitrate=10000)["default"]
+    assert [f.name for f in slow.missed] == ["Engine", "Path"]
+    assert analyze(fcp, bus="other") == {}
+
+
+def test_analyze_can_fd() -> None:
+    fd = PERIODIC.replace("value @0: f64,", "value @0: f64,\n    more @1: u16,")
+    timing = analyze(get_fcp_from_string(fd).unwrap(), data_bitrate=4000000)
+    precise = timing["default"].frames[2]
+
+    assert (precise.name, precise.length, precise.fd) == ("Precise", 12, True)
+    assert precise.transmission == pytest.approx((34 + 153 / 8) / 500000)
+
+
+def test_can_analyze_cli() -> None:
+    runner = CliRunner()
+    with tempfile.TemporaryDirectory() as tmp:
+        schema = os.path.join(tmp, "schema.fcp")
+        with open(schema, "w") as f:
+            f.write(PERIODIC)
+
+        result = runner.invoke(main, ["--no-cache", "can-analyze", schema])
+        assert result.exit_code == 0, result.output
+        assert "Bus default: 3 frames, 3.9% load at 500000 bit/s" in result.output
+        assert "0x101 Path: dlc 6, period 20ms, response 0.770ms" in result.output
+
+        result = runner.invoke(
+            main, ["--no-cache", "can-analyze", schema, "--bitrate", "10000"]
+        )
+        assert result.exit_code == 1
+        assert "response unbounded, DEADLINE MISS" in result.output
+        assert "2 frames can miss their deadline" in result.output
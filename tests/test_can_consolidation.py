@@ -0,0 +1,250 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ruff: noqa: D103 D100
+
+import os
+import tempfile
+from click.testing import CliRunner
+import pytest
+
+from fcp.__main__ import main
+from fcp.can import CanCodec
+from fcp.can.analysis import analyze
+from fcp.can.consolidation import plan_consolidation, rewrite_schema
+from fcp.parser import get_fcp_from_string
+from fcp.specs.v2 import FcpV2
+
+SCHEMA = """\
+version: "3"
+
+enum Mode {
+    Idle = 0,
+    Run = 1,
+}
+
+struct Temp {
+    value @0: i8,
+}
+
+struct Pressure {
+    value @0: u12,
+    mode @1: Mode,
+}
+
+struct Voltage {
+    cell @0: u16 | unit("mV"),
+}
+
+struct Big {
+    a @0: u32,
+    b @1: u32,
+}
+
+struct Sensor {
+    raw @0: u4,
+}
+
+struct Level {
+    level @0: u8,
+    sensor @1: Sensor,
+}
+
+struct Muxed {
+    index @0: u2,
+    value @1: u8,
+}
+
+struct Current {
+    value @0: i16,
+}
+
+device ecu {
+    protocol can {
+        impl Temp {
+            id: 0x200,
+            period: 100,
+
+            signal value {
+                offset: -40,
+            },
+        },
+
+        // pressure sensor
+        impl Pressure {
+            id: 0x201,
+            period: 100,
+        },
+
+        impl Voltage {
+            id: 0x202,
+            period: 100,
+        },
+
+        impl Big {
+            id: 0x203,
+            period: 100,
+        },
+
+        impl Level {
+            id: 0x204,
+            period: 100,
+        },
+
+        impl Muxed {
+            id: 0x205,
+            period: 100,
+
+            signal value {
+                mux_count: 4,
+                mux_signal: "index",
+            },
+        },
+
+        impl Current {
+            id: 0x100,
+            period: 10,
+        },
+    },
+}
+
+device bms {
+    protocol can {
+        impl Current as BmsCurrent {
+            id: 0x300,
+            period: 10,
+        },
+    },
+}
+"""
+
+
+def make_fcp() -> FcpV2:
+    return get_fcp_from_string(SCHEMA).unwrap()
+
+
+def test_plan() -> None:
+    plan = plan_consolidation(make_fcp())
+
+    assert [
+        (f.name, f.frame_id, f.length, f.device, f.period) for f in plan.frames
+    ] == [("ecu_100ms_0", 0x200, 7, "ecu", 100)]
+    assert [impl.name for impl in plan.frames[0].members] == [
+        "Temp",
+        "Pressure",
+        "Voltage",
+        "Level",
+    ]
+    # Four frames of 47 + 8n bits and stuffing become one.
+    assert plan.reduction["default"] == pytest.approx(
+        (sum(47 + 8 * n + (33 + 8 * n) // 4 for n in (1, 2, 2, 2)) - (47 + 56 + 22))
+        / 0.1
+        / 500000
+    )
+    assert plan.load_after["default"] < plan.load_before["default"]
+
+
+def test_plan_can_fd_length() -> None:
+    plan = plan_consolidation(make_fcp(), max_length=64)
+
+    assert [sorted(impl.name for impl in f.members) for f in plan.frames] == [
+        ["Big", "Level", "Pressure", "Temp", "Voltage"],
+    ]
+    # 113 bits are sent in a 16 byte CAN FD frame, with the data phase at
+    # four times the nominal bitrate.
+    (frame,) = plan.frames
+    assert frame.length == 16
+    members = {impl.name for impl in frame.members}
+    merged_load = sum(
+        f.transmission / f.period
+        for f in analyze(make_fcp())["default"].frames
+        if f.name in members
+    )
+    assert plan.reduction["default"] == pytest.approx(
+        merged_load - (34 + 193 / 4) / 0.1 / 500000
+    )
+
+
+def test_conflicting_signal_blocks_are_not_merged() -> None:
+    # Level gets a nested value without the offset of the value of Temp.
+    fcp = get_fcp_from_string(SCHEMA.replace("raw @0", "value @0")).unwrap()
+    plan = plan_consolidation(fcp, max_length=64)
+    members = [[impl.name for impl in frame.members] for frame in plan.frames]
+
+    assert not any("Level" in names and "Temp" in names for names in members)
+    assert not any("Muxed" in names for names in members)
+
+
+def test_rewrite_schema() -> None:
+    fcp = make_fcp()
+    sources = rewrite_schema(fcp, plan_consolidation(fcp), {"main.fcp": SCHEMA}.get)
+
+    rewritten = get_fcp_from_string(sources["main.fcp"]).unwrap()
+    codec = CanCodec(rewritten)
+
+    assert sorted(codec.messages) == [
+        "Big",
+        "BmsCurrent",
+        "Current",
+        "Muxed",
+        "ecu_100ms_0",
+    ]
+    merged = codec.messages["ecu_100ms_0"]
+    assert (merged.frame_id, merged.length) == (0x200, 7)
+    assert [(s.name, s.length, s.offset) for s in merged.signals] == [
+        ("Temp_value", 8, -40),
+        ("Pressure_value", 12, 0),
+        ("mode", 1, 0),
+        ("cell", 16, 0),
+        ("level", 8, 0),
+        ("sensor::raw", 4, 0),
+    ]
+    assert rewritten.get_struct("ecu_100ms_0").unwrap().fields[3].unit == "mV"
+    assert "impl Pressure" not in sources["main.fcp"]
+
+
+def test_rewrite_schema_without_source_locations() -> None:
+    fcp = make_fcp()
+    plan = plan_consolidation(fcp)
+    plan.frames[0].members[1].meta = None
+
+    with pytest.raises(ValueError, match="No source location of impl"):
+        rewrite_schema(fcp, plan, {"main.fcp": SCHEMA}.get)
+
+
+def test_can_consolidate_cli() -> None:
+    runner = CliRunner()
+    with tempfile.TemporaryDirectory() as tmp:
+        schema = os.path.join(tmp, "schema.fcp")
+        with open(schema, "w") as f:
+            f.write(SCHEMA)
+
+        output = os.path.join(tmp, "out")
+        result = runner.invoke(
+            main, ["--no-cache", "can-consolidate", schema, "--output", output]
+        )
+        assert result.exit_code == 0, result.output
+        assert (
+            "ecu_100ms_0 (0x200, 7 bytes, 100ms): Temp, Pressure, Voltage, Level"
+            in result.output
+        )
+        assert "Bus default: " in result.output
+
+        with open(os.path.join(output, "schema.fcp")) as f:
+            assert "impl ecu_100ms_0 {" in f.read()
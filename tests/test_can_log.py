@@ -0,0 +1,209 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ruff: noqa: D103 D100
+
+import logging
+import os
+import random
+import tempfile
+from beartype.typing import Any, List, Tuple
+from click.testing import CliRunner
+import pytest
+
+from fcp.__main__ import main
+from fcp.can import CanCodec
+from fcp.can.log import (
+    decode_frames,
+    frame_dtype,
+    parse_asc,
+    parse_candump,
+    read_log,
+    write_frames,
+)
+from fcp.parser import get_fcp_from_string
+
+from .test_can import SCHEMA
+
+np = pytest.importorskip("numpy")
+
+CANDUMP = b"""\
+(1436509052.249713) vcan0 100#0123456789ABCDEF
+(1436509052.250000) vcan0 101#11223344
+(1436509052.250100) vcan0 101#R
+(1436509052.250200) vcan0 102##1AABB
+(1436509052.250300) vcan0 18FF00FA#CAFE
+
+(1436509052.250400) vcan1 7FF#
+"""
+
+ASC = b"""\
+date Mon Jan 1 00:00:00.000 am 2024
+base hex  timestamps absolute
+internal events logged
+// version 13.0.0
+Begin Triggerblock Mon Jan 1 00:00:00.000 am 2024
+   0.000000 Start of measurement
+   0.010000 1  100             Rx   d 8 01 23 45 67 89 AB CD EF  Length = 0 BitCount = 0 ID = 256
+   0.020000 1  101             Tx   d 4 11 22 33 44
+   0.030000 1  ErrorFrame
+   0.040000 2  18FF00FAx       Rx   d 2 CA FE
+   0.050000 1  102             Rx   r
+End TriggerBlock
+"""
+
+
+def make_codec() -> CanCodec:
+    return CanCodec(get_fcp_from_string(SCHEMA).unwrap())
+
+
+def check_frames(frames: Any, expected: List[Tuple[float, int, bytes]]) -> None:
+    assert [
+        (float(f["timestamp"]), int(f["id"]), bytes(f["data"][: f["dlc"]]))
+        for f in frames
+    ] == expected
+    assert all(not f["data"][f["dlc"] :].any() for f in frames)
+
+
+def test_parse_candump() -> None:
+    check_frames(
+        parse_candump(CANDUMP),
+        [
+            (1436509052.249713, 0x100, bytes.fromhex("0123456789ABCDEF")),
+            (1436509052.25, 0x101, bytes.fromhex("11223344")),
+            (1436509052.2503, 0x18FF00FA, bytes.fromhex("CAFE")),
+            (1436509052.2504, 0x7FF, b""),
+        ],
+    )
+
+
+def test_parse_asc() -> None:
+    check_frames(
+        parse_asc(ASC),
+        [
+            (0.01, 0x100, bytes.fromhex("0123456789ABCDEF")),
+            (0.02, 0x101, bytes.fromhex("11223344")),
+            (0.04, 0x18FF00FA, bytes.fromhex("CAFE")),
+        ],
+    )
+
+    with pytest.raises(ValueError, match="decimal"):
+        parse_asc(ASC.replace(b"base hex", b"base dec"))
+    with pytest.raises(ValueError, match="fewer data bytes"):
+        parse_asc(ASC.replace(b"d 4 11", b"d 5 11"))
+
+
+def test_empty_logs() -> None:
+    assert len(parse_candump(b"")) == 0
+    assert len(parse_asc(b"")) == 0
+    assert decode_frames(make_codec(), parse_candump(b"")) == {}
+
+
+def random_frames(count: int) -> Any:
+    rng = random.Random(0)
+    frames = np.zeros(count, dtype=frame_dtype(np))
+    frames["timestamp"] = np.arange(count) / 100
+    frames["id"] = [rng.choice([0x100, 0x101, 0x102, 0x200]) for _ in range(count)]
+    frames["dlc"] = 8
+    frames["data"] = np.frombuffer(rng.randbytes(8 * count), np.uint8).reshape(-1, 8)
+    return frames
+
+
+def test_decode_frames_matches_codec() -> None:
+    codec = make_codec()
+    frames = random_frames(2000)
+
+    tables = decode_frames(codec, frames)
+
+    assert sorted(tables) == ["Engine", "Path", "Precise"]
+    for name, table in tables.items():
+        message = codec.messages[name]
+        rows = frames[frames["id"] == message.frame_id]
+        assert np.array_equal(table["timestamp"], rows["timestamp"])
+        for row, frame in zip(table, rows):
+            expected = message.decode(bytes(frame["data"]))
+            for signal, value in expected.items():
+                if isinstance(value, float):
+                    assert row[signal] == value or (
+                        value != value and row[signal] != row[signal]
+                    )
+                else:
+                    assert int(row[signal]) == value
+
+
+def test_can_fd_messages_are_skipped(caplog: Any) -> None:
+    fd = SCHEMA.replace("value @0: f64,", "value @0: f64,\n    more @1: u16,")
+    codec = CanCodec(get_fcp_from_string(fd).unwrap())
+
+    with caplog.at_level(logging.WARNING):
+        tables = decode_frames(codec, random_frames(100))
+
+    assert sorted(tables) == ["Engine", "Path"]
+    assert "CAN FD message Precise" in caplog.text
+
+
+def test_decoded_dtypes() -> None:
+    tables = decode_frames(make_codec(), random_frames(100))
+
+    assert tables["Engine"].dtype["rpm"] == np.float64
+    assert tables["Engine"].dtype["temp"] == np.float64
+    assert tables["Engine"].dtype["state"] == np.uint8
+    assert tables["Engine"].dtype["torque"] == np.int16
+    assert tables["Engine"].dtype["power"] == np.float32
+    assert tables["Path"].dtype["points_0::x"] == np.int8
+    assert tables["Path"].dtype["speed"] == np.uint16
+    assert tables["Precise"].dtype["value"] == np.float64
+
+
+def test_binary_log() -> None:
+    frames = random_frames(100)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "log.bin")
+        write_frames(path, frames)
+        assert os.path.getsize(path) == 24 * len(frames)
+        assert np.array_equal(read_log(path), frames)
+
+
+def test_can_decode_cli() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        schema = os.path.join(directory, "schema.fcp")
+        with open(schema, "w") as f:
+            f.write(SCHEMA)
+        log = os.path.join(directory, "drive.asc")
+        with open(log, "wb") as f:
+            f.write(ASC)
+        output = os.path.join(directory, "out.npz")
+
+        result = CliRunner().invoke(
+            main, ["--no-cache", "can-decode", schema, log, output]
+        )
+
+        assert result.exit_code == 0, result.output
+        assert "Engine: 1 frames" in result.output
+        with np.load(output) as tables:
+            assert sorted(tables.files) == ["Engine", "Path"]
+            assert tables["Path"]["dlc"].tolist() == [4]
+            assert tables["Engine"]["timestamp"].tolist() == [0.01]
+
+        result = CliRunner().invoke(
+            main,
+            ["--no-cache", "can-decode", "--format", "binary", schema, log, output],
+        )
+        assert result.exit_code != 0
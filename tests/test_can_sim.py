@@ -0,0 +1,250 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ruff: noqa: D103 D100
+
+import asyncio
+from beartype.typing import Any, Dict, List
+
+from fcp.can import CanMessage
+from fcp.can.log import frame_dtype
+from fcp.can.codec import impl_devices
+from fcp.can.sim import Frame, Simulator, VirtualBus, VirtualClock, replay
+from fcp.parser import get_fcp_from_string
+from fcp.specs.v2 import FcpV2
+
+import pytest
+
+SCHEMA = """version: "3"
+
+struct Fast {
+    value @0: u16,
+}
+
+struct Slow {
+    value @0: u8,
+}
+
+struct Event {
+    value @0: u8,
+}
+
+device ecu {
+    protocol can {
+        impl Fast {
+            id: 0x10,
+            period: 100,
+        },
+
+        impl Event {
+            id: 0x30,
+        },
+    },
+}
+
+device bms {
+    protocol can {
+        impl Slow {
+            id: 0x20,
+            period: 250,
+        },
+    },
+}
+"""
+
+
+def make_fcp() -> FcpV2:
+    return get_fcp_from_string(SCHEMA).unwrap()
+
+
+def test_impl_devices() -> None:
+    assert impl_devices(make_fcp()) == {"Fast": "ecu", "Event": "ecu", "Slow": "bms"}
+
+
+def test_simulator_devices() -> None:
+    async def make() -> Dict[str, Any]:
+        simulator = Simulator(make_fcp(), VirtualBus())
+        return {
+            device: [(message.name, period) for message, period in messages]
+            for device, messages in simulator.devices.items()
+        }
+
+    assert asyncio.run(make()) == {"ecu": [("Fast", 0.1)], "bms": [("Slow", 0.25)]}
+
+
+def test_simulator_periods() -> None:
+    async def run() -> List[Frame]:
+        bus = VirtualBus(VirtualClock())
+        with bus.tap() as tap:
+            await Simulator(make_fcp(), bus, speed=5).run(duration=1)
+        return [frame async for frame in tap]
+
+    frames = asyncio.run(run())
+
+    # Fast every 20ms and Slow every 50ms of bus time, at five times speed.
+    assert [frame.frame_id for frame in frames] == [
+        0x10,
+        0x20,
+        0x10,
+        0x10,
+        0x20,
+        0x10,
+        0x10,
+        0x20,
+        0x10,
+        0x10,
+        0x10,
+        0x20,
+        0x10,
+        0x10,
+    ]
+    assert [frame.timestamp for frame in frames] == pytest.approx(
+        [0, 0, 0.02, 0.04, 0.05, 0.06, 0.08, 0.1, 0.1, 0.12, 0.14, 0.15, 0.16, 0.18]
+    )
+    assert all(frame.data == b"\0\0" for frame in frames if frame.frame_id == 0x10)
+
+
+def test_simulator_signals() -> None:
+    def signals(message: CanMessage, time: float) -> Dict[str, Any]:
+        return {"value": round(time * 10)}
+
+    async def run() -> List[Frame]:
+        bus = VirtualBus(VirtualClock())
+        with bus.tap({0x10}) as tap:
+            await Simulator(make_fcp(), bus, signals, speed=5).run(duration=0.5)
+        return [frame async for frame in tap]
+
+    frames = asyncio.run(run())
+
+    assert [int.from_bytes(frame.data, "little") for frame in frames] == [
+        0,
+        1,
+        2,
+        3,
+        4,
+    ]
+
+
+def test_tap_filters() -> None:
+    async def run() -> Any:
+        bus = VirtualBus()
+        everything = bus.tap()
+        some = bus.tap([0x1, 0x3])
+        bounded = bus.tap(maxsize=2)
+
+        for frame_id in range(5):
+            bus.send(frame_id, bytes([frame_id]))
+        some.close()
+        bus.send(0x1, b"")
+
+        return (
+            [frame.frame_id for frame in [await everything.get() for _ in range(6)]],
+            [frame.frame_id async for frame in some],
+            (bounded.pending(), bounded.dropped),
+            bus.sent,
+        )
+
+    everything, some, bounded, sent = asyncio.run(run())
+
+    assert everything == [0, 1, 2, 3, 4, 1]
+    assert some == [1, 3]
+    assert bounded == (2, 4)
+    assert sent == 6
+
+
+def test_closed_tap() -> None:
+    async def run() -> None:
+        bus = VirtualBus()
+        tap = bus.tap()
+        reader = asyncio.create_task(tap.get())
+        await asyncio.sleep(0)
+        tap.close()
+
+        with pytest.raises(EOFError):
+            await reader
+        with pytest.raises(EOFError):
+            await tap.get()
+        assert tap.pending() == 0
+
+    asyncio.run(run())
+
+
+def test_replay() -> None:
+    log = [
+        Frame(100.0, 0x1, b"\x01"),
+        Frame(101.0, 0x2, b"\x02\x03"),
+        Frame(110.0, 0x1, b""),
+    ]
+
+    async def run(speed: Any) -> List[Frame]:
+        bus = VirtualBus(VirtualClock())
+        with bus.tap() as tap:
+            assert await replay(bus, log, speed) == 3
+        return [frame async for frame in tap]
+
+    fast = asyncio.run(run(None))
+    scaled = asyncio.run(run(100))
+
+    for frames in (fast, scaled):
+        assert [(f.frame_id, f.data) for f in frames] == [
+            (f.frame_id, f.data) for f in log
+        ]
+    assert [f.timestamp for f in scaled] == pytest.approx([0, 0.01, 0.1])
+    assert [f.timestamp for f in fast] == [0, 0, 0]
+
+
+def test_replay_log_frames() -> None:
+    np = pytest.importorskip("numpy")
+    log = np.zeros(2, dtype=frame_dtype(np))
+    log["timestamp"] = [1.0, 2.0]
+    log["id"] = [0x10, 0x20]
+    log["dlc"] = [2, 0]
+    log["data"][0, :2] = [0xAB, 0xCD]
+
+    async def run() -> List[Frame]:
+        bus = VirtualBus()
+        with bus.tap() as tap:
+            await replay(bus, log, speed=None)
+        return [frame async for frame in tap]
+
+    assert [(f.frame_id, f.data) for f in asyncio.run(run())] == [
+        (0x10, b"\xab\xcd"),
+        (0x20, b""),
+    ]
+
+
+def test_virtual_clock() -> None:
+    clock = VirtualClock(10)
+    woken: List[Any] = []
+
+    async def sleeper(name: str, delays: List[float]) -> None:
+        for delay in delays:
+            await clock.sleep(delay)
+            woken.append((name, clock.time()))
+
+    async def run() -> None:
+        cancelled = asyncio.create_task(clock.sleep(100))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(sleeper("a", [1, 1, 1]), sleeper("b", [1.5, 0]))
+
+    asyncio.run(run())
+
+    assert woken == [("a", 11), ("b", 11.5), ("b", 11.5), ("a", 12), ("a", 13)]
+    assert clock.time() == 13
@@ -0,0 +1,135 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# ruff: noqa: D103 D100
+
+from beartype.typing import Any, Dict, Tuple
+from hypothesis import given, settings
+import pytest
+
+from fcp.codec import compile_codec
+from fcp.serde import encode, decode
+from fcp.specs.v2 import FcpV2
+from fcp.specs.struct import Struct
+from fcp.specs.struct_field import StructField
+from fcp.specs.type import (
+    StructType,
+    DynamicArrayType,
+    OptionalType,
+    UnsignedType,
+    FloatType,
+    StringType,
+)
+
+from .serde_strategies import schemas_and_values, build_schema
+
+
+@settings(max_examples=300, deadline=None)  # type: ignore
+@given(schemas_and_values())  # type: ignore
+def test_codec_matches_serde(schema_and_value: Tuple[Any, Any]) -> None:
+    schema, data = schema_and_value
+    fcp, name = build_schema(schema)
+    codec = compile_codec(fcp, name)
+
+    encoded = codec.encode(data)
+
+    assert encoded == encode(fcp, name, data)
+    assert codec.decode(encoded) == decode(fcp, name, encoded) == data
+    assert codec.decode(memoryview(encoded)) == data
+    assert codec.decode_from(b"\x01" + encoded + b"\xff", 1) == (data, len(encoded))
+
+    assert codec.encoded_size(data) == len(encoded)
+    buffer = bytearray(b"\xff" * (len(encoded) + 3))
+    assert codec.encode_into(data, buffer, 1) == len(encoded)
+    assert buffer == b"\xff" + encoded + b"\xff\xff"
+
+
+def test_codec_unaligned_fields() -> None:
+    fcp = FcpV2(
+        structs=[
+            Struct(
+                "S1",
+                [
+                    StructField("a", 0, UnsignedType("u3")),
+                    StructField("b", 1, StringType()),
+                    StructField("c", 2, FloatType()),
+                    StructField("d", 3, UnsignedType("u5")),
+                ],
+            )
+        ]
+    )
+    data = {"a": 5, "b": "fcp", "c": 1.0, "d": 17}
+    codec = compile_codec(fcp, "S1")
+
+    encoded = codec.encode(data)
+
+    assert encoded == encode(fcp, "S1", data)
+    assert codec.decode(encoded) == decode(fcp, "S1", encoded) == data
+
+
+def test_codec_recursive_struct() -> None:
+    fcp = FcpV2(
+        structs=[
+            Struct(
+                "Node",
+                [
+                    StructField("value", 0, UnsignedType("u4")),
+                    StructField("next", 1, OptionalType(StructType("Node"))),
+                    StructField("children", 2, DynamicArrayType(StructType("Node"))),
+                ],
+            )
+        ]
+    )
+    leaf: Dict[str, Any] = {"value": 3, "next": None, "children": []}
+    data = {"value": 1, "next": leaf, "children": [leaf, {**leaf, "next": leaf}]}
+    codec = compile_codec(fcp, "Node")
+
+    encoded = codec.encode(data)
+
+    assert encoded == encode(fcp, "Node", data)
+    assert codec.decode(encoded) == data
+
+
+def test_codec_buffer_overrun() -> None:
+    fcp = FcpV2(structs=[Struct("S1", [StructField("a", 0, UnsignedType("u16"))])])
+
+    with pytest.raises(ValueError):
+        compile_codec(fcp, "S1").decode(b"\x01")
+
+
+def test_codec_encode_into_too_small() -> None:
+    fcp = FcpV2(
+        structs=[
+            Struct(
+                "S",
+                [
+                    StructField("x", 0, UnsignedType("u12")),
+                    StructField("y", 1, FloatType()),
+                ],
+            )
+        ]
+    )
+    codec = compile_codec(fcp, "S")
+
+    with pytest.raises(ValueError):
+        codec.encode_into({"x": 1, "y": 1.0}, bytearray(5))
+    with pytest.raises(ValueError):
+        codec.encode_into({"x": 1, "y": 1.0}, bytearray(10), 5)
+    assert codec.encode_into({"x": 1, "y": 1.0}, memoryview(bytearray(10)), 4) == 6
@@ -0,0 +1,221 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ruff: noqa: D103 D100
+
+import os
+import tempfile
+from beartype.typing import Any, List
+from click.testing import CliRunner
+from hypothesis import given, settings, strategies as st
+import pytest
+
+from fcp.__main__ import main
+from fcp.encoding import (
+    OptimizedEncoder,
+    PackedEncoder,
+    PackedEncoderContext,
+    Value,
+    layout_crossings,
+    layout_length,
+    make_encoder,
+)
+from fcp.parser import get_fcp_from_string
+from fcp.specs.impl import Impl
+from fcp.specs.signal_block import SignalBlock
+from fcp.specs.struct import Struct
+from fcp.specs.struct_field import StructField
+from fcp.specs.type import UnsignedType
+from fcp.specs.v2 import FcpV2
+
+SCHEMA = """version: "3"
+
+struct Point {
+    x @0: u4,
+    y @1: u12,
+}
+
+struct Sparse {
+    a @0: u4,
+    b @1: u16,
+    c @2: u4,
+    d @3: u8,
+    e @4: u3,
+    f @5: u32,
+    g @6: u5,
+}
+
+struct Pinned {
+    a @0: u4,
+    b @1: u16,
+    c @2: u8,
+}
+
+struct Nested {
+    flag @0: u1,
+    point @1: Point,
+    points @2: [Point, 2],
+}
+
+device ecu {
+    protocol can {
+        impl Sparse {
+            id: 1,
+        },
+
+        impl Pinned {
+            id: 2,
+
+            signal c {
+                bitstart: 0,
+            },
+        },
+
+        impl Nested {
+            id: 3,
+        },
+    },
+}
+"""
+
+
+def make_fcp() -> FcpV2:
+    return get_fcp_from_string(SCHEMA).unwrap()
+
+
+def leaves(values: List[Value]) -> List[Value]:
+    return [
+        leaf for value in values for leaf in (leaves(value.nested_fields) or [value])
+    ]
+
+
+def assert_disjoint(values: List[Value]) -> None:
+    bits = sorted(
+        (leaf.bitstart, leaf.bitstart + leaf.bitlength) for leaf in leaves(values)
+    )
+    assert all(end <= start for (_, end), (start, _) in zip(bits, bits[1:]))
+
+
+def test_make_encoder() -> None:
+    encoder = make_encoder("optimized", make_fcp(), PackedEncoderContext())
+
+    assert isinstance(encoder, OptimizedEncoder)
+
+
+def test_removes_byte_crossings() -> None:
+    fcp = make_fcp()
+    impl = list(fcp.get_matching_impls("can"))[0]
+    encoder = OptimizedEncoder(fcp, PackedEncoderContext())
+    encoding = encoder.generate(impl)
+
+    assert sorted(v.name for v in encoding) == list("abcdefg")
+    assert layout_length(encoding) == 9
+    assert layout_crossings(encoding) == 0
+    assert_disjoint(encoding)
+
+    savings = encoder.savings(impl)
+    assert (savings.packed_length, savings.length) == (9, 9)
+    assert (savings.packed_crossings, savings.crossings) == (2, 0)
+    assert savings.saved_crossings == 2
+
+
+def test_pinned_signals() -> None:
+    fcp = make_fcp()
+    impl = list(fcp.get_matching_impls("can"))[1]
+    encoding = OptimizedEncoder(fcp, PackedEncoderContext()).generate(impl)
+
+    assert [(v.name, v.bitstart) for v in encoding][0] == ("c", 0)
+    assert layout_length(encoding) == 4
+    assert layout_crossings(encoding) == 0
+
+    fcp = make_fcp()
+    impl = list(fcp.get_matching_impls("can"))[1]
+    impl.signals[0].fields["bitstart"] = 6
+    impl.signals.append(SignalBlock("a", {"bitstart": 10}, impl.meta))
+    with pytest.raises(ValueError, match="Pinned signals of impl Pinned overlap"):
+        OptimizedEncoder(fcp, PackedEncoderContext()).generate(impl)
+
+
+def test_nested_values_move_as_a_whole() -> None:
+    fcp = make_fcp()
+    impl = list(fcp.get_matching_impls("can"))[2]
+    ctx = PackedEncoderContext().with_unroll_arrays(True)
+    encoding = OptimizedEncoder(fcp, ctx).generate(impl)
+    packed = PackedEncoder(fcp, ctx).generate(impl)
+
+    assert_disjoint(encoding)
+    assert layout_length(encoding) == layout_length(packed)
+    assert layout_crossings(encoding) < layout_crossings(packed)
+    for value in encoding:
+        nested = [(n.bitstart - value.bitstart) for n in value.nested_fields]
+        assert nested in ([], [0, 4])
+
+    # The packed layout is unchanged by the optimized one.
+    assert packed[0].bitstart == 0 and packed[1].bitstart == 1
+
+
+def test_layouts_are_cached(monkeypatch: Any) -> None:
+    fcp = make_fcp()
+    impl = list(fcp.get_matching_impls("can"))[0]
+
+    first = OptimizedEncoder(fcp, PackedEncoderContext()).generate(impl)
+    monkeypatch.setattr(OptimizedEncoder, "_optimize", None)
+    second = OptimizedEncoder(fcp, PackedEncoderContext()).generate(impl)
+    packed = PackedEncoder(fcp, PackedEncoderContext()).generate(impl)
+
+    assert first == second
+    assert not any(a is b for a, b in zip(first, second))
+    assert [v.name for v in packed] == list("abcdefg")
+
+
+@settings(deadline=None)  # type: ignore
+@given(st.lists(st.integers(1, 32), min_size=1, max_size=12))  # type: ignore
+def test_never_worse_than_packed(lengths: List[int]) -> None:
+    fcp = FcpV2()
+    fields = [
+        StructField(f"s{i}", i, UnsignedType(f"u{length}"))
+        for i, length in enumerate(lengths)
+    ]
+    fcp.structs.append(Struct("S", fields))
+    impl = Impl("S", "can", "S", {"id": 1}, [])
+    fcp.impls.append(impl)
+
+    packed = PackedEncoder(fcp, PackedEncoderContext()).generate(impl)
+    optimized = OptimizedEncoder(fcp, PackedEncoderContext()).generate(impl)
+
+    assert_disjoint(optimized)
+    assert sorted(v.name for v in optimized) == sorted(f.name for f in fields)
+    assert (layout_length(optimized), layout_crossings(optimized)) <= (
+        layout_length(packed),
+        layout_crossings(packed),
+    )
+
+
+def test_packing_savings_cli() -> None:
+    runner = CliRunner()
+    with tempfile.TemporaryDirectory() as tmp:
+        schema = os.path.join(tmp, "schema.fcp")
+        with open(schema, "w") as f:
+            f.write(SCHEMA)
+
+        result = runner.invoke(main, ["--no-cache", "packing-savings", schema])
+
+    assert result.exit_code == 0, result.output
+    assert "Sparse: 9 -> 9 bytes, 2 -> 0 byte crossings" in result.output
+    assert "Saved 0 bytes" in result.output
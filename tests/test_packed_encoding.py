@@ -20,7 +20,7 @@
 
 # ruff: noqa: D103 D100
 
-from beartype.typing import NoReturn
+from beartype.typing import Any, NoReturn
 import pytest
 
 from fcp.encoding import PackedEncoder, PackedEncoderContext, Value
@@ -29,7 +29,8 @@ from fcp.specs.struct import Struct
 from fcp.specs.impl import Impl
 from fcp.specs.struct_field import StructField
 from fcp.specs.metadata import MetaData
-from fcp.specs.type import StructType, UnsignedType
+from fcp.specs.signal_block import SignalBlock
+from fcp.specs.type import ArrayType, StructType, UnsignedType
 from fcp.specs.v2 import FcpV2
 
 
@@ -108,3 +109,83 @@ def test_struct(example_struct: Struct) -> NoReturn:
         Value("s1::s2", UnsignedType("u16"), bitstart=32, bitlength=16),
         Value("s2", UnsignedType("u8"), bitstart=48, bitlength=8),
     ]
+
+
+def test_layouts_are_cached(example_struct: Struct, monkeypatch: Any) -> None:
+    example_extension = make_example_extension("A")
+    fcp = FcpV2(structs=[example_struct], impls=[example_extension])
+    unrolled = PackedEncoderContext().with_unroll_arrays(True)
+
+    encoding = PackedEncoder(fcp, PackedEncoderContext()).generate(example_extension)
+    unrolled_encoding = PackedEncoder(fcp, unrolled).generate(example_extension)
+    monkeypatch.setattr(PackedEncoder, "_generate", None)
+
+    other = PackedEncoder(fcp, PackedEncoderContext()).generate(example_extension)
+    assert other == encoding
+    # Cached values are copied, changing them doesn't change the cache.
+    assert not any(a is b for a, b in zip(other, encoding))
+    other[0].bitstart = 5
+    assert PackedEncoder(fcp, unrolled).generate(example_extension) == (
+        unrolled_encoding
+    )
+    assert PackedEncoder(fcp, PackedEncoderContext()).generate(example_extension) == (
+        encoding
+    )
+
+
+def test_layout_cache_follows_impl_changes(example_struct: Struct) -> None:
+    example_extension = make_example_extension("A")
+    fcp = FcpV2(structs=[example_struct], impls=[example_extension])
+    packed_encoding = PackedEncoder(fcp, PackedEncoderContext())
+    assert packed_encoding.generate(example_extension)[0].endianess == "little"
+
+    example_extension.signals.append(
+        SignalBlock("s1", {"endianess": "big"}, _create_default_metadata())
+    )
+    assert packed_encoding.generate(example_extension)[0].endianess == "big"
+
+    example_extension.signals[0].fields["endianess"] = "little"
+    assert packed_encoding.generate(example_extension)[0].endianess == "little"
+
+
+def test_layout_cache_follows_schema_changes(example_struct: Struct) -> NoReturn:
+    example_extension = make_example_extension("A")
+    fcp = FcpV2(structs=[example_struct], impls=[example_extension])
+    packed_encoding = PackedEncoder(fcp, PackedEncoderContext())
+    packed_encoding.generate(example_extension)
+
+    fcp.structs[0] = Struct(
+        name="A", fields=[StructField(name="s1", field_id=0, type=UnsignedType("u8"))]
+    )
+
+    assert packed_encoding.generate(example_extension) == [
+        Value("s1", UnsignedType("u8"), bitstart=0, bitlength=8),
+    ]
+
+
+def test_unrolled_values_share_empty_defaults() -> NoReturn:
+    struct = Struct(
+        name="A",
+        fields=[
+            StructField(name="a", field_id=0, type=ArrayType(UnsignedType("u8"), 3))
+        ],
+    )
+    extension = make_example_extension("A")
+    extension.signals = [
+        SignalBlock("a_1", {"endianess": "big"}, _create_default_metadata())
+    ]
+    fcp = FcpV2(structs=[struct], impls=[extension])
+
+    ctx = PackedEncoderContext().with_unroll_arrays(True)
+    encoding = PackedEncoder(fcp, ctx).generate(extension)
+
+    assert [(v.name, v.bitstart, v.endianess) for v in encoding] == [
+        ("a_0", 0, "little"),
+        ("a_1", 8, "big"),
+        ("a_2", 16, "little"),
+    ]
+    assert not hasattr(encoding[0], "__dict__")
+    assert encoding[0].extended_data is encoding[2].extended_data
+    assert encoding[0].nested_fields == ()
+    with pytest.raises(TypeError):
+        encoding[0].extended_data["endianess"] = "big"  # type: ignore
@@ -24,12 +24,21 @@ import pytest
 import os
 import json
 from pathlib import Path
+from beartype.typing import Any, List, Optional
 
-from fcp.parser import get_fcp
+import fcp.parser
+from fcp.cache import AstCache
+from fcp.parser import (
+    get_fcp,
+    make_parser,
+    _get_fcp,
+    InMemoryFileSystemProxy,
+)
 from fcp.specs.v2 import FcpV2
 from fcp.verifier import make_general_verifier
 from fcp.types import NoReturn
 from fcp.error import Logger
+from fcp.maybe import catch
 
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -131,3 +140,146 @@ def test_verifier_errors(test_name: str) -> NoReturn:
 
     verifier = make_general_verifier()
     assert verifier.verify(fcp_v2).is_err()
+
+
+def get_schemas(scope: str) -> List[str]:
+    config_dir = os.path.join(THIS_DIR, "schemas", scope)
+    return sorted(
+        os.path.splitext(name)[0]
+        for name in os.listdir(config_dir)
+        if name.endswith(".fcp")
+    )
+
+
+@pytest.mark.parametrize(
+    "scope, test_name",
+    [("syntax", name) for name in get_schemas("syntax")]
+    + [("verifier", name) for name in get_schemas("verifier")],
+)  # type: ignore
+def test_lalr_and_earley_parity(scope: str, test_name: str) -> NoReturn:
+    fcp_config = get_fcp_config(scope, test_name)
+    lalr = get_fcp(fcp_config, parser="lalr").unwrap()
+    earley = get_fcp(fcp_config, parser="earley").unwrap()
+
+    assert lalr == earley
+
+
+@pytest.mark.parametrize("test_name", get_schemas("error"))  # type: ignore
+def test_lalr_and_earley_error_parity(test_name: str) -> NoReturn:
+    fcp_config = get_fcp_config("error", test_name)
+    lalr_logger = Logger({}, enable_file_paths=False)
+    earley_logger = Logger({}, enable_file_paths=False)
+
+    lalr = get_fcp(fcp_config, lalr_logger, parser="lalr")
+    earley = get_fcp(fcp_config, earley_logger, parser="earley")
+
+    assert lalr.is_err() and earley.is_err()
+    assert lalr_logger.error(lalr.err()) == earley_logger.error(earley.err())
+
+
+def test_lalr_parser_tables_are_cached(tmp_path: Path, monkeypatch: Any) -> None:
+    monkeypatch.setenv("FCP_CACHE_DIR", str(tmp_path / "default"))
+    schema = get_fcp_config("syntax", "001_basic_struct")
+
+    make_parser.cache_clear()
+    try:
+        compiled = get_fcp(str(schema)).unwrap()
+        assert not (tmp_path / "default").exists()
+
+        cache = AstCache(tmp_path / "cache")
+        make_parser.cache_clear()
+        assert get_fcp(str(schema), cache=cache).unwrap() == compiled
+        assert len(list(cache.directory.glob("*.tables"))) == 1
+
+        cache.clear()
+        make_parser.cache_clear()
+        assert get_fcp(str(schema), cache=cache).unwrap() == compiled
+    finally:
+        make_parser.cache_clear()
+
+
+def write_diamond_schema(directory: Path) -> Path:
+    (directory / "units.fcp").write_text(
+        'version: "3"\n\nstruct Units {\n    volt @0: u8,\n}\n'
+    )
+    (directory / "a.fcp").write_text(
+        'version: "3"\n\nmod units;\n\nstruct A {\n    units @0: Units,\n}\n'
+    )
+    (directory / "b.fcp").write_text(
+        'version: "3"\n\nmod units;\n\nstruct B {\n    units @0: Units,\n}\n'
+    )
+    main = directory / "main.fcp"
+    main.write_text('version: "3"\n\nmod a;\nmod b;\n')
+    return main
+
+
+def test_shared_imports_are_parsed_once(tmp_path: Path, monkeypatch: Any) -> NoReturn:
+    parse = fcp.parser._parse
+    parsed: List[str] = []
+
+    def counting_parse(source: str, parser: str, tables: Optional[str]) -> Any:
+        parsed.append(source)
+        return parse(source, parser, tables)
+
+    monkeypatch.setattr(fcp.parser, "_parse", counting_parse)
+
+    fcp_v2 = get_fcp(str(write_diamond_schema(tmp_path))).unwrap()
+
+    assert len(parsed) == 4
+    assert sorted(struct.name for struct in fcp_v2.structs) == ["A", "B", "Units"]
+    assert make_general_verifier().verify(fcp_v2).is_ok()
+
+
+def test_import_cycle() -> NoReturn:
+    files = {
+        Path("main.fcp"): 'version: "3"\n\nmod a;\n',
+        Path("a.fcp"): 'version: "3"\n\nmod b;\n',
+        Path("b.fcp"): 'version: "3"\n\nmod a;\n',
+    }
+    logger = Logger({})
+    result = catch(_get_fcp)(Path("main.fcp"), InMemoryFileSystemProxy(files), logger)
+
+    assert result.is_err()
+    assert "Import cycle: a.fcp -> b.fcp -> a.fcp" in logger.error(result.err())
+
+
+def test_imports_are_read_through_filesystem_proxy() -> NoReturn:
+    files = {
+        Path("main.fcp"): 'version: "3"\n\nmod units;\n',
+        Path("units.fcp"): 'version: "3"\n\nstruct Units {\n    volt @0: u8,\n}\n',
+    }
+    fcp_v2 = _get_fcp(
+        Path("main.fcp"), InMemoryFileSystemProxy(files), Logger({})
+    ).unwrap()
+
+    assert [struct.name for struct in fcp_v2.structs] == ["Units"]
+
+
+@pytest.mark.parametrize("test_name", get_schemas("error"))  # type: ignore
+def test_parallel_parsing_error_parity(test_name: str) -> NoReturn:
+    fcp_config = get_fcp_config("error", test_name)
+    serial_logger, parallel_logger = Logger({}), Logger({})
+
+    serial = get_fcp(fcp_config, serial_logger)
+    parallel = get_fcp(fcp_config, parallel_logger, jobs=2)
+
+    assert serial.is_err() and parallel.is_err()
+    assert serial_logger.error(serial.err()) == parallel_logger.error(parallel.err())
+
+
+def test_parallel_parsing(tmp_path: Path) -> NoReturn:
+    main = write_diamond_schema(tmp_path)
+
+    assert get_fcp(str(main), jobs=2).unwrap() == get_fcp(str(main)).unwrap()
+
+
+def test_parallel_parsing_of_invalid_module(tmp_path: Path) -> NoReturn:
+    main = write_diamond_schema(tmp_path)
+    (tmp_path / "b.fcp").write_text('version: "3"\n\nmod units;\n\nstruct B {\n')
+    serial_logger, parallel_logger = Logger({}), Logger({})
+
+    serial = get_fcp(str(main), serial_logger)
+    parallel = get_fcp(str(main), parallel_logger, jobs=2)
+
+    assert serial.is_err() and parallel.is_err()
+    assert serial_logger.error(serial.err()) == parallel_logger.error(parallel.err())
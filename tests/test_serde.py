@@ -20,22 +20,49 @@
 
 # ruff: noqa: D103 D100
 
+import functools
+import io
+import mmap
 import os
+import socket
+import threading
 from pathlib import Path
-from beartype.typing import List
-from hypothesis import given, settings
+from unittest import mock
+from beartype.typing import Any, List, Tuple, Union
+from hypothesis import assume, given, settings
 from hypothesis.strategies import (
+    composite,
+    sampled_from,
     text,
     integers,
     floats,
     characters,
     lists,
     booleans,
+    tuples,
 )
 
-from fcp.serde import encode, decode
+import pytest
+import fcp.serde
+from fcp.serde import (
+    encode,
+    encode_into,
+    encoded_size,
+    compile_codec,
+    decode,
+    decode_from,
+    iter_decode,
+    _Buffer,
+)
 from fcp.parser import get_fcp
 
+from .serde_strategies import (
+    schemas_and_values,
+    schemas_and_batches,
+    build_schema,
+    draw_value,
+)
+
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
@@ -309,7 +336,7 @@ def test_roundtrip_decoding_single_byte_types(integer: int) -> None:
 @settings(max_examples=20)  # type: ignore
 @given(
     integer1=integers(min_value=0, max_value=2**64 - 1),
-    integer2=integers(min_value=-(2**63 - 1), max_value=2**63),
+    integer2=integers(min_value=-(2**63), max_value=2**63 - 1),
 )  # type: ignore
 def test_roundtrip_decoding_8_byte_types(integer1: int, integer2: int) -> None:
     fcp_v2 = get_fcp(get_fcp_config("syntax", "001_basic_struct")).unwrap()
@@ -383,3 +410,279 @@ def test_roundtrip_decoding_optional(value: int, is_some: bool) -> None:
     encoded = encode(fcp_v2, "S1", data)
 
     assert decode(fcp_v2, "S1", encoded) == data
+
+
+class _ReferenceBuffer:
+    """Bit-by-bit buffer the word-level _Buffer is checked against."""
+
+    def __init__(self, data: Union[bytes, bytearray] = b"") -> None:
+        self.buffer: List[int] = list(data)
+        self.bitaddr: int = 0
+
+    def set_bit(self, bit: int, bitaddr: int) -> None:
+        byte_addr = bitaddr >> 3
+        intra_byte_bit_addr = bitaddr & 0x7
+
+        if len(self.buffer) <= byte_addr:
+            self.buffer.append(0)
+
+        self.buffer[byte_addr] |= bit << intra_byte_bit_addr
+
+    def get_bit(self, bitaddr: int) -> int:
+        byte_addr = bitaddr >> 3
+        intra_byte_bit_addr = bitaddr & 0x7
+
+        if len(self.buffer) <= byte_addr:
+            raise ValueError("buffer overrrun")
+
+        return int((self.buffer[byte_addr] >> intra_byte_bit_addr) & 1)
+
+    def push_word(self, word: int, bits: int) -> None:
+        for i in range(bits):
+            self.set_bit(word >> i & 1, self.bitaddr + i)
+
+        self.bitaddr += bits
+
+    def push_bytes(self, bytes: Union[bytes, bytearray]) -> None:
+        self.buffer += bytes
+        self.bitaddr = len(self.buffer) * 8
+
+    def read_word(self, bits: int) -> int:
+        word = 0
+        for i in range(bits):
+            word |= (self.get_bit(self.bitaddr + i)) << i
+
+        self.bitaddr += bits
+        return word
+
+    def read_bytes(self, bytes: int) -> bytearray:
+        byteaddr = (self.bitaddr + 7) >> 3
+        self.bitaddr = 8 * (byteaddr + bytes)
+        return bytearray(self.buffer[byteaddr : byteaddr + bytes])
+
+    def get_buffer(self) -> bytearray:
+        return bytearray(self.buffer)
+
+
+words = lists(
+    tuples(integers(min_value=-(2**70), max_value=2**70), integers(0, 70)),
+    max_size=20,
+)
+
+
+@settings(max_examples=200)  # type: ignore
+@given(words)  # type: ignore
+def test_buffer_matches_reference(words: List[Tuple[int, int]]) -> None:
+    buffer, reference = _Buffer(), _ReferenceBuffer()
+    for word, bits in words:
+        buffer.push_word(word, bits)
+        reference.push_word(word, bits)
+
+    assert buffer.get_buffer() == reference.get_buffer()
+    assert buffer.bitaddr == reference.bitaddr
+
+    buffer = _Buffer(buffer.get_buffer())
+    reference = _ReferenceBuffer(reference.get_buffer())
+    for _, bits in words:
+        assert buffer.read_word(bits) == reference.read_word(bits)
+
+
+@settings(max_examples=100)  # type: ignore
+@given(integers(0, 64), integers(1, 64))  # type: ignore
+def test_buffer_overrun_matches_reference(bitaddr: int, bits: int) -> None:
+    for buffer in (_Buffer(bytes(8)), _ReferenceBuffer(bytes(8))):
+        buffer.bitaddr = bitaddr
+        if bitaddr + bits > 64:
+            with pytest.raises(ValueError):
+                buffer.read_word(bits)
+        else:
+            assert buffer.read_word(bits) == 0
+
+
+@settings(max_examples=200, deadline=None)  # type: ignore
+@given(schemas_and_values())  # type: ignore
+def test_serde_matches_reference_buffer(schema_and_value: Tuple[Any, Any]) -> None:
+    schema, data = schema_and_value
+    fcp_v2, name = build_schema(schema)
+
+    encoded = encode(fcp_v2, name, data)
+    with mock.patch.object(fcp.serde, "_Buffer", _ReferenceBuffer):
+        assert encoded == encode(fcp_v2, name, data)
+        assert decode(fcp_v2, name, encoded) == data
+
+    assert decode(fcp_v2, name, encoded) == data
+
+
+@settings(max_examples=100, deadline=None)  # type: ignore
+@given(schemas_and_values())  # type: ignore
+def test_decode_from_offset(schema_and_value: Tuple[Any, Any]) -> None:
+    schema, data = schema_and_value
+    fcp_v2, name = build_schema(schema)
+    encoded = encode(fcp_v2, name, data)
+
+    capture = b"\xaa\x55" + encoded + b"\xff" * 9
+    for buffer in (capture, bytearray(capture), memoryview(capture)):
+        assert decode_from(fcp_v2, name, buffer, 2) == (data, len(encoded))
+
+
+def test_decode_from_mmap(tmp_path: Path) -> None:
+    fcp_v2 = get_fcp(get_fcp_config("syntax", "008_dynamic_array")).unwrap()
+    records = [{"field1": list(range(i))} for i in range(4)]
+    with open(tmp_path / "capture.bin", "wb") as f:
+        for record in records:
+            f.write(encode(fcp_v2, "S1", record))
+
+    decoded = []
+    with open(tmp_path / "capture.bin", "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as capture:
+            offset = 0
+            while offset < len(capture):
+                record, size = decode_from(fcp_v2, "S1", capture, offset)
+                decoded.append(record)
+                offset += size
+
+    assert decoded == records
+
+
+def test_decode_from_overrun() -> None:
+    fcp_v2 = get_fcp(get_fcp_config("syntax", "001_basic_struct")).unwrap()
+
+    assert decode_from(fcp_v2, "S2", bytes([0, 1, 255]), 1) == (
+        {"s0": 1, "s1": -1},
+        2,
+    )
+    with pytest.raises(ValueError):
+        decode_from(fcp_v2, "S2", bytes(2), 1)
+    with pytest.raises(ValueError):
+        decode_from(fcp_v2, "S2", bytes(2), -1)
+
+
+@settings(max_examples=100, deadline=None)  # type: ignore
+@given(schemas_and_batches(), integers(1, 7))  # type: ignore
+def test_iter_decode_split_records(
+    schema_and_values: Tuple[Any, Any], chunk_size: int
+) -> None:
+    schema, values = schema_and_values
+    fcp_v2, name = build_schema(schema)
+    stream = b"".join(encode(fcp_v2, name, value) for value in values)
+    # Records of zero size can't be told apart in a stream.
+    assume(len(stream) > 0)
+
+    decoded = iter_decode(fcp_v2, name, io.BytesIO(stream), chunk_size)
+    assert list(decoded) == values
+
+    chunks = [stream[i : i + chunk_size] for i in range(0, len(stream), chunk_size)]
+    assert list(iter_decode(fcp_v2, name, chunks)) == values
+
+
+def test_iter_decode_socket() -> None:
+    fcp_v2 = get_fcp(get_fcp_config("syntax", "008_dynamic_array")).unwrap()
+    records = [{"field1": list(range(i % 5))} for i in range(100)]
+
+    reader, writer = socket.socketpair()
+
+    def send() -> None:
+        with writer:
+            for record in records:
+                writer.sendall(encode(fcp_v2, "S1", record))
+
+    thread = threading.Thread(target=send)
+    thread.start()
+    with reader:
+        chunks = iter(functools.partial(reader.recv, 7), b"")
+        assert list(iter_decode(fcp_v2, "S1", chunks)) == records
+    thread.join()
+
+
+def test_iter_decode_truncated_stream() -> None:
+    fcp_v2 = get_fcp(get_fcp_config("syntax", "001_basic_struct")).unwrap()
+    stream = io.BytesIO(bytes([1, 255, 2, 254, 3]))
+
+    records = iter_decode(fcp_v2, "S2", stream)
+    assert next(records) == {"s0": 1, "s1": -1}
+    assert next(records) == {"s0": 2, "s1": -2}
+    with pytest.raises(ValueError):
+        next(records)
+
+
+@settings(max_examples=100, deadline=None)  # type: ignore
+@given(schemas_and_values())  # type: ignore
+def test_encode_into(schema_and_value: Tuple[Any, Any]) -> None:
+    schema, data = schema_and_value
+    fcp_v2, name = build_schema(schema)
+    encoded = encode(fcp_v2, name, data)
+
+    assert encoded_size(fcp_v2, name, data) == len(encoded)
+
+    buffer = bytearray(b"\xaa" * (len(encoded) + 4))
+    assert encode_into(fcp_v2, name, data, memoryview(buffer), 2) == len(encoded)
+    assert buffer == b"\xaa\xaa" + encoded + b"\xaa\xaa"
+
+
+def test_encode_into_too_small() -> None:
+    fcp_v2 = get_fcp(get_fcp_config("syntax", "001_basic_struct")).unwrap()
+
+    buffer = bytearray(3)
+    with pytest.raises(ValueError):
+        encode_into(fcp_v2, "S2", {"s0": 1, "s1": -1}, buffer, 2)
+    assert encode_into(fcp_v2, "S2", {"s0": 1, "s1": -1}, buffer, 1) == 2
+    assert buffer == bytearray([0, 1, 255])
+
+
+BULK_TYPES = [("unsigned", n) for n in (8, 16, 32, 64)] + [
+    ("signed", n) for n in (8, 16, 32, 64)
+]
+
+
+@composite  # type: ignore
+def bulk_schemas_and_values(draw: Any) -> Tuple[Any, Any]:
+    """Structs of whole byte integers and arrays of them, possibly unaligned."""
+    fields: List[Any] = [("unsigned", draw(integers(1, 8)))]
+    for _ in range(draw(integers(1, 6))):
+        leaf = draw(sampled_from(BULK_TYPES + [("float",), ("double",)]))
+        fields.append(
+            draw(
+                sampled_from(
+                    [
+                        leaf,
+                        ("array", leaf, draw(integers(1, 40))),
+                        ("dynamic_array", leaf),
+                    ]
+                )
+            )
+        )
+    schema = ("struct", fields)
+    return schema, draw_value(draw, schema)
+
+
+@settings(max_examples=200, deadline=None)  # type: ignore
+@given(bulk_schemas_and_values())  # type: ignore
+def test_bulk_runs_match_codec(schema_and_value: Tuple[Any, Any]) -> None:
+    schema, data = schema_and_value
+    fcp_v2, name = build_schema(schema)
+
+    encoded = encode(fcp_v2, name, data)
+
+    assert encoded == compile_codec(fcp_v2, name).encode(data)
+    assert decode(fcp_v2, name, encoded) == data
+
+
+def test_bulk_u8_arrays_from_bytes() -> None:
+    fcp_v2 = get_fcp(get_fcp_config("syntax", "008_dynamic_array")).unwrap()
+    blob = bytes(range(256)) * 16
+
+    encoded = encode(fcp_v2, "S1", {"field1": blob})
+
+    assert encoded == encode(fcp_v2, "S1", {"field1": list(blob)})
+    assert decode(fcp_v2, "S1", encoded) == {"field1": list(blob)}
+    with pytest.raises(ValueError):
+        decode(fcp_v2, "S1", encoded[:-1])
+
+
+def test_bulk_runs_mask_out_of_range_values() -> None:
+    fcp_v2 = get_fcp(get_fcp_config("syntax", "001_basic_struct")).unwrap()
+
+    encoded = encode(fcp_v2, "S2", {"s0": 257, "s1": 128})
+
+    assert encoded == bytearray([1, 128])
+    assert decode(fcp_v2, "S2", encoded) == {"s0": 1, "s1": -128}
@@ -0,0 +1,87 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ruff: noqa: D103 D100
+
+import asyncio
+import os
+from pathlib import Path
+from beartype.typing import Any, Dict, List
+
+import pytest
+
+from fcp.parser import get_fcp
+from fcp.serde import compile_codec
+from fcp.serde.aio import RecordWriter, read_records
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CODEC = compile_codec(
+    get_fcp(
+        Path(os.path.join(THIS_DIR, "schemas", "syntax", "008_dynamic_array.fcp"))
+    ).unwrap(),
+    "S1",
+)
+
+
+def make_records(client: int) -> List[Dict[str, Any]]:
+    return [{"field1": [client] + [i % 256] * (i % 7)} for i in range(200)]
+
+
+async def serve_and_send(clients: int, flush_size: int) -> Dict[int, List[Any]]:
+    received: Dict[int, List[Any]] = {}
+
+    async def handle(reader: asyncio.StreamReader, _: asyncio.StreamWriter) -> None:
+        records = [record async for record in read_records(reader, CODEC, 5)]
+        received[records[0]["field1"][0]] = records
+
+    async def send(client: int, port: int) -> None:
+        _, writer = await asyncio.open_connection("127.0.0.1", port)
+        async with RecordWriter(writer, CODEC, flush_size) as records:
+            for record in make_records(client):
+                await records.write(record)
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        await asyncio.gather(*(send(client, port) for client in range(clients)))
+        for _ in range(1000):
+            if len(received) == clients:
+                break
+            await asyncio.sleep(0.01)
+
+    return received
+
+
+@pytest.mark.parametrize("flush_size", [1, 64, 1 << 16])  # type: ignore
+def test_loopback(flush_size: int) -> None:
+    received = asyncio.run(serve_and_send(50, flush_size))
+
+    assert received == {client: make_records(client) for client in range(50)}
+
+
+def test_truncated_stream() -> None:
+    async def read() -> List[Any]:
+        reader = asyncio.StreamReader()
+        reader.feed_data(CODEC.encode({"field1": [1, 2]}) + b"\x05\x00")
+        reader.feed_eof()
+        return [record async for record in read_records(reader, CODEC)]
+
+    with pytest.raises(ValueError):
+        asyncio.run(read())
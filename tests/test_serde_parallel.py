@@ -0,0 +1,218 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ruff: noqa: D103 D100
+
+import csv
+import json
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+from beartype.typing import Any, Deque, List, Tuple
+from click.testing import CliRunner
+from hypothesis import assume, given, settings
+from hypothesis import strategies as st
+import pytest
+
+from fcp.__main__ import main
+from fcp.parser import get_fcp
+from fcp.serde import encode, decode, decode_batch
+from fcp.serde import parallel
+from fcp.serde.parallel import decode_capture, shard_capture
+from fcp.specs.v2 import FcpV2
+
+from .serde_strategies import schemas_and_batches, build_schema
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMA = os.path.join(THIS_DIR, "schemas", "syntax", "001_basic_struct.fcp")
+
+
+def basic_struct() -> FcpV2:
+    return get_fcp(Path(SCHEMA)).unwrap()
+
+
+def s1(i: int) -> Any:
+    return {
+        "s0": i % 256,
+        "s1": -(i % 128),
+        "s2": i,
+        "s3": -i,
+        "s4": i * 1000,
+        "s5": -i * 1000,
+        "s6": i << 32,
+        "s7": -(i << 32),
+        "s8": 0.5,
+        "s9": i / 4,
+        "s10": "x" * (i % 7),
+    }
+
+
+def write_capture(directory: str, records: List[bytes]) -> str:
+    path = os.path.join(directory, "capture.bin")
+    with open(path, "wb") as f:
+        f.write(b"".join(records))
+    return path
+
+
+def decode_to(fcp: FcpV2, name: str, capture: str, output: str, **kwargs: Any) -> str:
+    decode_capture(fcp, name, capture, output, **kwargs)
+    with open(output, newline="") as f:
+        return f.read()
+
+
+def check_shards(shards: List[Tuple[int, int]], records: List[bytes]) -> None:
+    boundaries = {0}
+    for record in records:
+        boundaries.add(max(boundaries) + len(record))
+
+    assert [start for start, _ in shards[1:]] == [end for _, end in shards[:-1]]
+    assert all(start in boundaries and end in boundaries for start, end in shards)
+    assert shards[-1][1] == sum(len(record) for record in records)
+
+
+@pytest.mark.parametrize("name", ["S1", "S4"])  # type: ignore
+def test_shards_are_record_aligned(name: str) -> None:
+    fcp = basic_struct()
+    values = [s1(i) if name == "S1" else {"s0": i, "s1": -i} for i in range(100)]
+    records = [bytes(encode(fcp, name, value)) for value in values]
+
+    shards = shard_capture(fcp, name, b"".join(records), shard_size=100)
+
+    assert len(shards) > 1
+    check_shards(shards, records)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])  # type: ignore
+def test_decode_capture_in_order(jobs: int) -> None:
+    fcp = basic_struct()
+    values = [s1(i) for i in range(500)]
+    records = [bytes(encode(fcp, "S1", value)) for value in values]
+
+    with tempfile.TemporaryDirectory() as directory:
+        capture = write_capture(directory, records)
+        output = os.path.join(directory, "out.jsonl")
+        text = decode_to(fcp, "S1", capture, output, jobs=jobs, shard_size=512)
+
+    assert text.splitlines() == [json.dumps(decode(fcp, "S1", r)) for r in records]
+
+
+def test_shards_in_flight_are_bounded() -> None:
+    in_flight: List[int] = []
+
+    class Executor:
+        def submit(self, fn: Any, shard: Any, format: str) -> Future:
+            in_flight.append(len(pending) + 1)
+            future: Future = Future()
+            future.set_result(shard)
+            return future
+
+    shards: List[Any] = list(range(20))
+    pending: Deque[Future] = deque()
+    results = parallel._decode_in_order(Executor(), shards, "jsonl", pending, 4)  # type: ignore
+
+    assert list(results) == shards
+    assert max(in_flight) == 4
+    assert not pending
+
+
+def test_decode_capture_csv() -> None:
+    fcp = basic_struct()
+    records = [bytes(encode(fcp, "S1", s1(i))) for i in range(50)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        capture = write_capture(directory, records)
+        output = os.path.join(directory, "out.csv")
+        text = decode_to(fcp, "S1", capture, output, jobs=2)
+        rows = list(csv.reader(text.splitlines()))
+
+    assert rows[0] == [f"s{i}" for i in range(11)]
+    assert [row[10] for row in rows[1:]] == ["x" * (i % 7) for i in range(50)]
+    assert [int(row[7]) for row in rows[1:]] == [-(i << 32) for i in range(50)]
+
+
+@pytest.mark.parametrize("fixed", [False, True])  # type: ignore
+@settings(max_examples=50, deadline=None)  # type: ignore
+@given(data=st.data())  # type: ignore
+def test_decode_capture_npz(fixed: bool, data: Any) -> None:
+    np = pytest.importorskip("numpy")
+
+    schema, values = data.draw(schemas_and_batches(fixed))
+    fcp, name = build_schema(schema)
+    records = [bytes(encode(fcp, name, value)) for value in values]
+    assume(all(records))
+
+    with tempfile.TemporaryDirectory() as directory:
+        capture = write_capture(directory, records)
+        output = os.path.join(directory, "out.npz")
+        decode_capture(fcp, name, capture, output, jobs=1, shard_size=16)
+        with np.load(output, allow_pickle=True) as npz:
+            columns = dict(npz)
+
+    expected = decode_batch(fcp, name, records)
+    assert columns.keys() == expected.keys()
+    for path, column in expected.items():
+        assert columns[path].shape == column.shape
+        assert columns[path].dtype == column.dtype
+        assert np.array_equal(columns[path], column, equal_nan=column.dtype != object)
+
+
+@pytest.mark.parametrize("fixed", [False, True])  # type: ignore
+@settings(max_examples=50, deadline=None)  # type: ignore
+@given(data=st.data())  # type: ignore
+def test_shards_of_random_schemas(fixed: bool, data: Any) -> None:
+    schema, values = data.draw(schemas_and_batches(fixed))
+    fcp, name = build_schema(schema)
+    records = [bytes(encode(fcp, name, value)) for value in values]
+    assume(records and all(records))
+
+    check_shards(shard_capture(fcp, name, b"".join(records), 8), records)
+
+
+def test_truncated_capture() -> None:
+    fcp = basic_struct()
+    record = bytes(encode(fcp, "S1", s1(3)))
+
+    with pytest.raises(ValueError, match="middle of a record"):
+        shard_capture(fcp, "S1", record + record[:-1])
+    with pytest.raises(ValueError, match="middle of a record"):
+        shard_capture(fcp, "S4", bytes(11))
+
+
+def test_decode_log_cli() -> None:
+    fcp = basic_struct()
+    records = [bytes(encode(fcp, "S4", {"s0": 0.25, "s1": i})) for i in range(20)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        capture = write_capture(directory, records)
+        output = os.path.join(directory, "out.jsonl")
+        runner = CliRunner()
+        result = runner.invoke(
+            main, ["--no-cache", "decode-log", SCHEMA, "S4", capture, output, "-j", "2"]
+        )
+        assert result.exit_code == 0, result.output
+        with open(output) as f:
+            assert [json.loads(line)["s1"] for line in f] == list(range(20))
+
+        result = runner.invoke(
+            main, ["--no-cache", "decode-log", SCHEMA, "S9", capture, output]
+        )
+        assert result.exit_code != 0
+        assert "Unknown struct S9" in result.output
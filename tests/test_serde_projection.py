@@ -0,0 +1,134 @@
+# Copyright (c) 2024 the fcp AUTHORS.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# ruff: noqa: D103 D100
+
+import os
+from pathlib import Path
+from beartype.typing import Any, List, Tuple
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+import pytest
+
+from fcp.parser import get_fcp
+from fcp.serde import encode, decode
+from fcp.serde.projection import compile_projection, decode_projected
+from fcp.specs.v2 import FcpV2
+from fcp.specs.struct import Struct
+from fcp.specs.struct_field import StructField
+from fcp.specs.type import StructType, DynamicArrayType, UnsignedType, StringType
+
+from .serde_strategies import draw_struct, draw_value, build_schema
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def field_paths(schema: Tuple[Any, ...]) -> List[List[str]]:
+    paths = []
+    for i, field in enumerate(schema[1]):
+        paths.append([f"field{i}"])
+        if field[0] == "struct":
+            paths += [[f"field{i}"] + path for path in field_paths(field)]
+    return paths
+
+
+@st.composite
+def projections(draw: Any) -> Tuple[Any, Any, List[List[str]]]:
+    schema = draw_struct(draw)
+    paths = draw(st.lists(st.sampled_from(field_paths(schema)), min_size=1))
+    return schema, draw_value(draw, schema), paths
+
+
+@settings(max_examples=300, deadline=None)  # type: ignore
+@given(projections())  # type: ignore
+def test_projection_matches_decode(projection: Tuple[Any, Any, Any]) -> None:
+    schema, data, paths = projection
+    fcp, name = build_schema(schema)
+    encoded = encode(fcp, name, data)
+    decoded = decode(fcp, name, encoded)
+
+    xpaths = [f"{name}:{'/'.join(path)}" for path in paths]
+    projected = decode_projected(fcp, xpaths, b"\x00" + encoded, 1)
+
+    for xpath, path in zip(xpaths, paths):
+        value = decoded
+        for field in path:
+            value = value[field]
+        assert projected[xpath] == value
+
+
+def test_projection_skips_dynamic_fields() -> None:
+    fcp = FcpV2(
+        structs=[
+            Struct(
+                "Inner",
+                [
+                    StructField("name", 0, StringType()),
+                    StructField("x", 1, UnsignedType("u12")),
+                ],
+            ),
+            Struct(
+                "S",
+                [
+                    StructField("a", 0, UnsignedType("u3")),
+                    StructField("data", 1, DynamicArrayType(StructType("Inner"))),
+                    StructField("inner", 2, StructType("Inner")),
+                    StructField("b", 3, UnsignedType("u8")),
+                ],
+            ),
+        ]
+    )
+    data = {
+        "a": 5,
+        "data": [{"name": "abc", "x": 1}, {"name": "", "x": 2}],
+        "inner": {"name": "de", "x": 4095},
+        "b": 7,
+    }
+    projection = compile_projection(fcp, ["S:inner/x", "S:b", "S:a"])
+
+    assert projection.decode(encode(fcp, "S", data)) == {
+        "S:a": 5,
+        "S:inner/x": 4095,
+        "S:b": 7,
+    }
+
+
+def test_projection_stops_after_last_field() -> None:
+    fcp = get_fcp(
+        Path(os.path.join(THIS_DIR, "schemas", "syntax", "001_basic_struct.fcp"))
+    ).unwrap()
+    encoded = encode(fcp, "S2", {"s0": 1, "s1": -1})
+
+    assert decode_projected(fcp, ["S2:s0"], encoded[:1]) == {"S2:s0": 1}
+    with pytest.raises(ValueError):
+        decode_projected(fcp, ["S2:s1"], encoded[:1])
+
+
+def test_projection_errors() -> None:
+    fcp = get_fcp(
+        Path(os.path.join(THIS_DIR, "schemas", "syntax", "001_basic_struct.fcp"))
+    ).unwrap()
+
+    with pytest.raises(ValueError):
+        compile_projection(fcp, ["S2:s0", "S1:s0"])
+    with pytest.raises(ValueError):
+        compile_projection(fcp, ["S2:missing"])
+    with pytest.raises(ValueError):
+        compile_projection(fcp, ["S2:s0/x"])
@@ -20,13 +20,16 @@
 
 # ruff: noqa: D103 D100
 
+import pickle
 import serde
 import serde.json
 import pytest
 
 from fcp.xpath import Xpath
 from fcp.specs.v2 import FcpV2
-from fcp.specs.type import StructType, UnsignedType
+from fcp.specs.impl import Impl
+from fcp.specs.enum import Enum, Enumeration
+from fcp.specs.type import StructType, EnumType, UnsignedType
 
 from .fcp_builder import FcpV2Builder, StructBuilder, StructFieldBuilder
 
@@ -138,3 +141,76 @@ def test_wrong_xpath(fcp_sample: FcpV2) -> None:
     r = fcp_sample.get_xpath(Xpath("S1:s1/s2"))
 
     assert r.is_err()
+
+
+def make_struct(name: str) -> Any:
+    return StructBuilder().with_name(name).build()
+
+
+def test_lookups(fcp_sample: FcpV2) -> None:
+    fcp_sample.enums.append(Enum("E1", [Enumeration("A", 0)]))
+
+    assert fcp_sample.get_struct("S2").unwrap() is fcp_sample.structs[1]
+    assert fcp_sample.get_enum("E1").unwrap() is fcp_sample.enums[0]
+    assert fcp_sample.get_type(EnumType("E1")).unwrap() is fcp_sample.enums[0]
+    assert fcp_sample.get_type(StructType("S1")).unwrap() is fcp_sample.structs[0]
+    assert fcp_sample.get_type(UnsignedType("u8")).is_nothing()
+    assert fcp_sample.get_struct("S3").is_nothing()
+
+
+def test_lookups_return_first_match(fcp_sample: FcpV2) -> None:
+    duplicate = make_struct("S1")
+    fcp_sample.structs.append(duplicate)
+
+    assert fcp_sample.get_struct("S1").unwrap() is fcp_sample.structs[0]
+
+
+def test_lookup_indexes_follow_list_mutations(fcp_sample: FcpV2) -> None:
+    assert fcp_sample.get_struct("S3").is_nothing()
+
+    s3 = make_struct("S3")
+    fcp_sample.structs.append(s3)
+    assert fcp_sample.get_struct("S3").unwrap() is s3
+
+    s4 = make_struct("S4")
+    fcp_sample.structs[2] = s4
+    assert fcp_sample.get_struct("S3").is_nothing()
+    assert fcp_sample.get_struct("S4").unwrap() is s4
+
+    del fcp_sample.structs[2]
+    assert fcp_sample.get_struct("S4").is_nothing()
+
+    fcp_sample.structs = [s3]
+    assert fcp_sample.get_struct("S1").is_nothing()
+    assert fcp_sample.get_struct("S3").unwrap() is s3
+
+
+def test_lookup_indexes_follow_merge(fcp_sample: FcpV2) -> None:
+    assert fcp_sample.get_struct("S3").is_nothing()
+
+    fcp_sample.merge(FcpV2(structs=[make_struct("S3")]))
+
+    assert fcp_sample.get_struct("S3").is_some()
+
+
+def test_matching_impls(fcp_sample: FcpV2) -> None:
+    default = Impl("default", "default", "S1", {}, [])
+    can = Impl("can", "can", "S2", {}, [])
+    fcp_sample.impls += [default, Impl("default", "default", "S2", {}, [])]
+
+    assert fcp_sample.get_matching_impls_or_default("can") == fcp_sample.impls
+
+    fcp_sample.impls.append(can)
+
+    assert fcp_sample.get_matching_impl(fcp_sample.structs[1], "can") == [can]
+    assert list(fcp_sample.get_matching_impls("can")) == [can]
+    assert fcp_sample.get_matching_impls_or_default("can") == [default, can]
+
+
+def test_pickle(fcp_sample: FcpV2) -> None:
+    loaded = pickle.loads(pickle.dumps(fcp_sample))
+
+    assert loaded == fcp_sample
+    assert loaded.get_struct("S1").is_some()
+    loaded.structs.append(make_struct("S3"))
+    assert loaded.get_struct("S3").is_some()